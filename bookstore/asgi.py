@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookstore.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 키 입력 자동완성은 async 미들웨어만 거치는 가벼운 핸들러로 보낸다 (textbook.typeahead)
+from textbook.typeahead import route  # noqa: E402  (django.setup() 뒤에 import)
+
+application = route(django_application)
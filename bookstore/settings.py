@@ -52,6 +52,9 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 
 MIDDLEWARE = [
+    # 가장 바깥에서 요청 전체 시간을 잰다 (textbook.profiling)
+    'textbook.middleware.ProfilingMiddleware',
+    'textbook.middleware.RestoreGateMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +68,8 @@ ROOT_URLCONF = 'bookstore.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates 와 같고 렌더링 시간을 Server-Timing 에 더한다
+        'BACKEND': 'textbook.profiling.ProfilingDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'textbook', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,9 +94,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'mclassbookstore.db',
+        # 요청마다 새로 연결하지 않고 스레드별 연결을 재사용한다
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # 쓰기 트랜잭션은 시작할 때 잠금을 잡는다 (textbook.writes)
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# 쓰기 잠금을 얻지 못했을 때 재시도하는 최대 시간 (초)
+WRITE_LOCK_BUDGET = 10
+
+# SQLite 연결 PRAGMA 프로필 (textbook.sqlite_profile): 'performance'(WAL) 또는 'legacy'
+SQLITE_PROFILE = 'performance'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -136,16 +153,73 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# 대시보드/학생 상세 화면 캐시 (textbook.page_cache): 버전은 DB 에 있고 렌더링 결과만 프로세스별 메모리에 둔다
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+PAGE_CACHE_TIMEOUT = 300  # 초. 버전이 바뀌어 더는 읽히지 않는 결과가 메모리에 남는 최대 시간
+
+# 보고서 PDF 캐시 (textbook.report_cache)
+REPORT_CACHE_DIR = os.path.join(BASE_DIR, 'report_cache')
+REPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+
+# 데이터베이스 백업 (textbook.utils.backup_database, textbook.backup_store)
+BACKUP_COMPRESS = True
+# 청크 저장소는 DB 의 압축 사본이므로 소스 트리(git) 밖에 둔다
+BACKUP_STORE_DIR = os.path.join(Path.home(), '.textbook_manager', 'backup_store')
+BACKUP_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4, 'monthly': 12}
+# 복원 시 다른 프로세스에서 진행 중인 요청을 기다리는 시간 (초, textbook.restore)
+RESTORE_SETTLE_SECONDS = 1.0
+
+
+# 요청별 성능 측정 (textbook.profiling): 이보다 오래 걸린 요청은 perf.log 에 남긴다 (ms, None 이면 끔)
+PERF_SLOW_REQUEST_MS = 500
+PERF_SERVER_TIMING = True
+
+# 오래된 납부 완료 교재 보관 (textbook.archive, manage.py archive_books): 수납 후 이 일수가 지나면 옮긴다
+ARCHIVE_HORIZON_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# ASGI 에서 자동완성 경로만 거치는 미들웨어 (async 지원 필수, textbook.typeahead)
+TYPEAHEAD_MIDDLEWARE = [
+    'textbook.middleware.ProfilingMiddleware',
+    'textbook.middleware.RestoreGateMiddleware',
+    'textbook.middleware.AllowedHostsMiddleware',
+]
+# 자동완성 DB 쿼리 전용 스레드 수 (스레드마다 지속 연결 하나)
+TYPEAHEAD_DB_THREADS = 4
+
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        # perf 로그는 한 줄에 JSON 하나
+        'message': {
+            'format': '%(message)s',
+        },
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'backup.log'),
         },
+        'perf_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(BASE_DIR, 'perf.log'),
+            'formatter': 'message',
+        },
     },
     'loggers': {
         'backup': {
@@ -153,5 +227,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'perf': {
+            'handlers': ['perf_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
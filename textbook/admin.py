@@ -1,49 +1,126 @@
-from django.conf import settings
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
 from django.contrib.humanize.templatetags.humanize import intcomma
 
-from .models import Student, Book
+from .models import ArchivedBook, Student, Book, Catalog
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 
 from django.utils import timezone
 
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import path
 from django.contrib import messages
+from .restore import list_backups
 from .utils import backup_database, restore_database
+from . import ledger, page_cache, writes
 from django.shortcuts import render
-import os
 
 
 
+class RetryWritesMixin:
+    """관리자 저장/삭제/액션을 쓰기 잠금 재시도(textbook.writes)로 감싼다."""
+
+    def changeform_view(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().changeform_view(request, *args, **kwargs)
+        return writes.run_in_transaction(super().changeform_view, request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().delete_view(request, *args, **kwargs)
+        return writes.run_in_transaction(super().delete_view, request, *args, **kwargs)
+
+    def changelist_view(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().changelist_view(request, *args, **kwargs)
+        return writes.run_in_transaction(super().changelist_view, request, *args, **kwargs)
+
 class BookInline(admin.TabularInline):
     model = Book
     extra = 1
     fields = ['book_name', 'price', 'checking', 'payment_date']
 
-class StudentAdmin(admin.ModelAdmin):
+    def get_queryset(self, request):
+        # 각 행 제목(Book.__str__)이 학생 이름을 쓰므로 함께 읽는다
+        return super().get_queryset(request).select_related('student')
+
+class StudentAdmin(RetryWritesMixin, admin.ModelAdmin):
     list_display = ('name', 'books_count', 'total_price_display')
     search_fields = ['name']
     inlines = [BookInline]
 
+    def get_queryset(self, request):
+        # 행마다 교재를 조회하지 않도록 목록 쿼리에서 함께 집계한다.
+        # JOIN + GROUP BY 대신 상관 서브쿼리를 쓰면 전체 건수(COUNT) 쿼리에는 붙지 않는다
+        books = Book.objects.filter(student=OuterRef('pk')).order_by().values('student')
+        return super().get_queryset(request).annotate(
+            books_total=Coalesce(Subquery(books.annotate(total=Count('id')).values('total')), 0),
+            price_total=Coalesce(Subquery(books.annotate(total=Sum('price')).values('total')), 0),
+        )
+
     def books_count(self, obj):
-        return obj.books.count()
+        return obj.books_total
     books_count.short_description = '미납상태인 교재 수'
+    books_count.admin_order_field = 'books_total'
 
     def total_price_display(self, obj):
-        total = sum(book.price for book in obj.books.all())
-        return format_html('<div style="text-align: right;">{}</div>', intcomma(total))
+        return format_html('<div style="text-align: right;">{}</div>', intcomma(obj.price_total))
     total_price_display.short_description = '합계'
+    total_price_display.admin_order_field = 'price_total'
+
+class StudentAutocompleteFilter(admin.SimpleListFilter):
+    """학생 전체를 사이드바에 나열하지 않고 자동완성으로 골라 거른다."""
+    title = '학생'
+    parameter_name = 'student__id__exact'
+    template = 'admin/textbook/student_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = forms.ModelChoiceField(
+            queryset=Student.objects.all(),
+            required=False,
+            widget=AutocompleteSelect(model._meta.get_field('student'), model_admin.admin_site),
+        )
 
-class BookAdmin(admin.ModelAdmin):
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(student_id=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': '전체',
+        }
+
+    def rendered_widget(self):
+        return self.field.widget.render(self.parameter_name, self.value(), attrs={'id': 'student-filter'})
+
+class BookAdmin(RetryWritesMixin, admin.ModelAdmin):
     list_display = ('student', 'book_name', 'input_date', 'price_display', 'checking', 'payment_status')
-    list_filter = ('student', 'checking',)
+    list_filter = (StudentAutocompleteFilter, 'checking',)
+    list_select_related = ('student',)
     search_fields = ['book_name', 'student__name']
     date_hierarchy = 'input_date'
     actions = ['mark_as_paid']
 
+    @property
+    def media(self):
+        # 학생 필터의 자동완성(select2) 스크립트
+        return super().media + AutocompleteSelect(Book._meta.get_field('student'), self.admin_site).media
+
     def price_display(self, obj):
         return format_html('<div style="text-align: right;">{}</div>', intcomma(obj.price))
     price_display.short_description = '가격'
@@ -55,10 +132,36 @@ class BookAdmin(admin.ModelAdmin):
     payment_status.short_description = '수납일'
 
     def mark_as_paid(self, request, queryset):
-        updated = queryset.update(payment_date=timezone.now(), checking=True)
+        updated = ledger.settle(queryset, timezone.now(), checking=True)
         self.message_user(request, f'{updated}개의 교재가 수납 완료로 표시되었습니다.')
     mark_as_paid.short_description = '선택된 교재를 수납 완료로 표시'
 
+class CatalogAdmin(RetryWritesMixin, admin.ModelAdmin):
+    list_display = ('name', 'price_display', 'issue_count', 'last_issued')
+    search_fields = ['name']
+    readonly_fields = ('issue_count', 'last_issued')
+
+    def price_display(self, obj):
+        return format_html('<div style="text-align: right;">{}</div>', intcomma(obj.price))
+    price_display.short_description = '현재 가격'
+
+class ArchivedBookAdmin(admin.ModelAdmin):
+    """보관된 교재 (textbook.archive). 조회만 한다"""
+    list_display = ('student', 'book_name', 'input_date', 'price_display', 'payment_date', 'archived_at')
+    list_select_related = ('student',)
+    search_fields = ['book_name', 'student__name']
+    date_hierarchy = 'input_date'
+
+    def price_display(self, obj):
+        return format_html('<div style="text-align: right;">{}</div>', intcomma(obj.price))
+    price_display.short_description = '가격'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 def is_superuser(user):
     return user.is_superuser
@@ -73,6 +176,8 @@ class CustomAdminSite(admin.AdminSite):
         custom_urls = [
             path('backup/', self.admin_view(self.backup_view), name='backup'),
             path('restore/', self.admin_view(self.restore_view), name='restore'),
+            path('write-stats/', self.admin_view(self.write_stats_view), name='write_stats'),
+            path('cache-stats/', self.admin_view(self.cache_stats_view), name='cache_stats'),
         ]
         return custom_urls + urls
 
@@ -96,22 +201,28 @@ class CustomAdminSite(admin.AdminSite):
         if request.method == 'POST':
             backup_file = request.POST.get('backup_file')
             try:
-                result = restore_database(backup_file)
+                # 이 요청 자신은 진행 중인 요청에서 제외하고 기다린다
+                result = restore_database(backup_file, held=1)
                 messages.success(request, result)
             except Exception as e:
                 messages.error(request, f"Restore failed: {str(e)}")
             return HttpResponseRedirect("../")
 
-        backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-        backups = sorted(
-            [f for f in os.listdir(backup_dir) if f.endswith('.json')],
-            key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)),
-            reverse=True
-        )
+        backups = list_backups()
         return render(request, 'admin/restore.html', {'backups': backups})
+
+    def write_stats_view(self, request):
+        # 이 프로세스의 쓰기 잠금 대기/재시도 횟수
+        return JsonResponse(writes.stats.as_dict())
+
+    def cache_stats_view(self, request):
+        # 이 프로세스의 페이지/조각 캐시 적중/실패 횟수 (textbook.page_cache)
+        return JsonResponse(page_cache.stats.as_dict())
     
 
 admin_site = CustomAdminSite(name='customadmin')
 admin_site.register(Student, StudentAdmin)
 admin_site.register(Book, BookAdmin)
+admin_site.register(Catalog, CatalogAdmin)
+admin_site.register(ArchivedBook, ArchivedBookAdmin)
 admin_site.register(User, UserAdmin)
\ No newline at end of file
@@ -5,3 +5,6 @@ class TextbookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'textbook'
     verbose_name = '교재관리'
+
+    def ready(self):
+        from . import signals  # noqa: F401
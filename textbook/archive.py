@@ -0,0 +1,78 @@
+"""
+오래된 납부 완료 교재 보관 (hot/archive 분리)
+
+book 테이블은 모든 교재를 계속 쌓지만 대시보드, 교재 검색, 학생 상세의 대부분은 미납이거나
+최근 교재만 본다. 수납한 지 ARCHIVE_HORIZON_DAYS 가 지난 교재를 같은 DB 의 book_archive
+(ArchivedBook)로 옮겨 book 테이블과 인덱스를 작게 유지한다.
+
+- archive() 는 batch_size 개씩 각각의 트랜잭션에서 옮긴다 (쓰기 잠금을 오래 잡지 않는다)
+- 옮긴 교재는 이미 납부했으므로 미납 원장은 그대로다. 월별 집계(rollups)와 원장 스냅샷은
+  보관 교재까지 포함하므로 옮길 때 시그널 없이 지운다
+- 전체 이력이 필요한 곳(학생 상세의 전체 이력, 보고서 'all', 교재 이력/수납 내역 내보내기)은
+  with_archive() 로 두 테이블을 UNION ALL 해서 읽는다
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import page_cache
+from .models import ArchivedBook, Book
+
+DEFAULT_HORIZON_DAYS = 365
+DEFAULT_BATCH_SIZE = 1000
+
+FIELDS = ('id', 'student_id', 'input_date', 'book_name', 'price', 'checking', 'payment_date')
+
+
+def horizon_days():
+    return getattr(settings, 'ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS)
+
+
+def cutoff(days=None, today=None):
+    """이 날짜보다 먼저 수납한 교재를 옮긴다."""
+    return (today or date.today()) - timedelta(days=horizon_days() if days is None else days)
+
+
+def candidates(before):
+    return Book.objects.filter(payment_date__lt=before)
+
+
+def _delete_books(book_ids):
+    # queryset.delete() 는 교재마다 post_delete 시그널을 보내 집계에서 빼 버리므로 직접 지운다
+    using = router.db_for_write(Book)
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {Book._meta.db_table} WHERE id IN ({placeholders})', book_ids)
+
+
+def archive(before, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """before 보다 먼저 수납한 교재를 batch_size 개씩 옮긴다. 옮긴 교재 수를 돌려준다.
+
+    progress(옮긴 누적 개수) 는 배치가 끝날 때마다 호출된다.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(candidates(before).order_by('id').values_list(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            archived_at = timezone.now()
+            ArchivedBook.objects.bulk_create([
+                ArchivedBook(**dict(zip(FIELDS, row)), archived_at=archived_at) for row in rows
+            ])
+            _delete_books([row[0] for row in rows])
+
+            # 학생 상세의 납부 완료 목록이 바뀐다 (보고서/스냅샷/집계는 보관 교재를 포함하므로 그대로).
+            # 캐시 버전은 DB 에 있으므로 같은 트랜잭션에서 올리면 웹 워커도 다음 요청에서 본다
+            page_cache.bump({row[1] for row in rows})
+        moved += len(rows)
+        if progress:
+            progress(moved)
+    return moved
+
+
+def with_archive(books, archived, fields, order_by):
+    """같은 조건의 book / book_archive 쿼리를 UNION ALL 로 합친 values_list. order_by 는 fields 중에서 고른다."""
+    return books.values_list(*fields).union(archived.values_list(*fields), all=True).order_by(*order_by)
@@ -0,0 +1,232 @@
+"""
+중복 제거 백업 저장소
+
+스냅샷을 고정 크기 청크(SQLite 페이지의 배수)로 나눠 SHA-256 이름으로 한 번만 저장하고,
+스냅샷마다 청크 목록(manifest)만 남긴다. 백업 사이에 바뀐 페이지가 들어 있는 청크만
+새로 쓰이므로 매시간 백업해도 디스크 사용량이 백업 횟수에 비례해 늘지 않는다.
+
+BACKUP_STORE_DIR (기본값: 홈 폴더의 .textbook_manager/backup_store, 소스 트리 밖)
+    chunks/ab/abcdef...   zlib 압축된 청크
+    snapshots/<id>.json   스냅샷 manifest
+"""
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+
+CHUNK_SIZE = 64 * 1024
+
+# 다른 백업이 막 재사용한 청크를 지우지 않도록, 이 시간(초) 안에 쓰이거나 재사용된 청크는 남긴다
+PRUNE_GRACE = 3600
+
+# 보관 단계: 최근 N개의 시간/일/주/월 마다 가장 최신 스냅샷 하나씩
+DEFAULT_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4, 'monthly': 12}
+
+RETENTION_BUCKETS = {
+    'hourly': lambda created: created.strftime('%Y%m%d%H'),
+    'daily': lambda created: created.strftime('%Y%m%d'),
+    'weekly': lambda created: '%d-%02d' % created.isocalendar()[:2],
+    'monthly': lambda created: created.strftime('%Y%m'),
+}
+
+SNAPSHOT_ID_FORMAT = '%Y%m%d-%H%M%S'
+
+# 청크는 DB 의 압축 사본이므로 git 저장소 안에 두지 않는다
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.textbook_manager', 'backup_store')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def store_dir():
+    return getattr(settings, 'BACKUP_STORE_DIR', DEFAULT_STORE_DIR)
+
+
+def _chunks_dir():
+    return os.path.join(store_dir(), 'chunks')
+
+
+def _snapshots_dir():
+    return os.path.join(store_dir(), 'snapshots')
+
+
+def _chunk_path(digest):
+    return os.path.join(_chunks_dir(), digest[:2], digest)
+
+
+def _manifest_path(snapshot_id):
+    return os.path.join(_snapshots_dir(), f"{snapshot_id}.json")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def add_snapshot(path, compress=True):
+    """파일을 스냅샷으로 저장한다. (manifest, 새로 쓴 청크 수, 새로 쓴 바이트 수)"""
+    os.makedirs(_snapshots_dir(), exist_ok=True)
+    level = 6 if compress else 0
+
+    snapshot_id = datetime.now().strftime(SNAPSHOT_ID_FORMAT)
+    suffix = 1
+    while os.path.exists(_manifest_path(snapshot_id)):
+        suffix += 1
+        snapshot_id = f"{datetime.now().strftime(SNAPSHOT_ID_FORMAT)}-{suffix}"
+
+    chunks = []
+    new_chunks = new_bytes = size = 0
+    file_digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                break
+            size += len(data)
+            file_digest.update(data)
+            digest = hashlib.sha256(data).hexdigest()
+            chunks.append(digest)
+
+            chunk_path = _chunk_path(digest)
+            try:
+                os.utime(chunk_path)  # 이미 있는 청크는 재사용 (prune 유예 시간 갱신)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                compressed = zlib.compress(data, level)
+                _write_atomic(chunk_path, compressed)
+                new_chunks += 1
+                new_bytes += len(compressed)
+
+    manifest = {
+        'id': snapshot_id,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'size': size,
+        'sha256': file_digest.hexdigest(),
+        'chunk_size': CHUNK_SIZE,
+        'chunks': chunks,
+    }
+    _write_atomic(_manifest_path(snapshot_id), json.dumps(manifest).encode('utf-8'))
+    return manifest, new_chunks, new_bytes
+
+
+def load_manifest(snapshot_id):
+    try:
+        with open(_manifest_path(snapshot_id), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"Snapshot not found: {snapshot_id}")
+
+
+def list_snapshots():
+    """manifest 목록 (최신순)"""
+    try:
+        names = os.listdir(_snapshots_dir())
+    except FileNotFoundError:
+        return []
+    manifests = [load_manifest(name[:-5]) for name in names if name.endswith('.json')]
+    return sorted(manifests, key=lambda manifest: manifest['created'], reverse=True)
+
+
+def _read_chunk(digest):
+    try:
+        with open(_chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+    except FileNotFoundError:
+        raise SnapshotError(f"Missing chunk {digest}")
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise SnapshotError(f"Corrupt chunk {digest}")
+    return data
+
+
+def restore_snapshot(snapshot_id, target_path):
+    """스냅샷을 target_path 에 다시 조립한다. 전체 해시가 맞지 않으면 SnapshotError"""
+    manifest = load_manifest(snapshot_id)
+    digest = hashlib.sha256()
+    tmp_path = f"{target_path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in manifest['chunks']:
+                data = _read_chunk(chunk)
+                digest.update(data)
+                f.write(data)
+        if digest.hexdigest() != manifest['sha256']:
+            raise SnapshotError(f"Checksum mismatch for snapshot {snapshot_id}")
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return manifest
+
+
+def verify_snapshot(snapshot_id):
+    """모든 청크를 읽어 스냅샷 전체 해시를 확인한다."""
+    manifest = load_manifest(snapshot_id)
+    digest = hashlib.sha256()
+    for chunk in manifest['chunks']:
+        digest.update(_read_chunk(chunk))
+    if digest.hexdigest() != manifest['sha256']:
+        raise SnapshotError(f"Checksum mismatch for snapshot {snapshot_id}")
+    return manifest
+
+
+def select_retained(manifests, retention=None):
+    """보관 정책에 따라 남길 스냅샷 id 집합"""
+    retention = retention or getattr(settings, 'BACKUP_RETENTION', DEFAULT_RETENTION)
+    newest_first = sorted(manifests, key=lambda manifest: manifest['created'], reverse=True)
+    keep = set()
+    if newest_first:
+        keep.add(newest_first[0]['id'])
+
+    for tier, count in retention.items():
+        bucket_of = RETENTION_BUCKETS[tier]
+        seen = set()
+        for manifest in newest_first:
+            if len(seen) >= count:
+                break
+            bucket = bucket_of(datetime.fromisoformat(manifest['created']))
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(manifest['id'])
+    return keep
+
+
+def prune(retention=None):
+    """보관 정책 밖의 스냅샷과 어디에서도 쓰지 않는 청크를 지운다. (지운 스냅샷 수, 지운 청크 수)"""
+    manifests = list_snapshots()
+    keep = select_retained(manifests, retention)
+
+    removed_snapshots = 0
+    referenced = set()
+    for manifest in manifests:
+        if manifest['id'] in keep:
+            referenced.update(manifest['chunks'])
+        else:
+            os.remove(_manifest_path(manifest['id']))
+            removed_snapshots += 1
+
+    removed_chunks = 0
+    cutoff = time.time() - PRUNE_GRACE
+    if os.path.isdir(_chunks_dir()):
+        for prefix in os.listdir(_chunks_dir()):
+            prefix_dir = os.path.join(_chunks_dir(), prefix)
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed_chunks += 1
+    return removed_snapshots, removed_chunks
+
+
+def disk_usage():
+    """저장소가 실제로 차지하는 바이트 수"""
+    total = 0
+    for root, _, files in os.walk(store_dir()):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
@@ -0,0 +1,73 @@
+"""
+교재 목록(Catalog)
+
+book 테이블의 모든 지급 이력을 훑는 대신, 교재명별 한 행만 가진 목록에서
+교재 지급 폼과 자동완성(get_books)이 순위가 매겨진 제한된 결과를 읽는다.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from . import archive
+from .models import ArchivedBook, Book, Catalog
+
+MAX_RESULTS = 20
+
+
+def record_issue(book_name, price, input_date, count=1):
+    """교재 지급을 목록에 반영한다. 가장 최근 지급일의 가격이 현재 가격이 된다."""
+    updated = Catalog.objects.filter(name=book_name).update(
+        issue_count=F('issue_count') + count,
+        price=Case(
+            When(last_issued__gt=input_date, then=F('price')),
+            default=Value(price),
+        ),
+        last_issued=Greatest(F('last_issued'), Value(input_date)),
+    )
+    if not updated:
+        Catalog.objects.create(
+            name=book_name, price=price, issue_count=count, last_issued=input_date
+        )
+
+
+def _ranked(term, limit):
+    catalog = Catalog.objects.all()
+    term = term.strip()
+    if term:
+        catalog = catalog.filter(name__icontains=term).annotate(
+            rank=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', '-issue_count', 'name')
+    return catalog.values_list('name', 'price')[:limit]
+
+
+def search(term='', limit=MAX_RESULTS):
+    """교재명 검색. 앞부분 일치 > 많이 지급된 순 > 이름 순으로 최대 limit 개"""
+    return [
+        {'book_name': name, 'price': price}
+        for name, price in _ranked(term, limit)
+    ]
+
+
+def rebuild():
+    """교재 목록을 book 과 book_archive 기준으로 다시 만든다 (bulk_create 로 교재를 넣은 뒤 등). 교재명 수를 돌려준다."""
+    entries = {}
+    # 보관된 교재도 지급 이력이므로 함께 센다 (빠뜨리면 보관된 교재만 있는 교재명이 목록에서 사라진다)
+    rows = archive.with_archive(
+        Book.objects.order_by(), ArchivedBook.objects.order_by(),
+        ('book_name', 'price', 'input_date', 'id'), ('input_date', 'id'),
+    )
+    for book_name, price, input_date, _ in rows.iterator(chunk_size=2000):
+        entry = entries.setdefault(book_name, Catalog(name=book_name, issue_count=0))
+        # 지급일 순으로 훑으므로 마지막 값이 현재 가격이 된다
+        entry.price = price
+        entry.last_issued = input_date
+        entry.issue_count += 1
+
+    with transaction.atomic():
+        Catalog.objects.all().delete()
+        Catalog.objects.bulk_create(entries.values(), batch_size=500)
+    return len(entries)
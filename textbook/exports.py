@@ -0,0 +1,213 @@
+"""
+CSV / XLSX 내보내기 (스트리밍)
+
+행을 .iterator(chunk_size=...) 로 조금씩 읽어 바로 내보내므로 전체 이력을 내보내도
+메모리 사용량이 일정하다. 뷰는 StreamingHttpResponse 로, export_data 명령은 파일로 쓴다.
+
+- balances: 학생별 미납 금액 (미납 원장)
+- ledger:   교재별 전체 이력 (학생 지정 가능)
+- payments: 수납일 기간별 수납 내역
+ledger 와 payments 는 보관된 교재(book_archive)까지 합쳐서 내보낸다 (textbook.archive).
+"""
+import csv
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from . import archive
+from .models import ArchivedBook, Book, Student
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def balances(**filters):
+    headers = ['학생 이름', '미납 금액', '미납 교재 수']
+    rows = (
+        Student.objects.filter(unpaid_amount__gt=0)
+        .order_by('name')
+        .values_list('name', 'unpaid_amount', 'unpaid_count')
+    )
+    return headers, rows
+
+
+def ledger(student=None, **filters):
+    headers = ['학생 이름', '지급일', '교재명', '가격', '확인', '수납일']
+    books = Book.objects.order_by()
+    archived = ArchivedBook.objects.order_by()
+    if student:
+        books = books.filter(student__name=student)
+        archived = archived.filter(student__name=student)
+    rows = archive.with_archive(
+        books, archived,
+        ('student__name', 'input_date', 'book_name', 'price', 'checking', 'payment_date'),
+        ('student__name', 'input_date', 'book_name'),
+    )
+    return headers, rows
+
+
+def payments(date_from=None, date_to=None, **filters):
+    headers = ['수납일', '학생 이름', '교재명', '지급일', '가격']
+    books = Book.objects.filter(payment_date__isnull=False).order_by()
+    archived = ArchivedBook.objects.order_by()
+    if date_from:
+        books = books.filter(payment_date__gte=date_from)
+        archived = archived.filter(payment_date__gte=date_from)
+    if date_to:
+        books = books.filter(payment_date__lte=date_to)
+        archived = archived.filter(payment_date__lte=date_to)
+    rows = archive.with_archive(
+        books, archived,
+        ('payment_date', 'student__name', 'book_name', 'input_date', 'price'),
+        ('payment_date', 'student__name', 'book_name'),
+    )
+    return headers, rows
+
+
+EXPORTS = {
+    'balances': ('미납 현황', 'unpaid_balances', balances),
+    'ledger': ('교재 이력', 'book_ledger', ledger),
+    'payments': ('수납 내역', 'payments', payments),
+}
+
+
+def filename(kind, fmt):
+    _, basename, _ = EXPORTS[kind]
+    return f"{basename}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if value is True or value is False:
+        return 'O' if value else ''
+    return value
+
+
+class _Buffer:
+    """쓴 내용을 모아 두었다가 꺼내 가는 쓰기 전용 파일 객체 (zipfile/csv 용)"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._chunks.append(data)
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_csv(headers, rows):
+    """엑셀에서 한글이 깨지지 않도록 UTF-8 BOM(utf-8-sig)을 붙여 CSV 를 조각으로 만든다."""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for count, row in enumerate(rows.iterator(chunk_size=CHUNK_SIZE), 1):
+        writer.writerow([_cell_text(value) for value in row])
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def _xlsx_cell(value):
+    value = _cell_text(value)
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def stream_xlsx(headers, rows, sheet_name='Sheet1'):
+    """시트 하나짜리 XLSX 를 조각으로 만든다 (openpyxl 없이, 공유 문자열 대신 inline 문자열).
+
+    출력이 되감을 수 없는 스트림이므로 zipfile 이 각 파일 뒤에 data descriptor 를 쓴다.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=escape(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        yield buffer.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(headers).encode('utf-8'))
+            for count, row in enumerate(rows.iterator(chunk_size=CHUNK_SIZE), 1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if count % ROWS_PER_WRITE == 0:
+                    yield buffer.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+def stream(kind, fmt, **filters):
+    """(내보내기 조각 generator, 파일 이름)"""
+    sheet_name, _, build = EXPORTS[kind]
+    headers, rows = build(**filters)
+    if fmt == 'xlsx':
+        chunks = stream_xlsx(headers, rows, sheet_name)
+    else:
+        chunks = stream_csv(headers, rows)
+    return chunks, filename(kind, fmt)
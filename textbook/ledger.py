@@ -0,0 +1,218 @@
+"""
+학생별 미납 원장
+
+Student.unpaid_amount / unpaid_count 와 LedgerTotal(전체 합계)을 Book 변경과
+같은 트랜잭션에서 증감시킨다. 대시보드는 book 테이블을 집계하지 않고 이 값을 읽는다.
+
+- Book.save()          -> signals.py 의 pre_save/post_save 에서 record_change()
+- Book 삭제(연쇄 삭제 포함) -> signals.py 의 post_delete 에서 record_delete()
+- queryset.update()    -> 시그널이 발생하지 않으므로 settle() 을 사용 (books_updated 시그널을 보낸다)
+- bulk_create()        -> 마찬가지로 issue() 를 사용
+월별 집계(textbook.rollups)도 같은 자리에서 함께 갱신된다.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.dispatch import Signal
+
+from . import catalog, page_cache, rollups
+from .models import Book, LedgerTotal, Student
+
+TOTAL_PK = 1
+
+# queryset.update()/bulk_create() 로 교재가 바뀐 뒤 보낸다. sender=Book, student_ids=영향받은 학생 id 집합
+books_updated = Signal()
+
+
+def contribution(price, payment_date):
+    """교재 한 권이 원장에 더하는 (금액, 권수)"""
+    if payment_date is None:
+        return price or 0, 1
+    return 0, 0
+
+
+def apply_deltas(deltas):
+    """{student_id: (금액, 권수)} 만큼 학생 잔액과 전체 합계를 증감한다."""
+    total_amount = total_count = 0
+    # 증감이 같은 학생끼리 묶어 UPDATE 한 번으로 처리한다 (일괄 지급은 모두 같은 값)
+    groups = defaultdict(list)
+    for student_id, (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        groups[amount, count].append(student_id)
+        total_amount += amount
+        total_count += count
+
+    for (amount, count), student_ids in groups.items():
+        Student.objects.filter(pk__in=student_ids).update(
+            unpaid_amount=F('unpaid_amount') + amount,
+            unpaid_count=F('unpaid_count') + count,
+        )
+
+    if total_amount or total_count:
+        updated = LedgerTotal.objects.filter(pk=TOTAL_PK).update(
+            unpaid_amount=F('unpaid_amount') + total_amount,
+            unpaid_count=F('unpaid_count') + total_count,
+        )
+        if not updated:
+            # 합계 행이 없으면 (새 DB 등) 원장 전체를 다시 계산한다
+            rebuild()
+
+
+def snapshot(book_id):
+    """저장 전 DB에 있던 (student_id, price, payment_date)"""
+    return Book.objects.filter(pk=book_id).values_list(
+        'student_id', 'price', 'payment_date'
+    ).first()
+
+
+def record_change(previous, book):
+    """previous: 저장 전 snapshot() 결과 (새 교재면 None)"""
+    deltas = defaultdict(lambda: (0, 0))
+
+    if previous is not None:
+        old_student_id, old_price, old_payment_date = previous
+        amount, count = contribution(old_price, old_payment_date)
+        deltas[old_student_id] = (-amount, -count)
+
+    amount, count = contribution(book.price, book.payment_date)
+    prev_amount, prev_count = deltas[book.student_id]
+    deltas[book.student_id] = (prev_amount + amount, prev_count + count)
+
+    apply_deltas(deltas)
+
+
+def record_delete(book):
+    amount, count = contribution(book.price, book.payment_date)
+    apply_deltas({book.student_id: (-amount, -count)})
+
+
+def unpaid_by_student(queryset):
+    """queryset 중 미납 교재의 학생별 (금액, 권수)"""
+    rows = (
+        queryset.filter(payment_date__isnull=True)
+        .order_by()
+        .values('student_id')
+        .annotate(amount=Sum('price'), count=Count('id'))
+    )
+    return {row['student_id']: (row['amount'] or 0, row['count']) for row in rows}
+
+
+def settle(queryset, payment_date, **fields):
+    """queryset 의 교재를 수납 처리하고 원장을 같은 트랜잭션에서 갱신한다."""
+    with transaction.atomic():
+        settled = unpaid_by_student(queryset)
+        before = list(queryset.order_by().values_list(*rollups.ROW_FIELDS))
+        student_ids = {row[0] for row in before}
+        updated = queryset.update(payment_date=payment_date, **fields)
+        rollups.record_rows(before, [(*row[:-1], payment_date) for row in before])
+        apply_deltas({
+            student_id: (-amount, -count)
+            for student_id, (amount, count) in settled.items()
+        })
+        books_updated.send(sender=Book, student_ids=student_ids)
+    return updated
+
+
+def issue(book_name, price, input_date, student_ids):
+    """같은 교재를 여러 학생에게 한 번의 bulk_create 로 지급하고 원장과 교재 목록을 같은 트랜잭션에서 갱신한다.
+
+    학생별 결과 {student_id: (상태, Book 또는 None)} 를 돌려준다.
+    상태: 'issued', 'duplicate'(같은 날 같은 교재를 이미 지급), 'not_found'
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    with transaction.atomic():
+        existing = set(Student.objects.filter(pk__in=student_ids).values_list('id', flat=True))
+        duplicates = set(
+            Book.objects.filter(
+                student_id__in=existing, book_name=book_name, input_date=input_date
+            ).values_list('student_id', flat=True)
+        )
+        books = Book.objects.bulk_create([
+            Book(book_name=book_name, price=price, input_date=input_date, student_id=student_id)
+            for student_id in student_ids
+            if student_id in existing and student_id not in duplicates
+        ])
+
+        if books:
+            apply_deltas({book.student_id: contribution(price, None) for book in books})
+            catalog.record_issue(book_name, price, input_date, count=len(books))
+            rollups.record_issue(books)
+            books_updated.send(sender=Book, student_ids={book.student_id for book in books})
+
+    issued = {book.student_id: book for book in books}
+    results = {}
+    for student_id in student_ids:
+        if student_id in issued:
+            results[student_id] = ('issued', issued[student_id])
+        elif student_id in duplicates:
+            results[student_id] = ('duplicate', None)
+        else:
+            results[student_id] = ('not_found', None)
+    return results
+
+
+def get_total():
+    """(전체 미납 금액, 전체 미납 교재 수)"""
+    total = LedgerTotal.objects.filter(pk=TOTAL_PK).values_list(
+        'unpaid_amount', 'unpaid_count'
+    ).first()
+    return total or (0, 0)
+
+
+def compute_balances():
+    """book 테이블에서 직접 계산한 학생별 (금액, 권수)"""
+    return unpaid_by_student(Book.objects.all())
+
+
+def verify():
+    """원장과 실제 집계가 다른 항목 목록을 돌려준다. [(대상, 원장 값, 실제 값)]"""
+    expected = compute_balances()
+    mismatches = []
+
+    for student_id, name, amount, count in Student.objects.values_list(
+        'id', 'name', 'unpaid_amount', 'unpaid_count'
+    ):
+        actual = expected.get(student_id, (0, 0))
+        if (amount, count) != actual:
+            mismatches.append((name, (amount, count), actual))
+
+    actual_total = (
+        sum(amount for amount, _ in expected.values()),
+        sum(count for _, count in expected.values()),
+    )
+    stored_total = LedgerTotal.objects.filter(pk=TOTAL_PK).values_list(
+        'unpaid_amount', 'unpaid_count'
+    ).first()
+    if stored_total != actual_total:
+        mismatches.append(('전체 합계', stored_total, actual_total))
+
+    return mismatches
+
+
+def rebuild():
+    """원장을 book 테이블 기준으로 다시 계산한다. 변경된 학생 수를 돌려준다."""
+    with transaction.atomic():
+        expected = compute_balances()
+        changed = 0
+        for student_id, amount, count in Student.objects.values_list(
+            'id', 'unpaid_amount', 'unpaid_count'
+        ):
+            actual = expected.get(student_id, (0, 0))
+            if (amount, count) != actual:
+                Student.objects.filter(pk=student_id).update(
+                    unpaid_amount=actual[0], unpaid_count=actual[1]
+                )
+                changed += 1
+
+        LedgerTotal.objects.update_or_create(
+            pk=TOTAL_PK,
+            defaults={
+                'unpaid_amount': sum(amount for amount, _ in expected.values()),
+                'unpaid_count': sum(count for _, count in expected.values()),
+            },
+        )
+        # 시그널 없이 잔액을 바꿨으므로 모든 화면 캐시를 무효화한다
+        page_cache.bump_all()
+    return changed
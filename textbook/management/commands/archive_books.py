@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from textbook import archive
+from textbook.models import ArchivedBook, Book
+
+class Command(BaseCommand):
+    help = ('Move books paid more than the archive horizon ago from the book table '
+            'into book_archive, in batches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive books paid more than this many days ago '
+                                 '(default: settings.ARCHIVE_HORIZON_DAYS)')
+        parser.add_argument('--batch-size', type=int,
+                            help='Books moved per transaction (default: settings.ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many books would be archived')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else archive.horizon_days()
+        batch_size = options['batch_size'] or getattr(settings, 'ARCHIVE_BATCH_SIZE', archive.DEFAULT_BATCH_SIZE)
+        if days < 0 or batch_size < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1')
+
+        before = archive.cutoff(days)
+        pending = archive.candidates(before).count()
+        self.stdout.write(f"{pending} book(s) paid before {before:%Y-%m-%d} to archive")
+        if options['dry_run'] or not pending:
+            return
+
+        moved = archive.archive(
+            before, batch_size,
+            progress=lambda moved: self.stdout.write(f"  {moved}/{pending} archived"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} book(s): book has {Book.objects.count()}, "
+            f"book_archive has {ArchivedBook.objects.count()}"
+        ))
@@ -6,6 +6,10 @@ from textbook.utils import backup_database
 class Command(BaseCommand):
     help = 'Backup the database'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--no-compress', action='store_false', dest='compress', default=None,
+                            help='Store new chunks uncompressed (default: settings.BACKUP_COMPRESS)')
+
     def handle(self, *args, **kwargs):
-        result = backup_database()
+        result = backup_database(compress=kwargs['compress'])
         self.stdout.write(self.style.SUCCESS(result))
\ No newline at end of file
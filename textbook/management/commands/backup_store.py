@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from textbook import backup_store
+
+class Command(BaseCommand):
+    help = 'List, verify, prune or restore snapshots in the deduplicated backup store'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+        subparsers.add_parser('list', help='List retained snapshots')
+        verify = subparsers.add_parser('verify', help='Re-read every chunk and check snapshot checksums')
+        verify.add_argument('snapshot', nargs='?', help='Snapshot id (default: all)')
+        subparsers.add_parser('prune', help='Apply the retention policy and drop unreferenced chunks')
+        restore = subparsers.add_parser('restore', help='Reassemble a snapshot into a file')
+        restore.add_argument('snapshot')
+        restore.add_argument('target', help='Output path (the live database is not touched)')
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action == 'list':
+            snapshots = backup_store.list_snapshots()
+            for manifest in snapshots:
+                self.stdout.write(f"{manifest['id']}  {manifest['created']}  {manifest['size']:>12,} bytes  {len(manifest['chunks'])} chunks")
+            logical = sum(manifest['size'] for manifest in snapshots)
+            self.stdout.write(f"{len(snapshots)} snapshot(s), {logical:,} bytes logical, {backup_store.disk_usage():,} bytes on disk")
+
+        elif action == 'verify':
+            ids = [options['snapshot']] if options['snapshot'] else [m['id'] for m in backup_store.list_snapshots()]
+            failed = 0
+            for snapshot_id in ids:
+                try:
+                    backup_store.verify_snapshot(snapshot_id)
+                    self.stdout.write(f"{snapshot_id}: OK")
+                except backup_store.SnapshotError as e:
+                    failed += 1
+                    self.stderr.write(f"{snapshot_id}: {e}")
+            if failed:
+                raise CommandError(f"{failed} snapshot(s) failed verification")
+            self.stdout.write(self.style.SUCCESS(f"{len(ids)} snapshot(s) verified"))
+
+        elif action == 'prune':
+            removed_snapshots, removed_chunks = backup_store.prune()
+            self.stdout.write(self.style.SUCCESS(f"Removed {removed_snapshots} snapshot(s) and {removed_chunks} chunk(s)"))
+
+        elif action == 'restore':
+            try:
+                manifest = backup_store.restore_snapshot(options['snapshot'], options['target'])
+            except backup_store.SnapshotError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"Snapshot {manifest['id']} restored to {options['target']} ({manifest['size']:,} bytes)"))
@@ -0,0 +1,195 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from textbook.sqlite_profile import PROFILES, apply_profile, get_profile
+from textbook.utils import online_backup
+
+# 대시보드와 학생 상세 화면이 실행하는 쿼리
+DASHBOARD_SQL = (
+    'SELECT id, name, unpaid_amount FROM student WHERE unpaid_amount > 0 ORDER BY name LIMIT 20',
+    'SELECT COUNT(*) FROM student WHERE unpaid_amount > 0',
+    'SELECT unpaid_amount, unpaid_count FROM ledger_total WHERE id = 1',
+)
+DETAIL_SQL = (
+    'SELECT id, input_date, book_name, price, checking FROM book '
+    'WHERE student_id = ? AND payment_date IS NULL ORDER BY input_date DESC'
+)
+
+# 교재 지급과 같은 쓰기: 교재 추가와 원장 갱신을 한 트랜잭션으로
+INSERT_BOOK_SQL = 'INSERT INTO book (input_date, book_name, price, checking, student_id) VALUES (?, ?, ?, 0, ?)'
+UPDATE_STUDENT_SQL = 'UPDATE student SET unpaid_amount = unpaid_amount + ?, unpaid_count = unpaid_count + 1 WHERE id = ?'
+UPDATE_TOTAL_SQL = 'UPDATE ledger_total SET unpaid_amount = unpaid_amount + ?, unpaid_count = unpaid_count + 1 WHERE id = 1'
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Worker:
+    """연결을 재사용하거나(persistent) 작업마다 새로 연결한다(per-request, 예전 방식)."""
+
+    def __init__(self, path, profile, persistent):
+        self.path = path
+        self.profile = profile
+        self.persistent = persistent
+        self._conn = None
+
+    def connect(self):
+        if self._conn is not None:
+            return self._conn
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        apply_profile(conn, self.profile)
+        if self.persistent:
+            self._conn = conn
+        return conn
+
+    def done(self, conn):
+        if not self.persistent:
+            conn.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Compare read/write latency of SQLite connection profiles on a copy of the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['legacy', 'performance'],
+                            help=f"Profiles to compare (built in: {', '.join(PROFILES)})")
+        parser.add_argument('--duration', type=float, default=3.0,
+                            help='Seconds to run each case (default: 3)')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Concurrent reader threads (default: 4)')
+
+    def handle(self, *args, **options):
+        source = str(settings.DATABASES['default']['NAME'])
+        conn = sqlite3.connect(source)
+        try:
+            student_ids = [row[0] for row in conn.execute('SELECT id FROM student')]
+        finally:
+            conn.close()
+
+        self.stdout.write(
+            f"{'profile':<12} {'connections':<12} {'reads/s':>8} {'read p50':>9} {'read p95':>9} "
+            f"{'writes/s':>9} {'write p50':>10} {'write p95':>10} {'locked':>7}"
+        )
+        results = {}
+        for name in options['profiles']:
+            profile = get_profile(name)
+            for persistent in (False, True):
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = os.path.join(tmp_dir, 'benchmark.db')
+                    online_backup(source, path)
+                    result = self.run_case(path, profile, persistent, student_ids, options)
+                label = 'persistent' if persistent else 'per-request'
+                results[name, label] = result
+                self.stdout.write(
+                    f"{name:<12} {label:<12} {result['reads']:>8.0f} {result['read_p50']:>7.2f}ms "
+                    f"{result['read_p95']:>7.2f}ms {result['writes']:>9.0f} {result['write_p50']:>8.2f}ms "
+                    f"{result['write_p95']:>8.2f}ms {result['locked']:>7}"
+                )
+
+        old = results.get(('legacy', 'per-request'))
+        new = results.get((options['profiles'][-1], 'persistent'))
+        if old and new and new['read_p95'] and new['write_p95']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{options['profiles'][-1]}/persistent vs legacy/per-request: "
+                f"read p95 {old['read_p95'] / new['read_p95']:.1f}x, "
+                f"write p95 {old['write_p95'] / new['write_p95']:.1f}x, "
+                f"reads/s {new['reads'] / max(old['reads'], 1):.1f}x"
+            ))
+
+    def run_case(self, path, profile, persistent, student_ids, options):
+        # 복사본의 저널 모드를 프로필에 맞춘다 (WAL 설정은 파일에 남는다)
+        conn = sqlite3.connect(path, isolation_level=None)
+        apply_profile(conn, profile)
+        conn.close()
+
+        deadline = time.perf_counter() + options['duration']
+        read_samples, write_samples = [], []
+        locked = [0]
+        lock = threading.Lock()
+
+        def reader():
+            worker = Worker(path, profile, persistent)
+            samples = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                conn = None
+                try:
+                    conn = worker.connect()
+                    for sql in DASHBOARD_SQL:
+                        conn.execute(sql).fetchall()
+                    conn.execute(DETAIL_SQL, (random.choice(student_ids),)).fetchall()
+                    worker.done(conn)
+                except sqlite3.OperationalError:
+                    if conn is not None:
+                        worker.done(conn)
+                    with lock:
+                        locked[0] += 1
+                    continue
+                samples.append((time.perf_counter() - started) * 1000)
+            worker.close()
+            with lock:
+                read_samples.extend(samples)
+
+        def writer():
+            worker = Worker(path, profile, persistent)
+            samples = []
+            today = date.today().isoformat()
+            while time.perf_counter() < deadline:
+                student_id = random.choice(student_ids)
+                price = random.randint(5, 30) * 1000
+                started = time.perf_counter()
+                conn = None
+                try:
+                    conn = worker.connect()
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute(INSERT_BOOK_SQL, (today, 'benchmark', price, student_id))
+                    conn.execute(UPDATE_STUDENT_SQL, (price, student_id))
+                    conn.execute(UPDATE_TOTAL_SQL, (price,))
+                    conn.execute('COMMIT')
+                    worker.done(conn)
+                except sqlite3.OperationalError:
+                    if conn is not None:
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        worker.done(conn)
+                    with lock:
+                        locked[0] += 1
+                    continue
+                samples.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.005)  # 교사가 연달아 지급하는 정도의 간격
+            worker.close()
+            with lock:
+                write_samples.extend(samples)
+
+        threads = [threading.Thread(target=reader) for _ in range(max(1, options['readers']))]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        duration = options['duration']
+        return {
+            'reads': len(read_samples) / duration,
+            'read_p50': percentile(read_samples, 50),
+            'read_p95': percentile(read_samples, 95),
+            'writes': len(write_samples) / duration,
+            'write_p50': percentile(write_samples, 50),
+            'write_p95': percentile(write_samples, 95),
+            'locked': locked[0],
+        }
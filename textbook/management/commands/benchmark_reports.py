@@ -0,0 +1,61 @@
+import statistics
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from textbook.models import Student
+from textbook.reports import REPORT_TYPES, ReportRenderer, get_renderer, register_fonts
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Compare per-report latency of a cold renderer (per-request setup) against the shared warm renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', help='Student name (default: the student with the most books)')
+        parser.add_argument('--type', choices=REPORT_TYPES, default='all', dest='report_type')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['student']:
+            students = students.filter(name=options['student'])
+        student = students.annotate(book_total=Count('books')).order_by('-book_total').first()
+        if student is None:
+            raise CommandError('No student found')
+
+        books = list(student.books.all())
+        report_type = options['report_type']
+        iterations = max(1, options['iterations'])
+
+        def cold():
+            # 이전 방식: 요청마다 폰트 파싱과 스타일 생성
+            register_fonts(force=True)
+            ReportRenderer().render(student.name, books, report_type, BytesIO())
+
+        def warm():
+            get_renderer().render(student.name, books, report_type, BytesIO())
+
+        warm()  # 공유 렌더러 준비
+        results = {}
+        for label, func in (('cold', cold), ('warm', warm)):
+            samples = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[label] = samples
+            self.stdout.write(
+                f"{label}: mean {statistics.mean(samples):.1f}ms "
+                f"p50 {percentile(samples, 50):.1f}ms p95 {percentile(samples, 95):.1f}ms"
+            )
+
+        speedup = statistics.mean(results['cold']) / statistics.mean(results['warm'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{student.name} ({len(books)} books, type={report_type}): warm renderer is {speedup:.2f}x faster"
+        ))
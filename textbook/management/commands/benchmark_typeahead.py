@@ -0,0 +1,188 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from textbook import typeahead
+from textbook.models import Catalog, Student
+
+ENDPOINTS = {
+    'sync': {'students': '/textbook/search-students/', 'books': '/textbook/get-books/'},
+    'async': {'students': '/textbook/api/typeahead/students/', 'books': '/textbook/api/typeahead/books/'},
+}
+PARAMS = {'students': 'query', 'books': 'term'}
+
+
+async def asgi_get(path, params):
+    """bookstore.asgi.application 에 GET 요청 하나를 ASGI 로 보내고 status 를 돌려준다."""
+    from bookstore.asgi import application
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': urlencode(params).encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    disconnected = asyncio.Event()  # 연결은 끊기지 않는다
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Compare sync typeahead views on a fixed worker pool (WSGI) with the async views served by '
+            'the project ASGI application on one event loop, under many concurrent typing users')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Concurrent typing users (default: 50)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Worker threads for the sync run (default: 4)')
+        parser.add_argument('--words', type=int, default=3, help='Words typed per user (default: 3)')
+        parser.add_argument('--interval', type=float, default=80,
+                            help='Milliseconds between keystrokes (default: 80)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        words = {
+            'students': list(Student.objects.values_list('name', flat=True)[:500]),
+            'books': list(Catalog.objects.values_list('name', flat=True)[:500]),
+        }
+        if not words['students'] or not words['books']:
+            raise CommandError('Need students and catalog entries (run generate_data first)')
+
+        self.stdout.write(
+            f"{options['users']} users x {options['words']} words, keystroke every {options['interval']:.0f}ms, "
+            f"sync workers={options['workers']}"
+        )
+        self.stdout.write(
+            f"{'mode':<6} {'requests':>8} {'req/s':>7} {'p50':>9} {'p95':>9} "
+            f"{'final p50':>10} {'final p95':>10} {'superseded':>10} {'threads':>7}"
+        )
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                self.asgi_server() as asgi_loop:
+            for mode in ('sync', 'async'):
+                typeahead.stats.reset()
+                result = asyncio.run(self.run(mode, words, options, asgi_loop))
+                results[mode] = result
+                self.stdout.write(
+                    f"{mode:<6} {result['requests']:>8} {result['throughput']:>7.0f} "
+                    f"{result['p50']:>7.2f}ms {result['p95']:>7.2f}ms "
+                    f"{result['final_p50']:>8.2f}ms {result['final_p95']:>8.2f}ms "
+                    f"{result['superseded']:>10} {result['threads']:>7}"
+                )
+
+        sync, async_ = results['sync'], results['async']
+        self.stdout.write(
+            f"final-result p95: sync {sync['final_p95']:.2f}ms, async {async_['final_p95']:.2f}ms; "
+            f"peak threads {sync['threads']} -> {async_['threads']}; "
+            f"superseded requests dropped by async: {async_['superseded']}"
+        )
+
+    @contextmanager
+    def asgi_server(self):
+        """ASGI 서버처럼 별도 스레드의 이벤트 루프 하나를 돌린다 (부하 발생기와 루프를 나누기 위해)."""
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name='asgi-server', daemon=True)
+        thread.start()
+        try:
+            yield loop
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    async def run(self, mode, words, options, asgi_loop):
+        rng = random.Random(options['seed'])
+        interval = options['interval'] / 1000
+        latencies, finals = [], []
+        superseded = [0]
+        peak_threads = [threading.active_count()]
+
+        pool = ThreadPoolExecutor(max_workers=max(1, options['workers']))
+        local = threading.local()
+
+        def sync_get(path, params):
+            # WSGI 워커 한 개: 요청이 끝날 때까지 스레드를 잡는다
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            return client.get(path, params).status_code
+
+        async def request(path, params):
+            started = time.perf_counter()
+            if mode == 'sync':
+                status = await asyncio.get_running_loop().run_in_executor(pool, sync_get, path, params)
+            else:
+                # 서버 이벤트 루프(별도 스레드)에서 bookstore.asgi.application 이 처리한다
+                future = asyncio.run_coroutine_threadsafe(asgi_get(path, params), asgi_loop)
+                status = await asyncio.wrap_future(future)
+            elapsed = (time.perf_counter() - started) * 1000
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            if status == 204:
+                superseded[0] += 1
+            elif status != 200:
+                raise CommandError(f'{path} returned {status}')
+            latencies.append(elapsed)
+            return elapsed
+
+        async def user(number):
+            kind = 'students' if number % 2 == 0 else 'books'
+            path = ENDPOINTS[mode][kind]
+            client_id = f'user{number}'
+            await asyncio.sleep(rng.random() * interval)  # 시작 시점을 흩뜨린다
+            for _ in range(options['words']):
+                word = rng.choice(words[kind])
+                pending = []
+                for length in range(1, len(word) + 1):
+                    # 이전 응답을 기다리지 않고 키를 누른다 (select2 가 이전 요청을 버리는 것과 같다)
+                    params = {PARAMS[kind]: word[:length], 'client': client_id}
+                    pending.append(asyncio.ensure_future(request(path, params)))
+                    await asyncio.sleep(interval)
+                done = await asyncio.gather(*pending)
+                finals.append(done[-1])  # 사용자가 실제로 보는 마지막 입력의 결과
+                await asyncio.sleep(interval * 5)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(user(number) for number in range(options['users'])))
+        finally:
+            pool.shutdown()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': len(latencies),
+            'throughput': len(latencies) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'final_p50': percentile(finals, 50),
+            'final_p95': percentile(finals, 95),
+            'superseded': superseded[0],
+            'threads': peak_threads[0],
+        }
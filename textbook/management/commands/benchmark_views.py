@@ -0,0 +1,211 @@
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from textbook import page_cache
+from textbook.models import Book, Student
+from textbook.search import student_index
+from textbook.utils import online_backup
+
+BENCHMARK_USER = 'benchmark'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def build_cases():
+    """[(이름, method, 경로, 데이터, 기대 status)] 현재 데이터에서 대표 학생/교재를 골라 만든다."""
+    student = Student.objects.annotate(book_total=Count('books')).order_by('-book_total', 'id').first()
+    if student is None:
+        raise CommandError('No students to benchmark (run generate_data first)')
+    book_name = Book.objects.values_list('book_name', flat=True).order_by('-id').first() or ''
+
+    return [
+        ('dashboard', 'get', '/textbook/dashboard/', {}, 200),
+        ('dashboard_search', 'get', '/textbook/dashboard/', {'search': student.name[0]}, 200),
+        ('dashboard_api', 'get', '/textbook/api/dashboard/', {}, 200),
+        ('analytics', 'get', '/textbook/analytics/', {}, 200),
+        ('student_detail', 'get', f'/textbook/student/{student.id}/', {}, 200),
+        ('search_students', 'get', '/textbook/search-students/', {'query': student.name[:2]}, 200),
+        ('get_books', 'get', '/textbook/get-books/', {'term': book_name.split()[0] if book_name else ''}, 200),
+        ('issue_book_form', 'get', '/textbook/issue-book/', {'student_id': student.id}, 200),
+        ('issue_book', 'post', '/textbook/issue-book/', {
+            'student_id': student.id, 'book_name': 'benchmark', 'price': '10,000',
+            'issue_date': date.today().isoformat(),
+        }, 302),
+        ('generate_report', 'get', f'/textbook/report/{student.id}/', {'type': 'all'}, 200),
+        ('admin_student_changelist', 'get', '/admin/textbook/student/', {}, 200),
+        ('admin_book_changelist', 'get', '/admin/textbook/book/', {}, 200),
+        ('admin_catalog_changelist', 'get', '/admin/textbook/catalog/', {}, 200),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Time every view through the test client (query count, p50/p95 latency) '
+            'and write or compare a JSON baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Measured requests per view (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Unmeasured requests per view first (default: 2)')
+        parser.add_argument('--only', nargs='+', help='Only run these cases')
+        parser.add_argument('--output', help='Write the results as a JSON baseline to this file')
+        parser.add_argument('--compare', help='Compare against a previous JSON baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown vs the baseline before flagging (default: 0.25)')
+        parser.add_argument('--min-delta', type=float, default=1.0,
+                            help='Ignore p95 slowdowns smaller than this many ms (default: 1.0)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any case regressed')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database inside a rolled back transaction '
+                                 'instead of a copy (writes never commit)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        with self.database(options['in_place']):
+            result = self.run(options)
+
+        regressions = self.report(result, baseline, options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+            self.stdout.write(f"Baseline written to {options['output']}")
+
+        if baseline is None:
+            return
+        if regressions:
+            message = f"{len(regressions)} regression(s) vs {options['compare']}: {', '.join(regressions)}"
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"No regressions vs {options['compare']}"))
+
+    @contextmanager
+    def database(self, in_place):
+        """쓰기(issue_book 등)가 운영 DB 에 남지 않도록 복사본이나 되돌릴 트랜잭션에서 실행한다."""
+        student_index.invalidate()
+        page_cache.clear()
+        try:
+            if in_place:
+                with transaction.atomic():
+                    yield
+                    transaction.set_rollback(True)
+                return
+
+            settings_dict = connection.settings_dict
+            source = str(settings_dict['NAME'])
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'benchmark.db')
+                online_backup(source, path)
+                connection.close()
+                settings_dict['NAME'] = path
+                try:
+                    yield
+                finally:
+                    connection.close()
+                    settings_dict['NAME'] = source
+        finally:
+            student_index.invalidate()
+            page_cache.clear()
+
+    def run(self, options):
+        cases = build_cases()
+        if options['only']:
+            unknown = set(options['only']) - {case[0] for case in cases}
+            if unknown:
+                raise CommandError(f"Unknown case(s): {', '.join(sorted(unknown))}")
+            cases = [case for case in cases if case[0] in options['only']]
+
+        user = User.objects.filter(username=BENCHMARK_USER).first()
+        if user is None:
+            user = User.objects.create_superuser(BENCHMARK_USER, password=None)
+        client = Client()
+        client.force_login(user)
+
+        iterations = max(1, options['iterations'])
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, method, path, data, expected in cases:
+                request = getattr(client, method)
+                for _ in range(max(0, options['warmup'])):
+                    request(path, data)
+
+                samples, queries = [], []
+                for _ in range(iterations):
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = request(path, data)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                        samples.append((time.perf_counter() - started) * 1000)
+                    queries.append(len(captured))
+                    if response.status_code != expected:
+                        raise CommandError(f"{name}: {method.upper()} {path} returned {response.status_code}")
+
+                results[name] = {
+                    'method': method.upper(),
+                    'path': path,
+                    'queries': max(queries),
+                    'p50_ms': round(percentile(samples, 50), 2),
+                    'p95_ms': round(percentile(samples, 95), 2),
+                    'mean_ms': round(statistics.mean(samples), 2),
+                }
+
+        return {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'data': {
+                'students': Student.objects.count(),
+                'books': Book.objects.count(),
+                'unpaid_students': Student.objects.filter(unpaid_amount__gt=0).count(),
+            },
+            'iterations': iterations,
+            'cases': results,
+        }
+
+    def report(self, result, baseline, options):
+        data = result['data']
+        self.stdout.write(
+            f"{data['students']} students, {data['books']} books, {result['iterations']} iterations per view"
+        )
+        self.stdout.write(f"{'case':<26} {'queries':>7} {'p50':>9} {'p95':>9}  baseline")
+
+        regressions = []
+        for name, case in result['cases'].items():
+            line = f"{name:<26} {case['queries']:>7} {case['p50_ms']:>7.2f}ms {case['p95_ms']:>7.2f}ms"
+            old = (baseline or {}).get('cases', {}).get(name)
+            if old:
+                ratio = case['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 1
+                line += f"  queries {old['queries']} -> {case['queries']}, p95 {ratio:.2f}x"
+                slower = ratio > 1 + options['tolerance'] and case['p95_ms'] - old['p95_ms'] > options['min_delta']
+                if case['queries'] > old['queries'] or slower:
+                    regressions.append(name)
+                    line += '  REGRESSION'
+            elif baseline:
+                line += '  (new)'
+            self.stdout.write(line)
+        return regressions
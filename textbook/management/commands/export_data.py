@@ -0,0 +1,44 @@
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from textbook import exports
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date (expected YYYY-MM-DD): {value}")
+
+
+class Command(BaseCommand):
+    help = 'Export unpaid balances, the full book ledger or payments to CSV/XLSX (streamed, constant memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=exports.EXPORTS, help='What to export')
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv', dest='fmt')
+        parser.add_argument('--output', help='Output file (default: <kind>_<timestamp>.<format> in the current directory)')
+        parser.add_argument('--student', help='ledger: only this student')
+        parser.add_argument('--from', dest='date_from', type=parse_date, help='payments: first payment date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=parse_date, help='payments: last payment date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        chunks, filename = exports.stream(
+            options['kind'], options['fmt'],
+            student=options['student'], date_from=options['date_from'], date_to=options['date_to'],
+        )
+        path = options['output'] or filename
+        tmp_path = f"{path}.tmp"
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {options['kind']} to {path} ({size:,} bytes)"))
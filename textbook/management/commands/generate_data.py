@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from textbook import synthetic
+from textbook.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic students and books (Korean names and titles) for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2760,
+                            help='Students to add (default: 2760, about 10x the current data)')
+        parser.add_argument('--books-per-student', type=float, default=6,
+                            help='Average books per student (default: 6)')
+        parser.add_argument('--paid-ratio', type=float, default=0.6,
+                            help='Fraction of books already paid (default: 0.6)')
+        parser.add_argument('--titles', type=int, default=300,
+                            help='Distinct book titles (default: 300)')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Spread issue dates over this many past days (default: 730)')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete ALL existing students and books first')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation before --clear')
+        parser.add_argument('--database', dest='database_path', metavar='PATH',
+                            help='Write into this SQLite file instead of the configured database '
+                                 '(created and migrated if needed)')
+        parser.add_argument('--yes', action='store_true',
+                            help='Confirm writing synthetic data into the configured database')
+        parser.add_argument('--force', action='store_true',
+                            help='Write even if the database already holds real (non-synthetic) students')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['paid_ratio'] <= 1:
+            raise CommandError('--paid-ratio must be between 0 and 1')
+        if options['students'] < 0 or options['books_per_student'] < 0 or options['titles'] < 1 or options['days'] < 1:
+            raise CommandError('--students/--books-per-student must be >= 0, --titles/--days >= 1')
+
+        # 가상 데이터가 실수로 운영 원장에 섞이지 않도록 대상을 명시하게 한다
+        if not options['database_path'] and not options['yes']:
+            raise CommandError(
+                f"Refusing to write synthetic data into the configured database ({connection.settings_dict['NAME']}). "
+                "Pass --database PATH to use a separate SQLite file, or --yes to write into it anyway."
+            )
+
+        with self.database(options['database_path']):
+            self.generate(options)
+
+    @contextmanager
+    def database(self, path):
+        """path 가 있으면 그 SQLite 파일로 연결을 바꾸고 마이그레이션한다 (benchmark_views 의 복사본과 같은 방식)"""
+        if not path:
+            yield
+            return
+        # 메모리 DB 나 트랜잭션 안의 연결은 닫히지 않으므로 바꾸지 못하고 원래 DB 에 쓰게 된다
+        if connection.in_atomic_block or connection.is_in_memory_db():
+            raise CommandError('--database cannot switch an in-memory database or a connection inside a transaction')
+        settings_dict = connection.settings_dict
+        source = settings_dict['NAME']
+        connection.close()
+        settings_dict['NAME'] = path
+        try:
+            call_command('migrate', interactive=False, verbosity=0)
+            yield
+        finally:
+            connection.close()
+            settings_dict['NAME'] = source
+
+    def generate(self, options):
+        real = Student.objects.filter(synthetic=False).count()
+        if real and not options['force']:
+            raise CommandError(
+                f"The database already holds {real} real student(s). "
+                "Use a separate --database, or pass --force to add synthetic data anyway."
+            )
+
+        if options['clear']:
+            existing = Student.objects.count()
+            if existing and options['interactive']:
+                answer = input(f"This deletes {existing} student(s) and all their books. Type 'yes' to continue: ")
+                if answer != 'yes':
+                    raise CommandError('Cancelled')
+            synthetic.clear()
+
+        result = synthetic.generate(
+            students=options['students'],
+            books_per_student=options['books_per_student'],
+            paid_ratio=options['paid_ratio'],
+            titles=options['titles'],
+            days=options['days'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {result['students']} student(s), {result['books']} book(s) "
+            f"({result['paid']} paid), catalog has {result['titles']} title(s)"
+        ))
@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from textbook import archive
+from textbook.models import ArchivedBook, Book, Student
+from textbook.reports import BOOK_FIELDS, REPORT_TYPES, ReportBook, fingerprint, get_renderer, report_filename
+
+# 학생/보고서 종류별 마지막으로 생성한 파일과 fingerprint
+MANIFEST_NAME = '.reports.json'
+
+
+def init_worker():
+    # spawn 방식(Windows)에서는 워커마다 Django 설정을 다시 읽어야 한다
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # 폰트와 스타일은 워커마다 한 번만 준비한다
+    get_renderer()
+
+
+def render_to_file(student_name, rows, report_type, path):
+    books = [ReportBook(*row) for row in rows]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as output:
+        get_renderer().render(student_name, books, report_type, output)
+    os.replace(tmp_path, path)
+    return path
+
+
+def student_dir(output_dir, student_name, existing):
+    """student_files/<이름>_<학교>_<번호>/ 가 있으면 그 폴더, 없으면 student_files/<이름>/"""
+    for dirname in existing:
+        if dirname == student_name or dirname.startswith(f"{student_name}_"):
+            return os.path.join(output_dir, dirname)
+    path = os.path.join(output_dir, student_name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class Command(BaseCommand):
+    help = 'Render student textbook reports into student_files using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=REPORT_TYPES, default='unpaid', dest='report_type',
+                            help='Report type to render (default: unpaid)')
+        parser.add_argument('--student', action='append', default=[],
+                            help='Student name to include (repeatable). Defaults to every student')
+        parser.add_argument('--unpaid-only', action='store_true',
+                            help='Only students with an unpaid balance')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'student_files'),
+                            help='Directory holding the per-student folders')
+        parser.add_argument('--force', action='store_true',
+                            help='Render even if nothing changed since the last generated file')
+
+    def handle(self, *args, **options):
+        report_type = options['report_type']
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+
+        students = Student.objects.all()
+        if options['student']:
+            students = students.filter(name__in=options['student'])
+        if options['unpaid_only']:
+            students = students.filter(unpaid_amount__gt=0)
+        names = dict(students.values_list('id', 'name'))
+        if not names:
+            raise CommandError('No students matched')
+
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        existing = sorted(
+            entry for entry in os.listdir(output_dir)
+            if os.path.isdir(os.path.join(output_dir, entry))
+        )
+        suffix = f"_{date.today():%Y-%m-%d}"
+
+        # 교재는 한 번에 학생 순으로 읽어 워커에 넘긴다 (워커는 DB를 조회하지 않는다)
+        # 보관된 교재(book_archive)도 함께 읽는다 (보고서 화면과 같은 내역)
+        books = archive.with_archive(
+            Book.objects.filter(student_id__in=names.keys()).order_by(),
+            ArchivedBook.objects.filter(student_id__in=names.keys()).order_by(),
+            ('student_id', *BOOK_FIELDS),
+            ('student_id', 'input_date', 'id'),
+        )
+        rows_by_student = {
+            student_id: [row[1:] for row in rows]
+            for student_id, rows in groupby(books.iterator(chunk_size=2000), key=lambda row: row[0])
+        }
+
+        jobs = []
+        skipped = 0
+        for student_id, student_name in sorted(names.items(), key=lambda item: item[1]):
+            rows = rows_by_student.get(student_id, [])
+            key = f"{student_id}:{report_type}"
+            current = fingerprint(student_name, report_type, rows)
+            previous = manifest.get(key)
+            if (
+                not options['force'] and previous
+                and previous['fingerprint'] == current
+                and os.path.exists(os.path.join(output_dir, previous['file']))
+            ):
+                skipped += 1
+                continue
+            path = os.path.join(
+                student_dir(output_dir, student_name, existing),
+                report_filename(student_name, report_type, suffix),
+            )
+            jobs.append((key, current, student_name, rows, path))
+
+        # fork 된 워커가 부모의 SQLite 연결을 물려받지 않도록 닫는다
+        connections.close_all()
+
+        started = time.perf_counter()
+        rendered = failed = 0
+        if jobs:
+            with ProcessPoolExecutor(max_workers=max(1, options['workers']), initializer=init_worker) as pool:
+                futures = {
+                    pool.submit(render_to_file, student_name, rows, report_type, path): (key, current, student_name)
+                    for key, current, student_name, rows, path in jobs
+                }
+                for future in as_completed(futures):
+                    key, current, student_name = futures[future]
+                    try:
+                        path = future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"Failed {student_name}: {e}")
+                        continue
+                    rendered += 1
+                    manifest[key] = {
+                        'fingerprint': current,
+                        'file': os.path.relpath(path, output_dir),
+                    }
+
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+        elapsed = time.perf_counter() - started
+        rate = rendered / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} report(s), skipped {skipped} unchanged, {failed} failed "
+            f"in {elapsed:.2f}s ({rate:.1f} reports/sec, {options['workers']} worker(s))"
+        ))
+        if failed:
+            raise CommandError(f"{failed} report(s) failed")
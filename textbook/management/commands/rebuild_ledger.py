@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from textbook import ledger
+
+class Command(BaseCommand):
+    help = 'Rebuild and verify the per-student unpaid balance ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify the ledger against the book table, do not modify it',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            changed = ledger.rebuild()
+            self.stdout.write(f"Ledger rebuilt: {changed} student balance(s) corrected")
+
+        mismatches = ledger.verify()
+        for name, stored, actual in mismatches:
+            self.stderr.write(f"Mismatch {name}: ledger={stored} actual={actual}")
+        if mismatches:
+            raise CommandError(f"Ledger verification failed: {len(mismatches)} mismatch(es)")
+
+        amount, count = ledger.get_total()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger OK: {count} unpaid book(s), {amount:,} unpaid in total"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from textbook import rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild and verify the monthly issue/collection rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify the rollups against the book table, do not modify them',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            title_rows, student_rows = rollups.rebuild()
+            self.stdout.write(
+                f"Rollups rebuilt: {title_rows} month x title row(s), {student_rows} month x student row(s)"
+            )
+
+        mismatches = rollups.verify()
+        for table, (month, key), stored, actual in mismatches:
+            self.stderr.write(f"Mismatch {table} {month:%Y-%m} {key}: rollup={stored} actual={actual}")
+        if mismatches:
+            raise CommandError(f"Rollup verification failed: {len(mismatches)} mismatch(es)")
+
+        self.stdout.write(self.style.SUCCESS("Rollups OK"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from textbook.restore import RestoreError, list_backups
+from textbook.utils import restore_database
+
+class Command(BaseCommand):
+    help = 'Validate a backup snapshot and atomically restore it over the live database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', nargs='?', help='Snapshot id or legacy backup file name (omit to list)')
+
+    def handle(self, *args, **options):
+        if not options['backup']:
+            for backup in list_backups():
+                self.stdout.write(backup)
+            return
+
+        try:
+            result = restore_database(options['backup'])
+        except (RestoreError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(result))
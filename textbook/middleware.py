@@ -0,0 +1,103 @@
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import profiling
+from .restore import gate
+
+perf_logger = logging.getLogger('perf')
+
+
+class RestoreGateMiddleware:
+    """데이터베이스 복원 중에는 새 요청을 잠시 붙잡아 둔다 (textbook.restore)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not gate.enter():
+            return closed_response()
+        try:
+            return self.get_response(request)
+        finally:
+            gate.leave()
+
+    async def __acall__(self, request):
+        # 보통은 문이 열려 있으므로 기다리지 않고 확인하고, 복원 중일 때만 스레드에서 기다린다
+        if not gate.enter(timeout=0) and not await sync_to_async(gate.enter, thread_sensitive=False)():
+            return closed_response()
+        try:
+            return await self.get_response(request)
+        finally:
+            gate.leave()
+
+
+class AllowedHostsMiddleware:
+    """ALLOWED_HOSTS 만 검사한다 (CommonMiddleware 가 빠진 자동완성 핸들러용, textbook.typeahead)"""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        request.get_host()  # 허용되지 않은 호스트면 DisallowedHost -> 400
+        return await self.get_response(request)
+
+
+def closed_response():
+    return HttpResponse('데이터베이스 복원 중입니다. 잠시 후 다시 시도해주세요.', status=503)
+
+
+class ProfilingMiddleware:
+    """요청마다 RequestProfile 을 만들고 Server-Timing 헤더와 느린 요청 로그를 남긴다."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = profiling.RequestProfile()
+        token = profiling.activate(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = profiling.RequestProfile()
+        token = profiling.activate(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        return self.finish(request, response, profile)
+
+    @staticmethod
+    def finish(request, response, profile):
+        total_ms = profile.elapsed_ms()
+        if getattr(settings, 'PERF_SERVER_TIMING', True):
+            response['Server-Timing'] = profile.server_timing(total_ms)
+        threshold = profiling.slow_request_ms()
+        if threshold is not None and total_ms >= threshold:
+            perf_logger.warning(json.dumps(profile.as_log(request, response, total_ms), ensure_ascii=False))
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-18 17:28
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    Book = apps.get_model('textbook', 'Book')
+    Student = apps.get_model('textbook', 'Student')
+    LedgerTotal = apps.get_model('textbook', 'LedgerTotal')
+
+    rows = (
+        Book.objects.filter(payment_date__isnull=True)
+        .order_by()
+        .values('student_id')
+        .annotate(amount=Sum('price'), count=Count('id'))
+    )
+    total_amount = total_count = 0
+    for row in rows:
+        Student.objects.filter(pk=row['student_id']).update(
+            unpaid_amount=row['amount'] or 0, unpaid_count=row['count']
+        )
+        total_amount += row['amount'] or 0
+        total_count += row['count']
+
+    LedgerTotal.objects.create(pk=1, unpaid_amount=total_amount, unpaid_count=total_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unpaid_amount', models.BigIntegerField(default=0, verbose_name='전체 미납 금액')),
+                ('unpaid_count', models.IntegerField(default=0, verbose_name='전체 미납 교재 수')),
+            ],
+            options={
+                'verbose_name': '미납 원장 합계',
+                'verbose_name_plural': '미납 원장 합계',
+                'db_table': 'ledger_total',
+            },
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='unpaid_amount',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='미납 금액'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='unpaid_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='미납 교재 수'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
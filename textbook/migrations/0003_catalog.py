@@ -0,0 +1,46 @@
+# Generated by Django 5.1 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+def backfill_catalog(apps, schema_editor):
+    Book = apps.get_model('textbook', 'Book')
+    Catalog = apps.get_model('textbook', 'Catalog')
+
+    entries = {}
+    rows = Book.objects.order_by('input_date', 'id').values_list('book_name', 'price', 'input_date')
+    for book_name, price, input_date in rows.iterator(chunk_size=2000):
+        entry = entries.setdefault(book_name, Catalog(name=book_name, issue_count=0))
+        # 지급일 순으로 훑으므로 마지막 값이 현재 가격이 된다
+        entry.price = price
+        entry.last_issued = input_date
+        entry.issue_count += 1
+
+    Catalog.objects.bulk_create(entries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0002_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Catalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='교재명')),
+                ('price', models.IntegerField(verbose_name='현재 가격')),
+                ('issue_count', models.IntegerField(default=0, verbose_name='지급 횟수')),
+                ('last_issued', models.DateField(blank=True, null=True, verbose_name='최근 지급일')),
+            ],
+            options={
+                'verbose_name': '교재 목록',
+                'verbose_name_plural': '교재 목록',
+                'db_table': 'catalog',
+                'ordering': ['-issue_count', 'name'],
+            },
+        ),
+        migrations.RunPython(backfill_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1 on 2026-10-18 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0003_catalog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='books', to='textbook.student', verbose_name='학생'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['student', 'input_date'], name='book_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('payment_date__isnull', True)), fields=['student', 'input_date'], name='book_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['input_date'], name='book_input_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['book_name'], name='book_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalog',
+            index=models.Index(fields=['-issue_count', 'name', 'price'], name='catalog_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name', 'unpaid_amount'], name='student_name_unpaid_idx'),
+        ),
+    ]
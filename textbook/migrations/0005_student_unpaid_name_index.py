@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0004_book_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('unpaid_amount__gt', 0)), fields=['name', 'id'], name='student_unpaid_name_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.1 on 2026-10-18 18:06
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Book = apps.get_model('textbook', 'Book')
+    TitleMonthlyRollup = apps.get_model('textbook', 'TitleMonthlyRollup')
+    StudentMonthlyRollup = apps.get_model('textbook', 'StudentMonthlyRollup')
+
+    titles = defaultdict(Counter)
+    students = defaultdict(Counter)
+    queries = [
+        ('input_date', {}, 'issued'),
+        ('input_date', {'payment_date__isnull': True}, 'outstanding'),
+        ('payment_date', {'payment_date__isnull': False}, 'collected'),
+    ]
+    for date_field, conditions, prefix in queries:
+        for key_field, target in (('book_name', titles), ('student_id', students)):
+            rows = (
+                Book.objects.filter(**conditions)
+                .order_by()
+                .values_list(TruncMonth(date_field), key_field)
+                .annotate(amount=Sum('price'), count=Count('id'))
+            )
+            for month, key, amount, count in rows:
+                target[month, key][f'{prefix}_amount'] += amount or 0
+                target[month, key][f'{prefix}_count'] += count
+
+    TitleMonthlyRollup.objects.bulk_create([
+        TitleMonthlyRollup(month=month, book_name=book_name, **values)
+        for (month, book_name), values in titles.items()
+    ], batch_size=500)
+    StudentMonthlyRollup.objects.bulk_create([
+        StudentMonthlyRollup(month=month, student_id=student_id, **values)
+        for (month, student_id), values in students.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0005_student_unpaid_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='월')),
+                ('issued_amount', models.BigIntegerField(default=0, verbose_name='지급 금액')),
+                ('issued_count', models.IntegerField(default=0, verbose_name='지급 권수')),
+                ('collected_amount', models.BigIntegerField(default=0, verbose_name='수납 금액')),
+                ('collected_count', models.IntegerField(default=0, verbose_name='수납 권수')),
+                ('outstanding_amount', models.BigIntegerField(default=0, verbose_name='미납 금액')),
+                ('outstanding_count', models.IntegerField(default=0, verbose_name='미납 권수')),
+                ('book_name', models.CharField(max_length=255, verbose_name='교재')),
+            ],
+            options={
+                'verbose_name': '월별 교재 집계',
+                'verbose_name_plural': '월별 교재 집계',
+                'db_table': 'rollup_title_month',
+                'constraints': [models.UniqueConstraint(fields=('month', 'book_name'), name='rollup_title_month_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='월')),
+                ('issued_amount', models.BigIntegerField(default=0, verbose_name='지급 금액')),
+                ('issued_count', models.IntegerField(default=0, verbose_name='지급 권수')),
+                ('collected_amount', models.BigIntegerField(default=0, verbose_name='수납 금액')),
+                ('collected_count', models.IntegerField(default=0, verbose_name='수납 권수')),
+                ('outstanding_amount', models.BigIntegerField(default=0, verbose_name='미납 금액')),
+                ('outstanding_count', models.IntegerField(default=0, verbose_name='미납 권수')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='textbook.student', verbose_name='학생')),
+            ],
+            options={
+                'verbose_name': '월별 학생 집계',
+                'verbose_name_plural': '월별 학생 집계',
+                'db_table': 'rollup_student_month',
+                'indexes': [models.Index(fields=['month'], name='rollup_student_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'month'), name='rollup_student_month_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
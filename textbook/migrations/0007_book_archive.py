@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0006_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBook',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('input_date', models.DateField(verbose_name='지급일')),
+                ('book_name', models.CharField(max_length=255, verbose_name='교재')),
+                ('price', models.IntegerField(verbose_name='가격')),
+                ('checking', models.BooleanField(default=False, verbose_name='상태')),
+                ('payment_date', models.DateField(verbose_name='수납일')),
+                ('archived_at', models.DateTimeField(verbose_name='보관일시')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_books', to='textbook.student', verbose_name='학생')),
+            ],
+            options={
+                'verbose_name': '보관된 교재',
+                'verbose_name_plural': '보관된 교재',
+                'db_table': 'book_archive',
+                'ordering': ['-input_date'],
+                'indexes': [models.Index(fields=['student', 'input_date'], name='book_archive_student_idx'), models.Index(fields=['payment_date'], name='book_archive_payment_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """catalog.issue_count 단일 컬럼 인덱스는 catalog_rank_idx 가 이미 덮으므로 0003 에서 뺐다.
+    예전 0003 을 이미 적용한 DB 에 남은 인덱스를 지운다."""
+
+    dependencies = [
+        ('textbook', '0007_book_archive'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'DROP INDEX IF EXISTS "catalog_issue_count_ea84e4ad"',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
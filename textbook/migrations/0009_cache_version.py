@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0008_drop_catalog_issue_count_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgertotal',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, verbose_name='캐시 버전'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='캐시 버전'),
+        ),
+    ]
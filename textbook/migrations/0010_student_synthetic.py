@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('textbook', '0009_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='synthetic',
+            field=models.BooleanField(default=False, editable=False, verbose_name='가상 데이터'),
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+from django.db import models, router, transaction
 
 class Student(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name='학생')
+    # 미납 원장: Book 저장/삭제 시 같은 트랜잭션에서 갱신된다 (textbook.ledger)
+    unpaid_amount = models.IntegerField(default=0, editable=False, db_index=True, verbose_name='미납 금액')
+    unpaid_count = models.IntegerField(default=0, editable=False, verbose_name='미납 교재 수')
+    # 학생 상세 캐시 버전: 이 학생의 교재가 바뀌면 같은 트랜잭션에서 올라간다 (textbook.page_cache)
+    cache_version = models.BigIntegerField(default=0, editable=False, verbose_name='캐시 버전')
+    # generate_data 가 만든 가상 학생 (textbook.synthetic). 실제 학생이 있는 DB 에는 가상 데이터를 넣지 않는다
+    synthetic = models.BooleanField(default=False, editable=False, verbose_name='가상 데이터')
 
     def __str__(self):
         return self.name
@@ -9,6 +16,16 @@ class Student(models.Model):
     class Meta:
         db_table = 'student'
         ordering = ['name']
+        indexes = [
+            # 이름 검색(icontains)이 테이블 대신 이 인덱스만 훑도록 대시보드 컬럼을 포함한다
+            models.Index(fields=['name', 'unpaid_amount'], name='student_name_unpaid_idx'),
+            # 대시보드 키셋 페이지: 미납 학생을 (name, id) 순으로 읽다가 한 페이지에서 멈춘다
+            models.Index(
+                fields=['name', 'id'],
+                condition=models.Q(unpaid_amount__gt=0),
+                name='student_unpaid_name_idx',
+            ),
+        ]
         verbose_name = '학생'
         verbose_name_plural = '학생'
 
@@ -17,15 +34,138 @@ class Book(models.Model):
     book_name = models.CharField(max_length=255, verbose_name='교재')
     price = models.IntegerField(verbose_name='가격')
     checking = models.BooleanField(default=False, verbose_name='상태')
-    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='books', verbose_name='학생')
+    # student_id 로 시작하는 복합 인덱스(Meta.indexes)가 있으므로 단일 FK 인덱스는 두지 않는다
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='books', db_index=False, verbose_name='학생')
     payment_date = models.DateField(null=True, blank=True, verbose_name='수납일')
 
     def __str__(self):
         return f"{self.book_name} ({self.student.name})"
 
+    def save(self, *args, **kwargs):
+        # pre_save/post_save 원장 갱신이 교재 저장과 같은 트랜잭션에서 실행되도록 묶는다
+        using = kwargs.get('using') or router.db_for_write(Book, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'book'
         ordering = ['-input_date']
+        indexes = [
+            # 학생별 교재 목록/보고서 (student_id = ? ORDER BY input_date)
+            models.Index(fields=['student', 'input_date'], name='book_student_date_idx'),
+            # 학생별 미납 교재와 원장 집계 (payment_date IS NULL)
+            models.Index(
+                fields=['student', 'input_date'],
+                condition=models.Q(payment_date__isnull=True),
+                name='book_unpaid_idx',
+            ),
+            # 기본 정렬(-input_date)과 관리자 날짜 탐색
+            models.Index(fields=['input_date'], name='book_input_date_idx'),
+            models.Index(fields=['book_name'], name='book_name_idx'),
+        ]
         verbose_name = '교재'
         verbose_name_plural = '교재'
 
+class LedgerTotal(models.Model):
+    """전체 미납 합계 (id=1 단일 행)"""
+    unpaid_amount = models.BigIntegerField(default=0, verbose_name='전체 미납 금액')
+    unpaid_count = models.IntegerField(default=0, verbose_name='전체 미납 교재 수')
+    # 대시보드 캐시 버전: 교재/학생이 바뀌면 같은 트랜잭션에서 올라간다 (textbook.page_cache)
+    cache_version = models.BigIntegerField(default=0, verbose_name='캐시 버전')
+
+    class Meta:
+        db_table = 'ledger_total'
+        verbose_name = '미납 원장 합계'
+        verbose_name_plural = '미납 원장 합계'
+
+class Catalog(models.Model):
+    """교재 목록 (교재명별 현재 가격과 지급 통계). 교재 지급 시 갱신된다 (textbook.catalog)"""
+    name = models.CharField(max_length=255, unique=True, verbose_name='교재명')
+    price = models.IntegerField(verbose_name='현재 가격')
+    issue_count = models.IntegerField(default=0, verbose_name='지급 횟수')
+    last_issued = models.DateField(null=True, blank=True, verbose_name='최근 지급일')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'catalog'
+        ordering = ['-issue_count', 'name']
+        indexes = [
+            # 자동완성 순서(-issue_count, name)와 조회 컬럼을 모두 담아 테이블을 읽지 않는다
+            models.Index(fields=['-issue_count', 'name', 'price'], name='catalog_rank_idx'),
+        ]
+        verbose_name = '교재 목록'
+        verbose_name_plural = '교재 목록'
+
+class MonthlyRollup(models.Model):
+    """월별 집계 공통 필드 (textbook.rollups 가 Book 변경과 같은 트랜잭션에서 증감시킨다)
+
+    지급/미납은 지급일(input_date)의 월, 수납은 수납일(payment_date)의 월에 더한다.
+    """
+    month = models.DateField(verbose_name='월')  # 그 달 1일
+    issued_amount = models.BigIntegerField(default=0, verbose_name='지급 금액')
+    issued_count = models.IntegerField(default=0, verbose_name='지급 권수')
+    collected_amount = models.BigIntegerField(default=0, verbose_name='수납 금액')
+    collected_count = models.IntegerField(default=0, verbose_name='수납 권수')
+    outstanding_amount = models.BigIntegerField(default=0, verbose_name='미납 금액')
+    outstanding_count = models.IntegerField(default=0, verbose_name='미납 권수')
+
+    class Meta:
+        abstract = True
+
+class TitleMonthlyRollup(MonthlyRollup):
+    """월 x 교재명 집계"""
+    book_name = models.CharField(max_length=255, verbose_name='교재')
+
+    class Meta:
+        db_table = 'rollup_title_month'
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'book_name'], name='rollup_title_month_uniq'),
+        ]
+        verbose_name = '월별 교재 집계'
+        verbose_name_plural = '월별 교재 집계'
+
+class StudentMonthlyRollup(MonthlyRollup):
+    """월 x 학생 집계"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='monthly_rollups',
+                                db_index=False, verbose_name='학생')
+
+    class Meta:
+        db_table = 'rollup_student_month'
+        constraints = [
+            # 학생별 조회와 증감(student_id IN (...) AND month = ?)에 함께 쓰인다
+            models.UniqueConstraint(fields=['student', 'month'], name='rollup_student_month_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='rollup_student_month_idx'),
+        ]
+        verbose_name = '월별 학생 집계'
+        verbose_name_plural = '월별 학생 집계'
+
+class ArchivedBook(models.Model):
+    """오래된 납부 완료 교재 (textbook.archive 가 book 에서 옮긴다). id 는 원래 Book id 그대로다."""
+    id = models.BigIntegerField(primary_key=True)
+    input_date = models.DateField(verbose_name='지급일')
+    book_name = models.CharField(max_length=255, verbose_name='교재')
+    price = models.IntegerField(verbose_name='가격')
+    checking = models.BooleanField(default=False, verbose_name='상태')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_books',
+                                db_index=False, verbose_name='학생')
+    payment_date = models.DateField(verbose_name='수납일')
+    archived_at = models.DateTimeField(verbose_name='보관일시')
+
+    def __str__(self):
+        return f"{self.book_name} ({self.student.name})"
+
+    class Meta:
+        db_table = 'book_archive'
+        ordering = ['-input_date']
+        indexes = [
+            # 학생별 전체 이력 (student_id = ? ORDER BY input_date)
+            models.Index(fields=['student', 'input_date'], name='book_archive_student_idx'),
+            # 수납 내역 내보내기 (수납일 기간)
+            models.Index(fields=['payment_date'], name='book_archive_payment_idx'),
+        ]
+        verbose_name = '보관된 교재'
+        verbose_name_plural = '보관된 교재'
@@ -0,0 +1,133 @@
+"""
+버전 기반 페이지/조각 캐시
+
+원장은 하루에 수십 번 바뀌지만 대시보드와 학생 상세 화면은 계속 읽힌다. 변경 사이에는
+같은 쿼리와 렌더링 결과가 나오므로, 버전 번호를 키에 넣어 결과를 캐시한다.
+- 전체 버전(LedgerTotal.cache_version): 교재/학생이 바뀌면 올라간다 -> 대시보드 페이지와 dashboard_api
+- 학생별 버전(Student.cache_version): 그 학생의 교재가 바뀌면 올라간다 -> 학생 상세 화면의 납부 완료 조각
+
+버전은 SQLite 에 있고 Book/Student 의 post_save/post_delete 와 books_updated(일괄 수납/지급)에서
+변경과 같은 트랜잭션으로 올린다 (signals.py). 그래서 다른 워커나 manage.py 명령(수납, 보관,
+복원, generate_data)의 변경도 다음 요청에서 바로 반영된다. 요청마다 버전을 읽는 쿼리 하나가 든다.
+
+렌더링 결과만 프로세스별 LocMemCache 에 둔다. 버전을 올리면 이전 키는 더는 읽히지 않고
+캐시 크기 제한(CACHES['pages'] 의 MAX_ENTRIES)과 PAGE_CACHE_TIMEOUT 에 따라 밀려난다.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Max
+from django.http import HttpResponse
+
+from .models import LedgerTotal, Student
+
+CACHE_ALIAS = 'pages'
+DEFAULT_TIMEOUT = 300  # 초
+
+TOTAL_PK = 1  # ledger.TOTAL_PK (ledger 가 이 모듈을 쓰므로 가져오지 않는다)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def version():
+    """전체 버전 (합계 행이 아직 없으면 0)"""
+    return LedgerTotal.objects.filter(pk=TOTAL_PK).values_list('cache_version', flat=True).first() or 0
+
+
+def bump(student_ids=()):
+    """전체 버전과 student_ids 학생들의 버전을 올린다. 데이터를 바꾸는 트랜잭션 안에서 호출한다."""
+    if student_ids:
+        Student.objects.filter(pk__in=list(student_ids)).update(cache_version=F('cache_version') + 1)
+    LedgerTotal.objects.filter(pk=TOTAL_PK).update(cache_version=F('cache_version') + 1)
+
+
+def max_version():
+    """지금까지 쓰인 가장 큰 버전 (복원 전에 읽어 bump_all(above=...) 에 넘긴다)"""
+    return max(
+        version(),
+        Student.objects.aggregate(high=Max('cache_version'))['high'] or 0,
+    )
+
+
+def bump_all(above=0):
+    """모든 버전을 올린다 (원장 재계산, 복원 등 시그널 없이 데이터가 바뀐 뒤).
+
+    복원한 DB 의 버전은 복원 전보다 작을 수 있으므로, 복원 전 max_version() 을 above 로 넘겨
+    예전에 쓰인 번호가 다시 쓰이지 않게 한다.
+    """
+    Student.objects.update(cache_version=F('cache_version') + above + 1)
+    LedgerTotal.objects.filter(pk=TOTAL_PK).update(cache_version=F('cache_version') + above + 1)
+
+
+def clear():
+    """이 프로세스에 캐시된 렌더링 결과를 모두 지운다 (테스트, 벤치마크)."""
+    _cache().clear()
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def as_dict(self):
+        with self._lock:
+            result = {}
+            for name, counts in sorted(self._counts.items()):
+                total = counts['hits'] + counts['misses']
+                result[name] = {**counts, 'hit_rate': round(counts['hits'] / total, 3) if total else 0}
+            return result
+
+
+stats = CacheStats()
+
+
+def _key(name, parts):
+    # 검색어 등 임의의 문자열이 들어가므로 해시로 만든다 (공백/길이 제한 경고 방지)
+    digest = hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f'{name}:{digest}'
+
+
+def fragment(name, parts, render):
+    """render() 가 만든 HTML 조각(문자열)을 name+parts 키로 캐시한다. parts 에 버전을 넣는다."""
+    key = _key(name, parts)
+    cache = _cache()
+    html = cache.get(key)
+    stats.record(name, html is not None)
+    if html is None:
+        html = render()
+        cache.set(key, html, timeout())
+    return html
+
+
+def page(name, parts, build):
+    """build() 가 만든 200 응답의 본문과 Content-Type 을 캐시하고, 적중하면 새 응답으로 돌려준다."""
+    key = _key(name, parts)
+    cache = _cache()
+    cached = cache.get(key)
+    stats.record(name, cached is not None)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    response = build()
+    if response.status_code == 200 and not response.streaming:
+        cache.set(key, (response.content, response['Content-Type']), timeout())
+    return response
@@ -0,0 +1,81 @@
+"""
+대시보드 키셋(커서) 페이지네이션
+
+Paginator 의 OFFSET 은 앞 페이지의 행을 모두 읽고 버리므로 뒤 페이지일수록 느려지고,
+COUNT 쿼리가 따로 필요하다. 여기서는 (name, id) 를 커서로 다음 페이지를
+"WHERE (name, id) > 커서" 로 인덱스에서 바로 찾고, 전체 학생 수/미납 합계는
+같은 SELECT 의 스칼라 서브쿼리로 함께 읽는다 (쿼리 한 번).
+"""
+import base64
+import json
+
+from django.db.models import Count, Q, Subquery, Sum, Value
+
+from .models import Student
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(name, pk):
+    data = json.dumps([name, pk], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(name), int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def unpaid_students_page(search='', cursor=None, limit=PAGE_SIZE):
+    """대시보드 한 페이지. (학생 목록, 다음 커서 또는 None, 전체 학생 수, 전체 미납 금액)
+
+    검색어가 없으면 미납 학생만, 있으면 이름에 검색어가 들어간 모든 학생이 대상이다.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    students = Student.objects.all()
+    if search:
+        students = students.filter(name__icontains=search)
+    else:
+        students = students.filter(unpaid_amount__gt=0)
+
+    # 커서와 무관하게 대상 전체의 합계 (상관 관계가 없어 SQLite 가 한 번만 계산한다)
+    totals = students.order_by().annotate(group=Value(1)).values('group')
+    page = students.annotate(
+        total_students=Subquery(totals.annotate(count=Count('id')).values('count')),
+        total_unpaid=Subquery(totals.annotate(amount=Sum('unpaid_amount')).values('amount')),
+    )
+    if cursor:
+        name, pk = decode_cursor(cursor)
+        page = page.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk))
+
+    rows = list(
+        page.order_by('name', 'id').values(
+            'id', 'name', 'unpaid_amount', 'total_students', 'total_unpaid'
+        )[:limit + 1]
+    )
+
+    if rows:
+        total_students, total_unpaid = rows[0]['total_students'], rows[0]['total_unpaid'] or 0
+    else:
+        # 마지막 페이지 뒤를 요청한 경우에만 합계를 따로 읽는다
+        totals = students.aggregate(count=Count('id'), amount=Sum('unpaid_amount'))
+        total_students, total_unpaid = totals['count'], totals['amount'] or 0
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['name'], rows[-1]['id'])
+
+    results = [
+        {'id': row['id'], 'name': row['name'], 'unpaid_amount': row['unpaid_amount']}
+        for row in rows
+    ]
+    return results, next_cursor, total_students, total_unpaid
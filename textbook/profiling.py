@@ -0,0 +1,169 @@
+"""
+요청별 성능 측정
+
+ProfilingMiddleware(textbook.middleware)가 요청마다 전체 시간, SQL 개수/시간(가장 느린 쿼리 몇 개),
+템플릿 렌더링 시간, 보고서 PDF 렌더링 시간을 모은다.
+- 응답의 Server-Timing 헤더로 내보낸다 (브라우저 개발자 도구 Network > Timing 에서 보인다)
+- PERF_SLOW_REQUEST_MS 보다 오래 걸린 요청은 'perf' 로거에 JSON 한 줄로 남긴다
+
+템플릿 시간은 TEMPLATES 의 BACKEND 를 ProfilingDjangoTemplates 로 바꾸면 모이고,
+그 밖의 구간은 timed('이름') 으로 감싸서 잰다. 템플릿 안에서 실행된 쿼리는 sql 과
+tpl 양쪽에 들어간다.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+DEFAULT_SLOW_REQUEST_MS = 500
+SLOWEST_QUERIES = 5
+MAX_SQL_LENGTH = 500
+
+# Server-Timing 에 쓰는 짧은 이름
+TIMING_NAMES = {'template': 'tpl', 'pdf': 'pdf'}
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.slowest = []  # 느린 순 (ms, sql)
+        self.timings = {}  # 구간 이름 -> ms
+        self.tags = {}
+        self._depth = {}
+
+    def execute(self, execute, sql, params, many, context):
+        """connection.execute_wrapper 용: 쿼리마다 시간을 잰다."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += elapsed
+            if len(self.slowest) < SLOWEST_QUERIES or elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, sql))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[SLOWEST_QUERIES:]
+
+    @contextmanager
+    def timed(self, name):
+        # 같은 구간이 중첩되면(템플릿 안의 템플릿 등) 가장 바깥쪽만 센다
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if depth == 0:
+                elapsed = (time.perf_counter() - started) * 1000
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        entries = [f'sql;dur={self.sql_ms:.1f};desc="{self.sql_count} queries"']
+        for name, ms in self.timings.items():
+            entries.append(f'{TIMING_NAMES.get(name, name)};dur={ms:.1f}')
+        entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+    def as_log(self, request, response, total_ms):
+        return {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_ms, 1),
+            **{f'{name}_ms': round(ms, 1) for name, ms in self.timings.items()},
+            **({'tags': self.tags} if self.tags else {}),
+            'slowest_sql': [
+                {'ms': round(ms, 2), 'sql': sql[:MAX_SQL_LENGTH]} for ms, sql in self.slowest
+            ],
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """모든 DB 연결에 설치되는 execute_wrapper (signals.py 의 connection_created).
+
+    async 뷰의 ORM 은 다른 스레드의 연결에서 실행되지만 contextvar 는 따라가므로
+    요청의 RequestProfile 에 기록된다.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def activate(profile):
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    """진행 중인 요청의 RequestProfile (미들웨어 밖이면 None)"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """요청 안의 한 구간(예: 'pdf')의 시간을 잰다. 요청 밖에서는 아무것도 하지 않는다."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.timed(name):
+        yield
+
+
+def tag(**values):
+    """느린 요청 로그에 함께 남길 값 (예: student_id)"""
+    profile = _current.get()
+    if profile is not None:
+        profile.tags.update(values)
+
+
+def slow_request_ms():
+    return getattr(settings, 'PERF_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+
+
+class ProfiledTemplate:
+    """백엔드 템플릿의 render() 시간을 'template' 구간으로 잰다."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """렌더링 시간을 재는 DjangoTemplates 백엔드 (TEMPLATES 의 BACKEND 로 지정)"""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name))
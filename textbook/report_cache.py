@@ -0,0 +1,112 @@
+"""
+보고서 PDF 디스크 캐시
+
+파일 이름이 (학생, 보고서 종류, 교재 행 fingerprint) 로 정해지므로 교재가 바뀌면
+다른 파일을 찾게 되어 오래된 보고서가 나갈 일이 없다. Book 변경 시 invalidate() 로
+해당 학생의 파일을 지워 공간을 돌려받고, 전체 크기가 REPORT_CACHE_MAX_BYTES 를
+넘으면 가장 오래 쓰지 않은 파일부터 지운다.
+"""
+import io
+import os
+import threading
+
+from django.conf import settings
+
+_evict_lock = threading.Lock()
+
+
+def cache_dir():
+    return getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'report_cache'))
+
+
+def max_bytes():
+    return getattr(settings, 'REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def _path(student_id, report_type, fingerprint):
+    directory = os.path.realpath(cache_dir())
+    path = os.path.realpath(os.path.join(directory, f"{student_id}-{report_type}-{fingerprint}.pdf"))
+    # 이름 조각에 경로 구분자나 '..' 이 들어와 캐시 폴더 밖을 가리키면 안 된다
+    if os.path.dirname(path) != directory:
+        raise ValueError(f"Report cache path escapes {directory}: {path}")
+    return path
+
+
+def get(student_id, report_type, fingerprint):
+    """캐시된 파일을 읽기용으로 연다 (없으면 None). 사용 시각을 갱신해 LRU 순서를 유지한다.
+
+    경로가 아니라 열린 파일을 돌려준다: 다른 요청이나 프로세스의 invalidate()/evict() 가
+    그 사이에 파일을 지워도 이미 연 파일은 끝까지 읽힌다 (Windows 에서는 지우기가 실패한다).
+    """
+    path = _path(student_id, report_type, fingerprint)
+    try:
+        output = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return output
+
+
+def store(student_id, report_type, fingerprint, render):
+    """render(output) 으로 PDF를 만들어 캐시에 저장하고 읽기용으로 연 파일을 돌려준다."""
+    os.makedirs(cache_dir(), exist_ok=True)
+    path = _path(student_id, report_type, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as output:
+            render(output)
+        os.replace(tmp_path, path)
+        try:
+            result = open(path, 'rb')
+        except FileNotFoundError:
+            # 저장하자마자 다른 프로세스가 지웠다 (교재 변경 등): 이번 응답은 메모리에서 만든다
+            result = io.BytesIO()
+            render(result)
+            result.seek(0)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict()
+    return result
+
+
+def invalidate(student_id):
+    """학생의 캐시 파일을 모두 지운다."""
+    prefix = f"{student_id}-"
+    try:
+        entries = os.listdir(cache_dir())
+    except FileNotFoundError:
+        return
+    for name in entries:
+        if name.startswith(prefix) and name.endswith('.pdf'):
+            try:
+                os.remove(os.path.join(cache_dir(), name))
+            except OSError:
+                pass  # 이미 지워졌거나 (Windows) 응답 중인 파일
+
+
+def evict(limit=None):
+    """캐시 전체 크기가 limit 이하가 될 때까지 오래 쓰지 않은 파일부터 지운다."""
+    limit = max_bytes() if limit is None else limit
+    with _evict_lock:
+        files = []
+        total = 0
+        with os.scandir(cache_dir()) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,289 @@
+"""
+교재 보고서 PDF 생성
+
+generate_report 뷰와 generate_reports 관리 명령이 함께 사용한다.
+ReportRenderer 는 폰트 등록, 문단/표 스타일 생성을 프로세스당 한 번만 하고
+보고서마다 학생별 교재 행만 새로 만든다. DB는 조회하지 않고 전달받은 교재 목록만 사용한다.
+"""
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+REPORT_TYPES = ('all', 'unpaid')
+
+# 보고서에 쓰이는 교재 필드 (fingerprint 계산과 배치 작업의 행 전달에 사용)
+BOOK_FIELDS = ('id', 'input_date', 'book_name', 'price', 'checking', 'payment_date')
+ReportBook = namedtuple('ReportBook', BOOK_FIELDS)
+
+
+class NumberedCanvas(canvas.Canvas):
+    """페이지마다 "Page x of y" 를 그린다.
+
+    전체 페이지 수는 save() 때에야 알 수 있으므로 각 페이지에는 아직 정의되지 않은
+    폼(XObject)을 참조만 해 두고, save() 에서 페이지 수가 정해지면 폼 내용을 채운다.
+    페이지 상태를 통째로 보관하지 않으므로 페이지가 늘어도 추가 메모리가 거의 없다.
+
+    as_of: 머리에 찍는 기준일. 보고서는 캐시되므로 생성 시각 대신 교재 내역에서 나온 날짜를 쓴다.
+    """
+
+    def __init__(self, *args, as_of=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.as_of = as_of
+
+    def showPage(self):
+        self.draw_page_footer()
+        self.doForm(self._page_number_form(self._pageNumber))
+        canvas.Canvas.showPage(self)
+
+    def save(self):
+        """add page info to each page (page x of y)"""
+        if len(self._code):
+            self.showPage()
+        page_count = self._pageNumber - 1
+        for page_number in range(1, page_count + 1):
+            self.beginForm(self._page_number_form(page_number))
+            self.draw_page_number(page_number, page_count)
+            self.endForm()
+        canvas.Canvas.save(self)
+
+    @staticmethod
+    def _page_number_form(page_number):
+        return f"pageNumber{page_number}"
+
+    def draw_page_number(self, page_number, page_count):
+        self.setFont("NotoSansKR", 9)
+        
+        # 페이지 번호 (우측)
+        page = f"Page {page_number} of {page_count}"
+        self.drawRightString(200*mm, 10*mm, page)
+
+    def draw_page_footer(self):
+        self.setFont("NotoSansKR", 9)
+        
+        # 학원명 (가운데 정렬)
+        academy_name = "엠클래스수학과학전문학원"
+        academy_name_width = self.stringWidth(academy_name, "NotoSansKR", 9)
+        page_width = A4[0]  # A4 용지의 너비
+        x_position = (page_width - academy_name_width) / 2
+        self.drawString(x_position, 10*mm, academy_name)
+        
+        # 내역 기준일 (좌측): 가장 최근 지급일/수납일
+        if self.as_of:
+            self.drawString(20*mm, A4[1] - 15*mm, f"기준일: {self.as_of:%Y-%m-%d}")
+
+
+# 한글 폰트 등록
+def register_fonts(force=False):
+    if not force and 'NotoSansKR' in pdfmetrics.getRegisteredFontNames():
+        return
+    font_dir = os.path.join(settings.BASE_DIR, 'static', 'fonts')
+    pdfmetrics.registerFont(TTFont('NotoSansKR', os.path.join(font_dir, 'NotoSansKR-Regular.ttf')))
+    pdfmetrics.registerFont(TTFont('NotoSansKR-Bold', os.path.join(font_dir, 'NotoSansKR-Bold.ttf')))
+
+
+def report_filename(student_name, report_type, suffix=''):
+    report_name = "미납교재" if report_type == 'unpaid' else "전체교재"
+    return f"{student_name}_{report_name}_현황{suffix}.pdf"
+
+
+def fingerprint(student_name, report_type, rows):
+    """보고서 내용을 결정하는 값들의 해시. rows: BOOK_FIELDS 순서의 튜플 목록"""
+    digest = hashlib.sha1(f"{student_name}\x1f{report_type}".encode('utf-8'))
+    for row in rows:
+        digest.update(('\x1e' + '\x1f'.join(str(value) for value in row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# 표준 테이블 폭 설정
+TABLE_WIDTH = 170*mm  # A4 용지에 맞는 표준 폭
+
+
+class ReportRenderer:
+    """폰트와 스타일을 미리 준비해 두고 보고서를 반복 생성한다. get_renderer() 로 공유한다."""
+
+    def __init__(self):
+        # 폰트 등록
+        register_fonts()
+
+        # 스타일 정의
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(
+            name='Korean',
+            fontName='NotoSansKR',
+            fontSize=10,
+            leading=14
+        ))
+        self.styles.add(ParagraphStyle(
+            name='KoreanTitle',
+            fontName='NotoSansKR-Bold',
+            fontSize=16,
+            leading=20,
+            alignment=1
+        ))
+
+        self.summary_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ])
+        self.unpaid_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
+            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ])
+        self.all_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
+            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
+            ('ALIGN', (5, 1), (5, -1), 'CENTER'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ])
+        self.summary_widths = [TABLE_WIDTH/2]*2
+        self.unpaid_widths = [15*mm, 30*mm, 65*mm, 30*mm, 30*mm]
+        self.all_widths = [
+            TABLE_WIDTH * 0.08,
+            TABLE_WIDTH * 0.15,
+            TABLE_WIDTH * 0.35,
+            TABLE_WIDTH * 0.15,
+            TABLE_WIDTH * 0.12,
+            TABLE_WIDTH * 0.15
+        ]
+
+    def render(self, student_name, books, report_type, output):
+        """books: input_date, book_name, price, checking, payment_date 속성을 가진 교재 목록"""
+        all_books = sorted(books, key=lambda book: book.input_date)
+        unpaid_books = sorted(
+            (book for book in all_books if book.payment_date is None),
+            key=lambda book: book.input_date, reverse=True
+        )
+
+        # 통계 계산
+        total_books = len(all_books)
+        total_amount = sum(book.price for book in all_books)
+        total_unpaid = sum(book.price for book in unpaid_books)
+
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=A4,
+            rightMargin=20*mm,
+            leftMargin=20*mm,
+            topMargin=30*mm,  # 상단 여백 증가
+            bottomMargin=20*mm,
+            title=f"{student_name} 학생 {'미납' if report_type == 'unpaid' else '전체'} 교재 보고서",
+            author=student_name,
+            subject='교재 보고서',
+            creator='교재 관리 시스템',
+        )
+        styles = self.styles
+
+        elements = []
+
+        # 제목 및 요약 정보
+        title = f"{student_name} 학생 " + ("미납 교재 현황" if report_type == 'unpaid' else "교재 내역서")
+        elements.append(Paragraph(title, styles['KoreanTitle']))
+        elements.append(Spacer(1, 20))
+
+        # 요약 정보
+        if report_type == 'unpaid':
+            summary_data = [
+                ['미납된 교재 수:', f"{len(unpaid_books)}권"],
+                ['미납 금액:', f"{total_unpaid:,}원"],
+            ]
+        else:
+            summary_data = [
+                ['전체 교재 수:', f"{total_books}권"],
+                ['총 금액:', f"{total_amount:,}원"],
+                ['미납 금액:', f"{total_unpaid:,}원"],
+            ]
+
+        summary_table = Table(summary_data, colWidths=self.summary_widths)
+        summary_table.setStyle(self.summary_style)
+        elements.append(summary_table)
+        elements.append(Spacer(1, 20))
+
+        # 미납 교재 목록 (report_type이 'unpaid'일 때만)
+        if report_type == 'unpaid':
+            elements.append(Paragraph("미납 교재 목록", styles['KoreanTitle']))
+            elements.append(Spacer(1, 10))
+
+            unpaid_data = [['No.', '지급일', '교재명', '가격', '상태']]
+            for idx, book in enumerate(unpaid_books, 1):
+                unpaid_data.append([
+                    str(idx),
+                    book.input_date.strftime('%Y-%m-%d'),
+                    book.book_name,
+                    f"{book.price:,}원",
+                    '납부완료' if book.checking else '미납'
+                ])
+
+            unpaid_table = Table(unpaid_data, colWidths=self.unpaid_widths)
+            unpaid_table.setStyle(self.unpaid_style)
+            elements.append(unpaid_table)
+
+        # 전체 교재 목록 (report_type이 'all'일 때)
+        if report_type == 'all':
+            elements.append(Paragraph("전체 교재 목록", styles['KoreanTitle']))
+            elements.append(Spacer(1, 10))
+
+            all_data = [['No.', '지급일', '교재명', '가격', '납부상태', '납부일']]
+            for idx, book in enumerate(all_books, 1):
+                all_data.append([
+                    str(idx),
+                    book.input_date.strftime('%Y-%m-%d'),
+                    book.book_name,
+                    f"{book.price:,}원",
+                    '납부완료' if book.payment_date else '미납',
+                    book.payment_date.strftime('%Y-%m-%d') if book.payment_date else '-'
+                ])
+
+            all_table = Table(all_data, colWidths=self.all_widths)
+            all_table.setStyle(self.all_style)
+            elements.append(all_table)
+
+        # 기준일은 fingerprint 에 들어가는 교재 행에서만 정한다 (캐시된 PDF 가 오래된 생성 시각을 보여주지 않도록)
+        as_of = max(
+            (day for book in all_books for day in (book.input_date, book.payment_date) if day),
+            default=None,
+        )
+        doc.build(elements, canvasmaker=partial(NumberedCanvas, as_of=as_of))
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """프로세스에서 공유하는 ReportRenderer (첫 사용 시 생성)"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = ReportRenderer()
+    return _renderer
@@ -0,0 +1,253 @@
+"""
+운영 중 데이터베이스 복원
+
+1. 선택한 백업(저장소 스냅샷 또는 예전 백업 파일)을 DB 옆 임시 파일로 꺼낸다.
+2. 임시 파일을 integrity_check 하고, 마이그레이션 기록을 현재 코드와 비교한다.
+3. DB 옆에 잠금 파일(<DB>.restore.lock)을 만들고 RestoreGate 로 새 요청을 잠시 막은 뒤
+   진행 중인 요청이 끝나기를 기다린다.
+4. SQLite 백업 API로 임시 파일 내용을 운영 DB에 한 번에 덮어쓴다.
+   파일을 바꿔치기하지 않으므로 다른 프로세스의 열린 연결도 새 내용을 보게 되고,
+   SQLite 잠금 안에서 한 트랜잭션으로 바뀌므로 중간 상태가 보이지 않는다.
+5. 잠금 파일을 지우고 요청을 다시 받은 뒤, 막혀 있던 시간을 보고한다.
+
+한계: 진행 중인 요청 수는 프로세스마다 따로 센다. 잠금 파일은 모든 프로세스
+(다른 워커, manage.py restore_db)의 새 요청을 막지만, 다른 프로세스에서 이미 진행 중인
+요청은 RESTORE_SETTLE_SECONDS 만큼만 기다려 주고 그 뒤로는 SQLite 잠금에만 맡긴다.
+그런 요청은 덮어쓰기 전후에 걸쳐 트랜잭션을 나눠 실행하면 두 내용을 모두 볼 수 있다.
+connections.close_all() 도 복원하는 스레드의 연결만 닫는다 (다른 연결은 그대로 새 내용을 읽는다).
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+
+from . import backup_store, page_cache
+from .search import student_index
+from .snapshot import ledger_snapshot
+
+# 복원이 진행 중인 요청을 기다리는 최대 시간과, 막힌 요청이 기다리는 최대 시간 (초)
+DRAIN_TIMEOUT = 10
+BLOCK_TIMEOUT = 30
+
+# 잠금 파일을 만든 뒤 다른 프로세스의 진행 중인 요청이 끝나도록 기다리는 시간 (초)
+DEFAULT_SETTLE_SECONDS = 1.0
+# 막힌 요청이 잠금 파일이 지워졌는지 다시 보는 간격, 이보다 오래된 잠금 파일은 죽은 복원으로 본다 (초)
+LOCK_POLL_INTERVAL = 0.05
+LOCK_STALE_SECONDS = 600
+
+# 예전 방식(파일 통째 복사)의 백업 파일. 복원만 지원한다
+LEGACY_BACKUP_EXTENSIONS = ('.sqlite3', '.sqlite3.gz')
+
+
+class RestoreError(Exception):
+    pass
+
+
+def lock_path():
+    return getattr(settings, 'RESTORE_LOCK_FILE', None) or f"{settings.DATABASES['default']['NAME']}.restore.lock"
+
+
+def locked():
+    """어느 프로세스에서든 복원이 진행 중이면 True (잠금 파일이 있고 오래되지 않았다)"""
+    try:
+        return time.time() - os.path.getmtime(lock_path()) < LOCK_STALE_SECONDS
+    except OSError:
+        return False
+
+
+@contextmanager
+def _lock_file():
+    path = lock_path()
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if locked():
+            raise RestoreError('Another restore is already running')
+        # 복원 도중 죽은 프로세스가 남긴 잠금 파일
+        os.remove(path)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(path)
+
+
+class RestoreGate:
+    """복원 중에는 새 요청을 막고, 진행 중인 요청이 끝날 때까지 기다린다.
+
+    진행 중인 요청은 프로세스 안에서만 세지만, 다른 프로세스의 복원도 잠금 파일(locked())로 보고 막는다.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._closed = False
+
+    def enter(self, timeout=BLOCK_TIMEOUT):
+        """요청 시작. 복원이 timeout 안에 끝나지 않으면 False"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            # 다른 프로세스의 잠금 파일은 알림이 오지 않으므로 LOCK_POLL_INTERVAL 마다 다시 본다
+            while self._closed or locked():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, LOCK_POLL_INTERVAL))
+            self._active += 1
+            return True
+
+    def leave(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self, held=0, timeout=DRAIN_TIMEOUT):
+        """새 요청을 막고 진행 중인 요청이 held 개(복원을 요청한 요청 자신)만 남을 때까지 기다린다.
+
+        yield 되는 함수는 문이 닫혀 있던 시간(초)을 돌려준다.
+        """
+        with self._condition:
+            if self._closed:
+                raise RestoreError('Another restore is already running')
+            self._closed = True
+            closed_at = time.perf_counter()
+            drained = self._condition.wait_for(lambda: self._active <= held, timeout)
+        try:
+            if not drained:
+                raise RestoreError(f'Timed out waiting for {self._active - held} request(s) to finish')
+            yield lambda: time.perf_counter() - closed_at
+        finally:
+            with self._condition:
+                self._closed = False
+                self._condition.notify_all()
+
+
+gate = RestoreGate()
+
+
+def _legacy_dir():
+    return os.path.join(settings.BASE_DIR, 'backups')
+
+
+def list_backups():
+    """복원할 수 있는 백업 목록: 저장소 스냅샷 id (최신순) 뒤에 예전 백업 파일 (최신순)"""
+    snapshots = [manifest['id'] for manifest in backup_store.list_snapshots()]
+
+    backup_dir = _legacy_dir()
+    legacy = []
+    if os.path.isdir(backup_dir):
+        legacy = sorted(
+            [f for f in os.listdir(backup_dir) if f.endswith(LEGACY_BACKUP_EXTENSIONS)],
+            key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)),
+            reverse=True
+        )
+    return snapshots + legacy
+
+
+def _extract(backup, target_path):
+    """백업을 target_path 에 일반 SQLite 파일로 꺼낸다."""
+    # 목록에 있는 이름만 받는다 (경로가 섞인 이름으로 다른 파일을 읽지 않도록)
+    if backup not in list_backups():
+        raise RestoreError(f'Unknown backup: {backup}')
+    if not backup.endswith(LEGACY_BACKUP_EXTENSIONS):
+        try:
+            backup_store.restore_snapshot(backup, target_path)
+        except backup_store.SnapshotError as e:
+            raise RestoreError(str(e))
+        return
+
+    full_path = os.path.join(_legacy_dir(), backup)
+    if full_path.endswith('.gz'):
+        with gzip.open(full_path, 'rb') as src, open(target_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    else:
+        shutil.copyfile(full_path, target_path)
+
+
+def validate(path):
+    """integrity_check 와 마이그레이션 비교. 현재 코드에 없는 마이그레이션이 있으면 RestoreError,
+    백업 이후 추가된 마이그레이션 목록은 돌려준다 (복원 후 적용)."""
+    conn = sqlite3.connect(path)
+    try:
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            raise RestoreError(f'Integrity check failed: {e}')
+        if result != 'ok':
+            raise RestoreError(f'Integrity check failed: {result}')
+        try:
+            applied = set(conn.execute('SELECT app, name FROM django_migrations'))
+        except sqlite3.DatabaseError:
+            raise RestoreError('Backup has no django_migrations table')
+    finally:
+        conn.close()
+
+    known = set(MigrationLoader(None, ignore_no_migrations=True).disk_migrations)
+    unknown = applied - known
+    if unknown:
+        names = ', '.join(sorted(f'{app}.{name}' for app, name in unknown))
+        raise RestoreError(f'Backup was made by a newer version of the app (unknown migrations: {names})')
+    return sorted(known - applied)
+
+
+def restore(backup, held=0):
+    """백업을 검증한 뒤 운영 DB를 교체한다. held: 이 함수를 호출한 진행 중인 요청 수"""
+    db_path = str(settings.DATABASES['default']['NAME'])
+    # DB 옆의 일반 파일 (DB 이름이 SQLite URI 여도 그대로 붙이지 않는다)
+    fd, tmp_path = tempfile.mkstemp(suffix='.restore.tmp', dir=os.path.dirname(os.path.abspath(db_path)))
+    os.close(fd)
+
+    started = time.perf_counter()
+    try:
+        _extract(backup, tmp_path)
+        pending = validate(tmp_path)
+
+        # 잠금 파일로 다른 프로세스의 새 요청을 막고, 이 프로세스의 요청은 RestoreGate 로 비운다
+        with _lock_file(), gate.exclusive(held=held) as blocked:
+            # 다른 프로세스에서 진행 중인 요청은 셀 수 없으므로 잠시 기다려 준다
+            time.sleep(getattr(settings, 'RESTORE_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS))
+
+            # 복원한 DB 의 캐시 버전은 지금보다 작을 수 있으므로 지금까지 쓰인 가장 큰 버전을 기억해 둔다
+            floor = page_cache.max_version()
+
+            # 이 스레드의 연결을 닫고, 백업 API로 임시 파일 내용을 운영 DB에 한 번에 쓴다
+            connections.close_all()
+            source = sqlite3.connect(tmp_path)
+            target = sqlite3.connect(db_path, timeout=DRAIN_TIMEOUT)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+
+            if pending:
+                call_command('migrate', interactive=False, verbosity=0)
+            # 모든 프로세스의 페이지 캐시를 무효화한다 (예전에 쓰인 버전 번호를 다시 쓰지 않는다)
+            page_cache.bump_all(above=floor)
+            blocked_seconds = blocked()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    student_index.invalidate()
+    ledger_snapshot.invalidate()
+    page_cache.clear()
+
+    return {
+        'backup': backup,
+        'migrated': [f'{app}.{name}' for app, name in pending],
+        'blocked': blocked_seconds,
+        'elapsed': time.perf_counter() - started,
+    }
@@ -0,0 +1,252 @@
+"""
+월별 판매/수납 집계 (롤업)
+
+"월별/교재별로 얼마를 지급하고 얼마를 받았는지"를 book 테이블을 훑지 않고 답하도록
+월 x 교재명(TitleMonthlyRollup), 월 x 학생(StudentMonthlyRollup) 집계를 유지한다.
+- 지급 금액/권수와 미납 금액/권수는 지급일(input_date)의 월에 더한다
+- 수납 금액/권수는 수납일(payment_date)의 월에 더한다
+
+원장(textbook.ledger)과 같은 방식으로 Book 변경과 같은 트랜잭션에서 증감시킨다.
+- Book.save()/삭제      -> signals.py 에서 record_change() / record_delete()
+- ledger.settle()/issue() -> record_rows() / record_issue()
+보관(textbook.archive)으로 옮긴 교재도 계속 집계에 포함된다 (ArchivedBook 삭제 시 record_delete()).
+시그널 없이 데이터를 넣었다면 rebuild() (manage.py rebuild_rollups) 로 다시 만든다.
+"""
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import product
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ArchivedBook, Book, Student, StudentMonthlyRollup, TitleMonthlyRollup
+
+FIELDS = (
+    'issued_amount', 'issued_count',
+    'collected_amount', 'collected_count',
+    'outstanding_amount', 'outstanding_count',
+)
+# snapshot()/record_rows() 가 쓰는 Book 컬럼 순서
+ROW_FIELDS = ('student_id', 'book_name', 'price', 'input_date', 'payment_date')
+
+
+def month_of(value):
+    """그 달 1일. 저장 직후의 인스턴스에는 문자열 날짜가 남아 있을 수 있다."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.replace(day=1)
+
+
+def contributions(price, input_date, payment_date):
+    """교재 한 권이 더하는 [(월, {필드: 값})]"""
+    price = price or 0
+    issued = {'issued_amount': price, 'issued_count': 1}
+    if payment_date is None:
+        issued.update(outstanding_amount=price, outstanding_count=1)
+        return [(month_of(input_date), issued)]
+    return [
+        (month_of(input_date), issued),
+        (month_of(payment_date), {'collected_amount': price, 'collected_count': 1}),
+    ]
+
+
+class Deltas:
+    """교재 행들의 증감을 모았다가 apply() 로 한꺼번에 반영한다."""
+
+    def __init__(self):
+        self.titles = defaultdict(Counter)    # (월, 교재명) -> 필드별 증감
+        self.students = defaultdict(Counter)  # (월, student_id) -> 필드별 증감
+
+    def add(self, row, sign=1):
+        """row: ROW_FIELDS 순서의 튜플"""
+        student_id, book_name, price, input_date, payment_date = row
+        for month, values in contributions(price, input_date, payment_date):
+            for field, value in values.items():
+                self.titles[month, book_name][field] += sign * value
+                self.students[month, student_id][field] += sign * value
+
+    def apply(self):
+        _apply(TitleMonthlyRollup, 'book_name', self.titles)
+        _apply(StudentMonthlyRollup, 'student_id', self.students)
+
+
+def _apply(model, key_field, deltas):
+    # 증감이 같은 (월, 값) 끼리 묶어 UPDATE 한 번으로 처리한다 (일괄 지급은 학생마다 같은 값)
+    groups = defaultdict(list)
+    for (month, key), values in deltas.items():
+        values = tuple(sorted((field, value) for field, value in values.items() if value))
+        if values:
+            groups[month, values].append(key)
+
+    for (month, values), keys in groups.items():
+        rows = model.objects.filter(month=month, **{f'{key_field}__in': keys})
+        updated = rows.update(**{field: F(field) + value for field, value in values})
+        # 없는 행은 늘어나는 경우에만 만든다. 줄어드는데 행이 없으면 학생 삭제로 행이 먼저
+        # 연쇄 삭제된 경우이므로 건너뛴다 (그 밖의 경우라면 rebuild 가 필요하다)
+        if updated < len(keys) and all(value > 0 for _, value in values):
+            existing = set(rows.values_list(key_field, flat=True))
+            model.objects.bulk_create([
+                model(month=month, **{key_field: key}, **dict(values))
+                for key in keys if key not in existing
+            ])
+
+
+def snapshot(book_id):
+    """저장 전 DB에 있던 ROW_FIELDS 값"""
+    return Book.objects.filter(pk=book_id).values_list(*ROW_FIELDS).first()
+
+
+def _row(book):
+    return tuple(getattr(book, field) for field in ROW_FIELDS)
+
+
+def record_change(previous, book):
+    """previous: 저장 전 snapshot() 결과 (새 교재면 None)"""
+    deltas = Deltas()
+    if previous is not None:
+        deltas.add(previous, -1)
+    deltas.add(_row(book))
+    deltas.apply()
+
+
+def record_delete(book):
+    deltas = Deltas()
+    deltas.add(_row(book), -1)
+    deltas.apply()
+
+
+def record_issue(books):
+    """bulk_create 로 만든 교재들을 반영한다."""
+    deltas = Deltas()
+    for book in books:
+        deltas.add(_row(book))
+    deltas.apply()
+
+
+def record_rows(before, after):
+    """queryset.update() 전후의 ROW_FIELDS 행 목록으로 증감을 반영한다."""
+    deltas = Deltas()
+    for row in before:
+        deltas.add(row, -1)
+    for row in after:
+        deltas.add(row)
+    deltas.apply()
+
+
+def compute():
+    """book 과 book_archive 에서 직접 계산한 ({(월, 교재명): 필드값}, {(월, student_id): 필드값})"""
+    titles = defaultdict(Counter)
+    students = defaultdict(Counter)
+    queries = [
+        # (그룹 월, 조건, 금액 필드, 권수 필드)
+        ('input_date', {}, 'issued_amount', 'issued_count'),
+        ('input_date', {'payment_date__isnull': True}, 'outstanding_amount', 'outstanding_count'),
+        ('payment_date', {'payment_date__isnull': False}, 'collected_amount', 'collected_count'),
+    ]
+    for model, (date_field, conditions, amount_field, count_field) in product((Book, ArchivedBook), queries):
+        for key_field, target in (('book_name', titles), ('student_id', students)):
+            rows = (
+                model.objects.filter(**conditions)
+                .order_by()
+                .values_list(TruncMonth(date_field), key_field)
+                .annotate(amount=Sum('price'), count=Count('id'))
+            )
+            for month, key, amount, count in rows:
+                target[month, key][amount_field] += amount or 0
+                target[month, key][count_field] += count
+    return titles, students
+
+
+def _nonzero(values):
+    return {field: value for field, value in values.items() if value}
+
+
+def _stored(model, key_field):
+    return {
+        (row[0], row[1]): _nonzero(dict(zip(FIELDS, row[2:])))
+        for row in model.objects.values_list('month', key_field, *FIELDS)
+    }
+
+
+def _differences(expected, stored):
+    differences = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        actual = _nonzero(expected.get(key, {}))
+        current = _nonzero(stored.get(key, {}))
+        if actual != current:
+            differences.append((key, current, actual))
+    return differences
+
+
+def verify():
+    """집계와 실제 값이 다른 항목 목록. [(표, (월, 키), 집계 값, 실제 값)]"""
+    titles, students = compute()
+    mismatches = []
+    for label, model, key_field, expected in (
+        ('교재', TitleMonthlyRollup, 'book_name', titles),
+        ('학생', StudentMonthlyRollup, 'student_id', students),
+    ):
+        for key, stored, actual in _differences(expected, _stored(model, key_field)):
+            mismatches.append((label, key, stored, actual))
+    return mismatches
+
+
+def rebuild():
+    """집계를 book 테이블 기준으로 다시 만든다. (교재 행 수, 학생 행 수)를 돌려준다."""
+    with transaction.atomic():
+        titles, students = compute()
+        TitleMonthlyRollup.objects.all().delete()
+        StudentMonthlyRollup.objects.all().delete()
+        TitleMonthlyRollup.objects.bulk_create([
+            TitleMonthlyRollup(month=month, book_name=book_name, **values)
+            for (month, book_name), values in titles.items()
+        ], batch_size=500)
+        StudentMonthlyRollup.objects.bulk_create([
+            StudentMonthlyRollup(month=month, student_id=student_id, **values)
+            for (month, student_id), values in students.items()
+        ], batch_size=500)
+    return len(titles), len(students)
+
+
+def _totals():
+    return {field: Sum(field) for field in FIELDS}
+
+
+def _between(queryset, month_from, month_to):
+    if month_from:
+        queryset = queryset.filter(month__gte=month_of(month_from))
+    if month_to:
+        queryset = queryset.filter(month__lte=month_of(month_to))
+    return queryset.order_by()
+
+
+def _with_zeros(row):
+    return {**row, **{field: row[field] or 0 for field in FIELDS}}
+
+
+def monthly(month_from=None, month_to=None):
+    """월별 합계 (오래된 달부터)"""
+    rows = _between(TitleMonthlyRollup.objects.all(), month_from, month_to)
+    return [_with_zeros(row) for row in rows.values('month').annotate(**_totals()).order_by('month')]
+
+
+def by_title(month_from=None, month_to=None, limit=50):
+    """기간 안의 교재별 합계 (지급 금액이 큰 순)"""
+    rows = _between(TitleMonthlyRollup.objects.all(), month_from, month_to)
+    rows = rows.values('book_name').annotate(**_totals()).order_by('-issued_amount', 'book_name')
+    return [_with_zeros(row) for row in rows[:limit]]
+
+
+def by_student(month_from=None, month_to=None, limit=50):
+    """기간 안의 학생별 합계 (미납 금액이 큰 순)"""
+    rows = _between(StudentMonthlyRollup.objects.all(), month_from, month_to)
+    rows = [
+        _with_zeros(row)
+        for row in rows.values('student_id').annotate(**_totals()).order_by('-outstanding_amount', 'student_id')[:limit]
+    ]
+    # 이름은 집계가 끝난 limit 명만 읽는다 (학생 테이블을 조인한 채로 묶지 않는다)
+    names = dict(Student.objects.filter(pk__in=[row['student_id'] for row in rows]).values_list('id', 'name'))
+    for row in rows:
+        row['student_name'] = names.get(row['student_id'], '')
+    return rows
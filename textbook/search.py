@@ -0,0 +1,192 @@
+"""
+학생 이름 검색 인덱스 (프로세스 메모리)
+
+search_students 자동완성이 키 입력마다 DB를 조회하지 않도록 학생 이름을
+메모리에 정렬된 키로 보관한다. 한글은 자모 단위로 분해해 두므로
+"강ㅈ" 같은 입력 중인 글자와 "ㄱㅈㅇ" 같은 초성 검색을 앞부분 일치로 찾을 수 있다.
+
+Student 저장/삭제 시그널이 커밋 후 해당 학생만 갱신하며, 다른 프로세스에서의
+변경을 놓치지 않도록 REFRESH_INTERVAL 마다 전체를 다시 읽는다.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from asgiref.sync import sync_to_async
+
+MAX_RESULTS = 20
+REFRESH_INTERVAL = 300  # 초
+
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+
+CHOSUNG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSUNG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+JONGSUNG = ' ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ'
+
+# 겹모음/겹받침은 구성 자모로 나눠 입력 도중의 글자와도 일치하게 한다
+COMPOUND_JAMO = {
+    'ㅘ': 'ㅗㅏ', 'ㅙ': 'ㅗㅐ', 'ㅚ': 'ㅗㅣ', 'ㅝ': 'ㅜㅓ', 'ㅞ': 'ㅜㅔ', 'ㅟ': 'ㅜㅣ', 'ㅢ': 'ㅡㅣ',
+    'ㄳ': 'ㄱㅅ', 'ㄵ': 'ㄴㅈ', 'ㄶ': 'ㄴㅎ', 'ㄺ': 'ㄹㄱ', 'ㄻ': 'ㄹㅁ', 'ㄼ': 'ㄹㅂ',
+    'ㄽ': 'ㄹㅅ', 'ㄾ': 'ㄹㅌ', 'ㄿ': 'ㄹㅍ', 'ㅀ': 'ㄹㅎ', 'ㅄ': 'ㅂㅅ',
+}
+CONSONANTS = set(CHOSUNG) | set(JONGSUNG.strip())
+
+# 순위: 낮을수록 먼저
+RANK_EXACT, RANK_PREFIX, RANK_CHOSUNG, RANK_JAMO, RANK_CONTAINS = range(5)
+
+
+def decompose(text):
+    """한글 음절을 자모로 분해한다. 그 외 문자는 소문자로 그대로 둔다."""
+    result = []
+    for char in text.lower():
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_END:
+            offset = code - HANGUL_BASE
+            jamo = CHOSUNG[offset // 588] + JUNGSUNG[offset % 588 // 28] + JONGSUNG[offset % 28]
+            char = jamo.strip()
+        result.append(''.join(COMPOUND_JAMO.get(j, j) for j in char))
+    return ''.join(result)
+
+
+def chosung(text):
+    """한글 음절은 초성으로 바꾸고 공백은 제거한다. (예: 강지원 -> ㄱㅈㅇ)"""
+    result = []
+    for char in text.lower():
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_END:
+            char = CHOSUNG[(code - HANGUL_BASE) // 588]
+        if not char.isspace():
+            result.append(char)
+    return ''.join(result)
+
+
+def is_chosung_query(query):
+    return all(char in CONSONANTS for char in query)
+
+
+class StudentIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}       # id -> 이름
+        self._by_name = []     # 정렬된 (소문자 이름, id)
+        self._by_jamo = []     # 정렬된 (자모 분해, id)
+        self._by_chosung = []  # 정렬된 (초성, id)
+        self._loaded_at = None
+
+    def _keys(self, name):
+        return name.lower(), decompose(name), chosung(name)
+
+    def load(self):
+        from .models import Student
+
+        names = dict(Student.objects.values_list('id', 'name'))
+        by_name, by_jamo, by_chosung = [], [], []
+        for student_id, name in names.items():
+            name_key, jamo_key, chosung_key = self._keys(name)
+            by_name.append((name_key, student_id))
+            by_jamo.append((jamo_key, student_id))
+            by_chosung.append((chosung_key, student_id))
+
+        with self._lock:
+            self._names = names
+            self._by_name = sorted(by_name)
+            self._by_jamo = sorted(by_jamo)
+            self._by_chosung = sorted(by_chosung)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def is_stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > REFRESH_INTERVAL
+
+    def _ensure_loaded(self):
+        if self.is_stale():
+            self.load()
+
+    def _remove_locked(self, student_id):
+        name = self._names.pop(student_id, None)
+        if name is None:
+            return
+        for keys, key in zip(
+            (self._by_name, self._by_jamo, self._by_chosung), self._keys(name)
+        ):
+            position = bisect_left(keys, (key, student_id))
+            if position < len(keys) and keys[position] == (key, student_id):
+                del keys[position]
+
+    def update(self, student_id, name):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # 아직 읽지 않았으면 첫 검색 때 전체를 읽는다
+            self._remove_locked(student_id)
+            self._names[student_id] = name
+            for keys, key in zip(
+                (self._by_name, self._by_jamo, self._by_chosung), self._keys(name)
+            ):
+                insort(keys, (key, student_id))
+
+    def remove(self, student_id):
+        with self._lock:
+            self._remove_locked(student_id)
+
+    @staticmethod
+    def _prefix(keys, prefix):
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and keys[position][0].startswith(prefix):
+            yield keys[position][1]
+            position += 1
+
+    def search(self, query, limit=MAX_RESULTS):
+        """[{'id', 'name'}] 을 순위(정확히 일치 > 앞부분 > 초성 > 자모 > 포함) 순으로 최대 limit 개"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        self._ensure_loaded()
+
+        jamo_query = decompose(query)
+        chosung_query = query.replace(' ', '')
+
+        with self._lock:
+            ranks = {}
+
+            def add(student_ids, rank):
+                for student_id in student_ids:
+                    if student_id not in ranks:
+                        ranks[student_id] = rank
+
+            add(self._prefix(self._by_name, query), RANK_PREFIX)
+            if is_chosung_query(chosung_query):
+                add(self._prefix(self._by_chosung, chosung_query), RANK_CHOSUNG)
+            add(self._prefix(self._by_jamo, jamo_query), RANK_JAMO)
+
+            if len(ranks) < limit:
+                # 앞부분 일치가 부족할 때만 이름 중간 일치까지 훑는다
+                add(
+                    (student_id for name, student_id in self._by_name if query in name),
+                    RANK_CONTAINS,
+                )
+
+            names = self._names
+            results = sorted(
+                (
+                    RANK_EXACT if names[student_id].lower() == query else rank,
+                    names[student_id],
+                    student_id,
+                )
+                for student_id, rank in ranks.items()
+            )
+
+        return [{'id': student_id, 'name': name} for _, name, student_id in results[:limit]]
+
+    async def asearch(self, query, limit=MAX_RESULTS):
+        """async 뷰용 search(). 인덱스를 다시 읽어야 할 때만 스레드에서 DB 를 읽고, 나머지는 메모리에서 찾는다."""
+        if query.strip() and self.is_stale():
+            await sync_to_async(self.load)()
+        return self.search(query, limit)
+
+
+student_index = StudentIndex()
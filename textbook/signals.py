@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, ledger, page_cache, profiling, report_cache, rollups, sqlite_profile
+from .models import ArchivedBook, Book, Student
+from .search import student_index
+from .snapshot import ledger_snapshot
+
+
+@receiver(pre_save, sender=Book)
+def remember_previous_book(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._ledger_previous = None if instance._state.adding else ledger.snapshot(instance.pk)
+    instance._rollup_previous = None if instance._state.adding else rollups.snapshot(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def update_ledger_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ledger.record_change(getattr(instance, '_ledger_previous', None), instance)
+    instance._ledger_previous = None
+
+
+@receiver(post_delete, sender=Book)
+def update_ledger_on_delete(sender, instance, **kwargs):
+    ledger.record_delete(instance)
+
+
+@receiver(post_save, sender=Book)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.record_change(getattr(instance, '_rollup_previous', None), instance)
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=ArchivedBook)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.record_delete(instance)
+
+
+@receiver(post_save, sender=Book)
+def update_catalog_on_issue(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    catalog.record_issue(instance.book_name, instance.price, instance.input_date)
+
+
+@receiver(post_save, sender=Student)
+def update_search_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: student_index.update(instance.pk, instance.name))
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_search_index(sender, instance, **kwargs):
+    student_id = instance.pk
+    transaction.on_commit(lambda: student_index.remove(student_id))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_report_cache(sender, instance, **kwargs):
+    student_id = instance.student_id
+    transaction.on_commit(lambda: report_cache.invalidate(student_id))
+
+
+@receiver(ledger.books_updated, sender=Book)
+def invalidate_report_cache_bulk(sender, student_ids, **kwargs):
+    def invalidate():
+        for student_id in student_ids:
+            report_cache.invalidate(student_id)
+    transaction.on_commit(invalidate)
+
+
+# 캐시 버전은 DB 에 있으므로 커밋 뒤가 아니라 변경과 같은 트랜잭션에서 올린다 (다른 프로세스도 본다)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_page_cache_for_book(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    page_cache.bump([instance.student_id])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def bump_page_cache_for_student(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    page_cache.bump([instance.pk])
+
+
+@receiver(ledger.books_updated, sender=Book)
+def bump_page_cache_bulk(sender, student_ids, **kwargs):
+    page_cache.bump(student_ids)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=ArchivedBook)
+def mark_snapshot_dirty(sender, instance, **kwargs):
+    # 다른 학생으로 옮긴 교재는 새 학생의 행을 다시 읽을 때 함께 옮겨진다
+    student_id = instance.student_id
+    transaction.on_commit(lambda: ledger_snapshot.mark_dirty([student_id]))
+
+
+@receiver(ledger.books_updated, sender=Book)
+def mark_snapshot_dirty_bulk(sender, student_ids, **kwargs):
+    student_ids = list(student_ids)
+    transaction.on_commit(lambda: ledger_snapshot.mark_dirty(student_ids))
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    sqlite_profile.configure_connection(connection)
+
+
+@receiver(connection_created)
+def install_query_profiler(sender, connection, **kwargs):
+    profiling.install(connection)
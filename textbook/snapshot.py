@@ -0,0 +1,280 @@
+"""
+교재 원장 열(column) 스냅샷 (프로세스 메모리)
+
+미납 경과일(aging), 교재별 인기, 수납까지 걸린 날(lag) 같은 임의 분석을 요청마다
+SQLite 의 GROUP BY 로 돌리지 않도록 book 테이블(보관된 book_archive 포함)을 한 번 읽어
+array 모듈의 조밀한 열 배열로 보관한다 (행 객체 없이 행당 32바이트).
+- student: 학생 id (int32), title: 교재명 사전 번호 (int32), price: 가격 (int64)
+- issued / paid: 지급일/수납일의 날짜 번호 (date.toordinal(), 미납은 0)
+  삭제된 행은 지우지 않고 issued=0, paid=-1 로 표시해 두었다가 많아지면 전체를 다시 읽는다
+
+증분 갱신(행 추가/덮어쓰기)은 array 열에 하고, 집계는 열을 numpy 배열로 복사해
+불리언 마스크와 np.bincount / np.searchsorted 로 묶는다 (행마다 파이썬 객체를 만들지 않는다).
+
+갱신은 증분으로 한다.
+- 다른 프로세스가 추가한 교재는 마지막으로 읽은 id 보다 큰 행만 더 읽는다
+- 이 프로세스에서 바뀐 교재는 시그널이 커밋 후 학생을 mark_dirty() 하고, 다음 조회 때
+  그 학생들의 행만 다시 읽는다
+- 다른 프로세스의 수정/삭제는 REFRESH_INTERVAL 마다 전체를 다시 읽어 반영한다
+"""
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+FIELDS = ('id', 'student_id', 'book_name', 'price', 'input_date', 'payment_date')
+REFRESH_INTERVAL = 300  # 초
+CHUNK_SIZE = 5000
+COMPACT_RATIO = 0.25  # 삭제된 행이 이 비율을 넘으면 전체를 다시 읽는다
+
+UNPAID = 0
+DELETED = -1
+
+# 경과일 구간: 0-30, 31-60, 61-90, 90+
+AGE_BOUNDS = (31, 61, 91)
+AGE_LABELS = ('0-30', '31-60', '61-90', '90+')
+
+
+def _day(value):
+    return value.toordinal() if value else UNPAID
+
+
+class LedgerSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self._loaded_at = None
+
+    def _reset(self):
+        self.book_id = array('q')
+        self.student = array('i')
+        self.title = array('i')
+        self.price = array('q')
+        self.issued = array('i')
+        self.paid = array('i')
+        self._titles = []         # 번호 -> 교재명
+        self._title_codes = {}    # 교재명 -> 번호
+        self._rows = {}           # book id -> 행 번호
+        self._student_rows = defaultdict(set)
+        self._max_id = 0
+        self._deleted = 0
+        self._dirty = set()
+
+    def _title_code(self, name):
+        code = self._title_codes.get(name)
+        if code is None:
+            code = self._title_codes[name] = len(self._titles)
+            self._titles.append(name)
+        return code
+
+    def _append(self, book_id, student_id, book_name, price, input_date, payment_date):
+        self._rows[book_id] = len(self.book_id)
+        self._student_rows[student_id].add(len(self.book_id))
+        self.book_id.append(book_id)
+        self.student.append(student_id)
+        self.title.append(self._title_code(book_name))
+        self.price.append(price or 0)
+        self.issued.append(input_date.toordinal())
+        self.paid.append(_day(payment_date))
+        self._max_id = max(self._max_id, book_id)
+
+    def _overwrite(self, row, student_id, book_name, price, input_date, payment_date):
+        previous = self.student[row]
+        if previous != student_id:
+            self._student_rows[previous].discard(row)
+            self._student_rows[student_id].add(row)
+            self.student[row] = student_id
+        self.title[row] = self._title_code(book_name)
+        self.price[row] = price or 0
+        self.issued[row] = input_date.toordinal()
+        self.paid[row] = _day(payment_date)
+
+    def _delete(self, row):
+        del self._rows[self.book_id[row]]
+        self._student_rows[self.student[row]].discard(row)
+        self.price[row] = 0
+        self.issued[row] = 0  # 지급일 기간 조건에 걸리지 않는다
+        self.paid[row] = DELETED
+        self._deleted += 1
+
+    @staticmethod
+    def _query(model=None):
+        from .models import Book
+
+        return (model or Book).objects.order_by().values_list(*FIELDS)
+
+    def _history(self, student_ids=None):
+        """보관 교재(book_archive)까지 합친 행 (student_ids 를 주면 그 학생들만)"""
+        from .models import ArchivedBook
+
+        books, archived = self._query(), self._query(ArchivedBook)
+        if student_ids is not None:
+            books = books.filter(student_id__in=student_ids)
+            archived = archived.filter(student_id__in=student_ids)
+        return books.union(archived, all=True)
+
+    def load(self):
+        with self._lock:
+            self._reset()
+            for row in self._history().order_by('id').iterator(chunk_size=CHUNK_SIZE):
+                self._append(*row)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def mark_dirty(self, student_ids):
+        """이 학생들의 교재를 다음 조회 때 다시 읽는다 (signals.py 에서 커밋 후 호출)"""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._dirty.update(student_ids)
+
+    def refresh(self):
+        """필요한 만큼만 다시 읽는다. 전체를 다시 읽었으면 True"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > REFRESH_INTERVAL:
+            self.load()
+            return True
+
+        with self._lock:
+            for row in self._query().filter(id__gt=self._max_id).order_by('id').iterator(chunk_size=CHUNK_SIZE):
+                if row[0] not in self._rows:
+                    self._append(*row)
+
+            dirty, self._dirty = self._dirty, set()
+            if dirty:
+                stale_rows = set().union(*(self._student_rows.get(student_id, ()) for student_id in dirty))
+                for book_id, *values in self._history(dirty):
+                    row = self._rows.get(book_id)
+                    if row is None:
+                        self._append(book_id, *values)
+                    else:
+                        stale_rows.discard(row)
+                        self._overwrite(row, *values)
+                for row in stale_rows:
+                    self._delete(row)
+
+            compact = self._deleted > len(self.book_id) * COMPACT_RATIO
+        if compact:
+            self.load()
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._rows)
+
+    # 집계: refresh() 후 잠금 안에서 열을 numpy 배열로 복사하고, 잠금 밖에서 마스크/bincount 로 묶는다
+
+    def _columns(self, *names):
+        """열 복사본 (np.array). 잠금 안에서 호출한다.
+
+        array 의 버퍼를 그대로 보는 np.frombuffer 는 뷰가 남아 있는 동안 append 를 막으므로 복사한다
+        (10만 행에 1ms 미만)."""
+        return [np.array(getattr(self, name)) for name in names]
+
+    @staticmethod
+    def _issued_between(issued, date_from, date_to):
+        """지급일이 기간 안인 행의 마스크 (날짜가 없으면 제한하지 않는다)"""
+        low = date_from.toordinal() if date_from else 1
+        high = date_to.toordinal() if date_to else date.max.toordinal()
+        return (issued >= low) & (issued <= high)
+
+    def aging(self, today=None, limit=20):
+        """미납 교재의 지급 후 경과일 구간별 합계와, 90일 넘은 미납 금액이 큰 학생 limit 명"""
+        today = (today or date.today()).toordinal()
+        self.refresh()
+        with self._lock:
+            student, price, issued, paid = self._columns('student', 'price', 'issued', 'paid')
+
+        unpaid = paid == UNPAID
+        prices = price[unpaid]
+        students = student[unpaid]
+        # 경과일이 AGE_BOUNDS 의 어느 경계 앞에 있는지가 구간 번호다 (0-30 -> 0, ..., 90+ -> 3)
+        buckets = np.searchsorted(AGE_BOUNDS, today - issued[unpaid], side='right')
+        amounts = np.bincount(buckets, weights=prices, minlength=len(AGE_LABELS))
+        counts = np.bincount(buckets, minlength=len(AGE_LABELS))
+
+        older = buckets == len(AGE_BOUNDS)  # 마지막 구간 (90일 초과)
+        overdue_ids, inverse = np.unique(students[older], return_inverse=True)
+        overdue = np.bincount(inverse, weights=prices[older], minlength=len(overdue_ids))
+        top = np.lexsort((overdue_ids, -overdue))[:limit]
+
+        return {
+            'buckets': [
+                {'label': label, 'amount': int(amount), 'count': int(count)}
+                for label, amount, count in zip(AGE_LABELS, amounts, counts)
+            ],
+            'overdue_students': [
+                {'student_id': int(overdue_ids[i]), 'amount': int(overdue[i])} for i in top
+            ],
+        }
+
+    def popularity(self, date_from=None, date_to=None, limit=50):
+        """기간 안에 지급된 교재별 권수/금액/미납 권수 (많이 지급된 순)"""
+        self.refresh()
+        with self._lock:
+            title, price, issued, paid = self._columns('title', 'price', 'issued', 'paid')
+            titles = list(self._titles)
+
+        selected = self._issued_between(issued, date_from, date_to)
+        codes = title[selected]
+        issued_counts = np.bincount(codes, minlength=len(titles))
+        amounts = np.bincount(codes, weights=price[selected], minlength=len(titles))
+        unpaid_counts = np.bincount(title[selected & (paid == UNPAID)], minlength=len(titles))
+
+        # 정렬은 행이 아니라 지급된 교재명(수백 개)에 대해서만 한다
+        ranked = sorted(np.flatnonzero(issued_counts), key=lambda code: (-issued_counts[code], titles[code]))
+        return [
+            {
+                'book_name': titles[code],
+                'count': int(issued_counts[code]),
+                'amount': int(amounts[code]),
+                'unpaid_count': int(unpaid_counts[code]),
+            }
+            for code in ranked[:limit]
+        ]
+
+    def collection_lag(self, date_from=None, date_to=None, limit=20):
+        """기간 안에 지급되어 수납된 교재의 지급일~수납일 일수 분포와, 평균 일수가 긴 교재 limit 개"""
+        self.refresh()
+        with self._lock:
+            title, issued, paid = self._columns('title', 'issued', 'paid')
+            names = list(self._titles)
+
+        selected = self._issued_between(issued, date_from, date_to) & (paid > UNPAID)
+        lags = paid[selected] - issued[selected]
+        if not lags.size:
+            return {'count': 0, 'mean_days': 0, 'median_days': 0, 'p90_days': 0, 'buckets': [], 'slowest_titles': []}
+
+        ordered = np.sort(lags)
+        # 정렬된 일수에서 경계 위치를 찾으면 구간별 개수가 나온다
+        edges = [0, *np.searchsorted(ordered, AGE_BOUNDS, side='left'), len(ordered)]
+
+        codes = title[selected]
+        title_counts = np.bincount(codes, minlength=len(names))
+        totals = np.bincount(codes, weights=lags, minlength=len(names))
+        slowest = sorted(
+            ((totals[code] / title_counts[code], names[code], int(title_counts[code]))
+             for code in np.flatnonzero(title_counts)),
+            key=lambda item: (-item[0], item[1]),
+        )[:limit]
+
+        return {
+            'count': len(lags),
+            'mean_days': round(float(lags.sum()) / len(lags), 1),
+            'median_days': int(ordered[len(ordered) // 2]),
+            'p90_days': int(ordered[min(len(ordered) - 1, len(ordered) * 9 // 10)]),
+            'buckets': [
+                {'label': label, 'count': int(high - low)} for label, low, high in zip(AGE_LABELS, edges, edges[1:])
+            ],
+            'slowest_titles': [
+                {'book_name': name, 'mean_days': round(float(mean), 1), 'count': count} for mean, name, count in slowest
+            ],
+        }
+
+
+ledger_snapshot = LedgerSnapshot()
@@ -0,0 +1,58 @@
+"""
+SQLite 연결 설정 프로필
+
+새 DB 연결이 만들어질 때(connection_created) settings.SQLITE_PROFILE 의 PRAGMA 를 적용한다.
+기본 'performance' 프로필은 WAL 저널을 써서 교재 지급(쓰기) 중에도 대시보드(읽기)가
+막히지 않게 하고, 페이지 캐시와 mmap 을 키워 디스크 읽기를 줄인다.
+'legacy' 는 SQLite 기본값(롤백 저널)으로, 비교나 문제 해결용이다.
+
+settings.SQLITE_PROFILES 로 프로필을 추가하거나 일부 값을 덮어쓸 수 있다.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_PROFILE = 'performance'
+
+PROFILES = {
+    'legacy': {
+        'busy_timeout': 5000,
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+    },
+    'performance': {
+        'busy_timeout': 5000,          # 쓰기 잠금을 최대 5초 기다린다 (ms)
+        'journal_mode': 'WAL',         # 읽기와 쓰기가 서로 막지 않는다
+        'synchronous': 'NORMAL',       # WAL 에서는 체크포인트 때만 fsync (정전 시 마지막 커밋만 잃을 수 있음)
+        'cache_size': -64000,          # 연결당 페이지 캐시 약 64MB (음수는 KiB 단위)
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# busy_timeout 을 먼저 적용해야 journal_mode 변경이 잠금에 걸려도 기다린다
+PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def get_profile(name=None):
+    name = name or getattr(settings, 'SQLITE_PROFILE', DEFAULT_PROFILE)
+    overrides = getattr(settings, 'SQLITE_PROFILES', {})
+    if name not in PROFILES and name not in overrides:
+        raise ImproperlyConfigured(f"Unknown SQLITE_PROFILE: {name}")
+    return {**PROFILES.get(name, {}), **overrides.get(name, {})}
+
+
+def apply_profile(cursor, profile):
+    """DB-API cursor(sqlite3 또는 Django)에 프로필의 PRAGMA 를 실행한다."""
+    for pragma in PRAGMA_ORDER:
+        if pragma in profile:
+            cursor.execute(f"PRAGMA {pragma} = {profile[pragma]}")
+
+
+def configure_connection(connection):
+    """connection_created 시그널에서 호출된다."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_profile(cursor, get_profile())
@@ -0,0 +1,121 @@
+"""
+벤치마크/부하 테스트용 가상 데이터
+
+실제 학원 데이터와 비슷한 모양(한글 이름, 출판사+시리즈+학년 교재명, 인기 교재 쏠림,
+지급 후 일정 기간 뒤 수납)으로 학생과 교재를 만든다. 교재는 bulk_create 로 넣으므로
+시그널을 거치지 않고, 끝에서 원장/교재 목록/검색 인덱스를 한 번에 다시 계산한다.
+"""
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from . import catalog, ledger, rollups
+from .models import Book, Student
+from .search import student_index
+from .snapshot import ledger_snapshot
+
+SURNAMES = '김이박최정강조윤장임한오서신권황안송류전홍고문양손배백허유남심노하곽성차주우구민'
+GIVEN_SYLLABLES = '민서준지현우예하은도윤수아연호진영유재성태원주시건채혜동찬경빈규다소희승'
+
+PUBLISHERS = ['비상', '이투스', '수경', '천재', '좋은책신사고', '능률', 'EBS', '미래엔', '디딤돌']
+SERIES = [
+    '개념원리', 'RPM', '쎈', '라이트쎈', '블랙라벨', '일품', '개념+유형', '만렙PM', '수학의 바이블',
+    '자이스토리', '고쟁이', '수능특강', '수능완성', '마더텅 기출', '내공의 힘', '오투', '완자',
+]
+LEVELS = [
+    '중등수학 1-1', '중등수학 1-2', '중등수학 2-1', '중등수학 2-2', '중등수학 3-1', '중등수학 3-2',
+    '고등수학 상', '고등수학 하', '수학1', '수학2', '확률과 통계', '미적분', '기하',
+    '중등과학 1-1', '중등과학 2-1', '통합과학',
+]
+
+BATCH_SIZE = 1000
+
+
+def student_names(count, rng, taken=()):
+    """겹치지 않는 한글 이름 count 개. 조합이 모자라면 '김민서2' 처럼 번호를 붙인다."""
+    taken = set(taken)
+    names = []
+    while len(names) < count:
+        name = rng.choice(SURNAMES) + rng.choice(GIVEN_SYLLABLES) + rng.choice(GIVEN_SYLLABLES)
+        candidate, suffix = name, 2
+        while candidate in taken:
+            candidate, suffix = f'{name}{suffix}', suffix + 1
+        taken.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def book_titles(count, rng):
+    """(교재명, 기본 가격) 목록. 앞쪽일수록 많이 지급된다 (choices 의 가중치로 사용)."""
+    titles = {}
+    while len(titles) < count:
+        year = rng.choice(['', '21 ', '22 ', '23 ', '24 ', '25 '])
+        title = f'{year}{rng.choice(PUBLISHERS)} {rng.choice(SERIES)} {rng.choice(LEVELS)}'
+        titles.setdefault(title, rng.randint(18, 44) * 500)
+    return list(titles.items())
+
+
+def generate(students=2760, books_per_student=6, paid_ratio=0.6, titles=300, days=730,
+             seed=None, today=None):
+    """가상 학생/교재를 추가하고 {'students', 'books', 'paid', 'titles'} 를 돌려준다.
+
+    학생별 교재 수는 평균 books_per_student 근처에서 흩어지고, 지급일은 최근 days 일 사이,
+    paid_ratio 만큼은 지급 후 0~60일 안에 수납된 것으로 만든다.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    titles = book_titles(titles, rng)
+    weights = [1 / (rank + 1) for rank in range(len(titles))]
+
+    with transaction.atomic():
+        names = student_names(students, rng, Student.objects.values_list('name', flat=True))
+        created = Student.objects.bulk_create(
+            [Student(name=name, synthetic=True) for name in names], batch_size=BATCH_SIZE
+        )
+        if not all(student.pk for student in created):
+            # pk 를 돌려주지 않는 DB 에서는 이름으로 다시 읽는다
+            created = list(Student.objects.filter(name__in=names))
+
+        books, issued, paid = [], 0, 0
+        for student in created:
+            for _ in range(max(0, round(rng.gauss(books_per_student, books_per_student / 2)))):
+                book_name, price = rng.choices(titles, weights)[0]
+                input_date = today - timedelta(days=rng.randrange(days))
+                payment_date = None
+                if rng.random() < paid_ratio:
+                    payment_date = min(today, input_date + timedelta(days=rng.randint(0, 60)))
+                    paid += 1
+                books.append(Book(
+                    student=student,
+                    book_name=book_name,
+                    price=price + rng.choice((0, 0, 0, 500, 1000)),
+                    input_date=input_date,
+                    checking=payment_date is not None,
+                    payment_date=payment_date,
+                ))
+                issued += 1
+                if len(books) >= BATCH_SIZE:
+                    Book.objects.bulk_create(books)
+                    books = []
+        Book.objects.bulk_create(books)
+
+        ledger.rebuild()
+        title_count = catalog.rebuild()
+        rollups.rebuild()
+        transaction.on_commit(student_index.invalidate)
+        transaction.on_commit(ledger_snapshot.invalidate)
+
+    return {'students': len(created), 'books': issued, 'paid': paid, 'titles': title_count}
+
+
+def clear():
+    """모든 학생/교재를 지우고 원장, 교재 목록, 월별 집계를 비운다."""
+    with transaction.atomic():
+        Book.objects.all().delete()
+        Student.objects.all().delete()
+        ledger.rebuild()
+        catalog.rebuild()
+        rollups.rebuild()
+        transaction.on_commit(student_index.invalidate)
+        transaction.on_commit(ledger_snapshot.invalidate)
@@ -1,3 +1,1469 @@
-from django.test import TestCase
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import F, Sum
+from django.test import TestCase as DjangoTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from . import archive, backup_store, catalog, ledger, page_cache, report_cache, restore, rollups, synthetic, typeahead, writes
+from .admin import admin_site
+from .models import ArchivedBook, Book, Catalog, Student, TitleMonthlyRollup
+from .reports import BOOK_FIELDS, NumberedCanvas, ReportBook, get_renderer
+from .search import student_index
+from .snapshot import ledger_snapshot
+
+class TestCase(DjangoTestCase):
+    """페이지 캐시(textbook.page_cache)와 원장 스냅샷은 프로세스 전역이고 테스트는 커밋하지 않으므로 테스트마다 비운다."""
+
+    def setUp(self):
+        super().setUp()
+        page_cache.clear()
+        page_cache.stats.reset()
+        ledger_snapshot.invalidate()
+
+
+def use_report_fonts():
+    """보고서 폰트(NotoSansKR)는 저장소에 없으므로 없으면 static/fonts 의 Ubuntu 폰트를 같은 이름으로 등록한다.
+
+    한글은 빈 글자로 그려지지만 페이지 구성과 쪽 번호는 같다.
+    """
+    font_dir = os.path.join(settings.BASE_DIR, 'static', 'fonts')
+    if os.path.exists(os.path.join(font_dir, 'NotoSansKR-Regular.ttf')):
+        return
+    for name, filename in (('NotoSansKR', 'Ubuntu-Regular.ttf'), ('NotoSansKR-Bold', 'Ubuntu-Bold.ttf')):
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, os.path.join(font_dir, filename)))
+
+
+# 인덱스 없이 테이블 전체를 읽는 단계 (예: "SCAN book"). "SCAN book USING INDEX ..." 는 제외
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class QueryPlanTests(TestCase):
+    """주요 화면의 쿼리가 인덱스를 쓰는지 EXPLAIN QUERY PLAN 으로 확인한다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        students = [Student.objects.create(name=f'학생{i:03d}') for i in range(30)]
+        start = date(2024, 3, 1)
+        for i, student in enumerate(students):
+            for j in range(10):
+                Book.objects.create(
+                    student=student,
+                    book_name=f'교재{j:02d}',
+                    price=10000 + j * 1000,
+                    input_date=start + timedelta(days=i + j * 7),
+                    payment_date=start + timedelta(days=60) if j % 3 == 0 else None,
+                )
+        cls.student = students[0]
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def query_plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScan(self, sql, params=(), allowed=()):
+        plan = self.query_plan(sql, params)
+        for detail in plan:
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) not in allowed:
+                self.fail(f"Full scan of {match.group(1)}:\n{sql}\n" + '\n'.join(plan))
+
+    def assertQuerysetUsesIndex(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        self.assertNoFullScan(sql, params)
+
+    def assertViewUsesIndexes(self, url, allowed=()):
+        """url 을 요청하는 동안 실행된 SELECT 를 모두 검사한다. allowed: 전체 스캔을 허용할 테이블"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNoFullScan(sql, allowed=allowed)
+
+    def test_dashboard(self):
+        self.assertViewUsesIndexes('/textbook/dashboard/')
+        response = self.client.get('/textbook/api/dashboard/', {'limit': 10})
+        self.assertViewUsesIndexes(f"/textbook/api/dashboard/?cursor={response.json()['next']}")
+
+    def test_dashboard_search(self):
+        # 이름 중간 일치(LIKE '%...%')는 B-tree 인덱스로 찾을 수 없어 student 만 훑는다
+        # (합계 서브쿼리에서는 별칭 U0 으로 나온다)
+        self.assertViewUsesIndexes('/textbook/dashboard/?search=학생', allowed={'student', 'U0'})
+
+    def test_student_detail(self):
+        self.assertViewUsesIndexes(f'/textbook/student/{self.student.pk}/')
+
+    def test_generate_report(self):
+        # generate_report 가 fingerprint 와 보고서에 쓰는 쿼리 (PDF 렌더링은 폰트가 필요해 쿼리만 확인)
+        self.assertQuerysetUsesIndex(
+            self.student.books.order_by('input_date', 'id').values_list(*BOOK_FIELDS)
+        )
+
+    def test_get_books(self):
+        self.assertGreater(Catalog.objects.count(), 0)
+        self.assertViewUsesIndexes('/textbook/get-books/')
+        # 교재명 중간 일치는 catalog 를 훑는다 (교재명별 한 행이라 book 보다 훨씬 작다)
+        self.assertViewUsesIndexes('/textbook/get-books/?term=교재', allowed={'catalog'})
+
+    def test_ledger(self):
+        self.assertQuerysetUsesIndex(
+            Book.objects.filter(student=self.student, payment_date__isnull=True)
+        )
+        rows = (
+            Book.objects.filter(payment_date__isnull=True)
+            .order_by()
+            .values('student_id')
+        )
+        self.assertQuerysetUsesIndex(rows)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        self.assertViewUsesIndexes('/admin/textbook/student/')
+        self.assertViewUsesIndexes('/admin/textbook/book/')
+        self.assertViewUsesIndexes(f'/admin/textbook/book/?student__id__exact={self.student.pk}')
+        # 교재 목록 개수(COUNT)는 어느 인덱스로 세어도 전부 읽는다 (교재명별 한 행이라 작다)
+        self.assertViewUsesIndexes('/admin/textbook/catalog/', allowed={'catalog'})
+
+
+class AdminQueryCountTests(TestCase):
+    """관리자 목록의 쿼리 수가 한 페이지의 행 수와 무관한지 확인한다 (N+1 방지)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(40):
+            student = Student.objects.create(name=f'학생{i:03d}')
+            for j in range(3):
+                Book.objects.create(
+                    student=student,
+                    book_name=f'교재{j:02d}',
+                    price=10000,
+                    input_date=date(2024, 3, 1) + timedelta(days=j),
+                )
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def count_queries(self, model_admin, url, per_page):
+        original = model_admin.list_per_page
+        model_admin.list_per_page = per_page
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        finally:
+            model_admin.list_per_page = original
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), per_page)
+        return len(queries)
+
+    def assertConstantQueries(self, model, url):
+        model_admin = admin_site._registry[model]
+        self.client.force_login(self.admin)
+        self.assertEqual(
+            self.count_queries(model_admin, url, 5),
+            self.count_queries(model_admin, url, 30),
+        )
+
+    def test_student_changelist(self):
+        self.assertConstantQueries(Student, '/admin/textbook/student/')
+
+    def test_book_changelist(self):
+        self.assertConstantQueries(Book, '/admin/textbook/book/')
+
+    def test_book_changelist_filtered_by_student(self):
+        student = Student.objects.first()
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/admin/textbook/book/?student__id__exact={student.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        self.assertContains(response, 'id="student-filter"')
+
+
+class LedgerTests(TestCase):
+    """미납 원장(Student.unpaid_* 와 LedgerTotal)이 교재 변경 후에도 book 테이블과 같은지 확인한다."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+        cls.lee = Student.objects.create(name='이영희')
+
+    def assertBalance(self, student, amount, count):
+        student.refresh_from_db()
+        self.assertEqual((student.unpaid_amount, student.unpaid_count), (amount, count))
+
+    def assertLedgerConsistent(self):
+        self.assertEqual(ledger.verify(), [])
+
+    def create_book(self, student, price, **fields):
+        return Book.objects.create(
+            student=student, book_name=fields.pop('book_name', '수학'), price=price,
+            input_date=date(2024, 3, 2), **fields,
+        )
+
+    def test_create_and_reprice(self):
+        book = self.create_book(self.kim, 12000)
+        self.create_book(self.kim, 5000, book_name='국어', payment_date=date(2024, 3, 5))
+        self.assertBalance(self.kim, 12000, 1)
+        self.assertEqual(ledger.get_total(), (12000, 1))
+        self.assertLedgerConsistent()
+
+        book.price = 15000
+        book.save()
+        self.assertBalance(self.kim, 15000, 1)
+        self.assertLedgerConsistent()
+
+    def test_pay_and_unpay(self):
+        book = self.create_book(self.kim, 12000)
+        book.payment_date = date(2024, 4, 1)
+        book.checking = True
+        book.save()
+        self.assertBalance(self.kim, 0, 0)
+        self.assertLedgerConsistent()
+
+        book.payment_date = None
+        book.checking = False
+        book.save()
+        self.assertBalance(self.kim, 12000, 1)
+        self.assertLedgerConsistent()
+
+    def test_move_book_to_another_student(self):
+        book = self.create_book(self.kim, 12000)
+        book.student = self.lee
+        book.save()
+        self.assertBalance(self.kim, 0, 0)
+        self.assertBalance(self.lee, 12000, 1)
+        self.assertEqual(ledger.get_total(), (12000, 1))
+        self.assertLedgerConsistent()
+
+    def test_delete_book_and_student(self):
+        book = self.create_book(self.kim, 12000)
+        self.create_book(self.kim, 9000, book_name='국어')
+        self.create_book(self.lee, 7000)
+        book.delete()
+        self.assertBalance(self.kim, 9000, 1)
+        self.assertLedgerConsistent()
+
+        # 학생 삭제로 교재가 연쇄 삭제되어도 전체 합계에서 빠진다
+        self.kim.delete()
+        self.assertEqual(ledger.get_total(), (7000, 1))
+        self.assertLedgerConsistent()
+
+    def test_settle(self):
+        self.create_book(self.kim, 12000)
+        self.create_book(self.kim, 9000, book_name='국어')
+        self.create_book(self.lee, 7000)
+        updated = ledger.settle(Book.objects.filter(book_name='수학'), date(2024, 4, 1), checking=True)
+        self.assertEqual(updated, 2)
+        self.assertBalance(self.kim, 9000, 1)
+        self.assertBalance(self.lee, 0, 0)
+        self.assertEqual(ledger.get_total(), (9000, 1))
+        self.assertLedgerConsistent()
+
+    def test_rebuild_ledger_command_reports_and_fixes_drift(self):
+        self.create_book(self.kim, 12000)
+        # queryset.update() 는 시그널을 보내지 않으므로 원장이 어긋난다
+        Book.objects.update(price=20000)
+
+        err = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '2 mismatch(es)'):
+            call_command('rebuild_ledger', '--check', stdout=io.StringIO(), stderr=err)
+        self.assertIn('Mismatch 김철수: ledger=(12000, 1) actual=(20000, 1)', err.getvalue())
+
+        out = io.StringIO()
+        call_command('rebuild_ledger', stdout=out)
+        self.assertIn('1 student balance(s) corrected', out.getvalue())
+        self.assertBalance(self.kim, 20000, 1)
+        call_command('rebuild_ledger', '--check', stdout=out)
+        self.assertIn('Ledger OK: 1 unpaid book(s), 20,000 unpaid in total', out.getvalue())
+
+
+class CatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+
+    def issue(self, book_name, price, input_date, times=1):
+        for _ in range(times):
+            Book.objects.create(student=self.kim, book_name=book_name, price=price, input_date=input_date)
+
+    def catalog_rows(self):
+        return list(Catalog.objects.order_by('name').values_list('name', 'price', 'issue_count', 'last_issued'))
+
+    def test_ranking(self):
+        self.issue('고등 수학', 15000, date(2024, 3, 2), times=5)
+        self.issue('수학의 정석', 20000, date(2024, 3, 2), times=1)
+        self.issue('수학 익힘책', 9000, date(2024, 3, 2), times=3)
+        self.issue('국어', 9000, date(2024, 3, 2), times=9)
+
+        # 앞부분 일치가 먼저, 그 안에서는 많이 지급된 순
+        self.assertEqual(
+            [row['book_name'] for row in catalog.search('수학')],
+            ['수학 익힘책', '수학의 정석', '고등 수학'],
+        )
+        self.assertEqual(catalog.search('수학', limit=1), [{'book_name': '수학 익힘책', 'price': 9000}])
+        # 검색어가 없으면 전체를 많이 지급된 순으로
+        self.assertEqual(
+            [row['book_name'] for row in catalog.search()],
+            ['국어', '고등 수학', '수학 익힘책', '수학의 정석'],
+        )
+        response = self.client.get(reverse('textbook:get_books'), {'term': '정석'})
+        self.assertEqual(response.json(), [{'book_name': '수학의 정석', 'price': 20000}])
+
+    def test_issue_and_reprice_keep_catalog_in_sync(self):
+        self.issue('수학', 12000, date(2024, 3, 2))
+        self.assertEqual(self.catalog_rows(), [('수학', 12000, 1, date(2024, 3, 2))])
+
+        # 더 최근 지급일의 가격이 현재 가격이 된다
+        self.issue('수학', 15000, date(2024, 9, 1))
+        self.assertEqual(self.catalog_rows(), [('수학', 15000, 2, date(2024, 9, 1))])
+        # 예전 날짜로 늦게 입력한 지급은 횟수만 늘린다
+        self.issue('수학', 10000, date(2024, 1, 5))
+        self.assertEqual(self.catalog_rows(), [('수학', 15000, 3, date(2024, 9, 1))])
+
+        ledger.issue('수학', 16000, date(2024, 10, 1), [self.kim.id])
+        expected = self.catalog_rows()
+        self.assertEqual(expected, [('수학', 16000, 4, date(2024, 10, 1))])
+        # book 테이블로 다시 만든 목록과 같다
+        catalog.rebuild()
+        self.assertEqual(self.catalog_rows(), expected)
+
+
+class StudentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('김민수', '강민지', '김철수', '김', 'John Smith', 'Johanna'):
+            Student.objects.create(name=name)
+
+    def setUp(self):
+        super().setUp()
+        student_index.invalidate()
+
+    def names(self, query):
+        return [row['name'] for row in student_index.search(query)]
+
+    def test_chosung_query(self):
+        self.assertEqual(self.names('ㄱㅁ'), ['강민지', '김민수'])
+        self.assertEqual(self.names('ㄱ ㅊ ㅅ'), ['김철수'])
+
+    def test_mid_syllable_prefix(self):
+        # 입력 중인 글자(받침 전, 초성만)도 앞부분 일치로 찾는다
+        self.assertEqual(self.names('김처'), ['김철수'])
+        self.assertEqual(self.names('김ㅊ'), ['김철수'])
+        self.assertEqual(self.names('강미'), ['강민지'])
+        # 정확히 일치하는 이름이 먼저
+        self.assertEqual(self.names('김'), ['김', '김민수', '김철수'])
+
+    def test_latin_names(self):
+        self.assertEqual(self.names('jo'), ['Johanna', 'John Smith'])
+        self.assertEqual(self.names('JOHN'), ['John Smith'])
+        self.assertEqual(self.names('smith'), ['John Smith'])  # 이름 중간 일치
+
+    def test_index_follows_student_changes(self):
+        self.assertEqual(self.names('ㅇㅎ'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(name='이영희')
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.get(name='김철수')
+            student.name = '박철수'
+            student.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.get(name='김민수').delete()
+
+        # 전체를 다시 읽지 않고 바뀐 학생만 반영한다
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('ㅇㅇㅎ'), ['이영희'])
+            self.assertEqual(self.names('ㅂㅊ'), ['박철수'])
+            self.assertEqual(self.names('김'), ['김'])
+
+
+class BulkIssueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+        cls.lee = Student.objects.create(name='이영희')
+        cls.park = Student.objects.create(name='박민수')
+        Book.objects.create(student=cls.lee, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+
+    def post(self, **data):
+        return self.client.post(reverse('textbook:bulk_issue'), {
+            'book_name': '수학', 'price': '15,000', 'issue_date': '2024-03-02', **data,
+        })
+
+    def test_statuses_per_student(self):
+        missing = self.park.id + 100
+        response = self.post(student_ids=[self.kim.id, self.lee.id, missing, self.park.id])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['issued'], 2)
+        self.assertEqual(
+            [(row['student_id'], row['name'], row['status']) for row in data['results']],
+            [
+                (self.kim.id, '김철수', 'issued'),
+                (self.lee.id, '이영희', 'duplicate'),  # 같은 날 같은 교재를 이미 받았다
+                (missing, None, 'not_found'),
+                (self.park.id, '박민수', 'issued'),
+            ],
+        )
+        issued = Book.objects.get(student=self.kim, book_name='수학')
+        self.assertEqual(data['results'][0]['book_id'], issued.id)
+        self.assertIsNone(data['results'][1]['book_id'])
+
+    def test_bulk_insert_updates_ledger_catalog_and_rollups(self):
+        # bulk_create 는 post_save 를 보내지 않으므로 ledger.issue() 가 직접 반영해야 한다
+        data = self.post(student_ids=[self.kim.id, self.park.id]).json()
+        self.assertEqual(data['total_unpaid'], 12000 + 15000 * 2)
+        self.assertEqual(ledger.get_total(), (42000, 3))
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+
+        entry = Catalog.objects.get(name='수학')
+        self.assertEqual((entry.issue_count, entry.price, entry.last_issued), (3, 15000, date(2024, 3, 2)))
+
+    def test_malformed_payload(self):
+        for data in (
+            {'student_ids': ['x']},
+            {'student_ids': []},
+            {'student_ids': [self.kim.id], 'issue_date': '2024/03/02'},
+            {'student_ids': [self.kim.id], 'price': ''},
+            {'student_ids': [self.kim.id], 'book_name': ' '},
+        ):
+            with self.subTest(data=data):
+                response = self.post(**data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertFalse(Book.objects.filter(student=self.kim).exists())
+
+
+class SettleBooksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+        cls.lee = Student.objects.create(name='이영희')
+        cls.math = Book.objects.create(student=cls.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        cls.korean = Book.objects.create(student=cls.kim, input_date=date(2024, 4, 2), book_name='국어', price=9000)
+        cls.english = Book.objects.create(student=cls.kim, input_date=date(2024, 5, 2), book_name='영어', price=7000)
+        cls.other = Book.objects.create(student=cls.lee, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+
+    def settle(self, **data):
+        return self.client.post(reverse('textbook:settle_books', args=[self.kim.id]), {
+            'payment_date': '2024-06-01', **data,
+        })
+
+    def paid_ids(self):
+        return set(Book.objects.filter(payment_date__isnull=False).values_list('id', flat=True))
+
+    def assertTotalsMatchLedger(self, data):
+        self.kim.refresh_from_db()
+        self.assertEqual((data['unpaid_amount'], data['unpaid_count']), (self.kim.unpaid_amount, self.kim.unpaid_count))
+        self.assertEqual(data['total_unpaid'], ledger.get_total()[0])
+        self.assertEqual(ledger.verify(), [])
+
+    def test_book_ids(self):
+        data = self.settle(book_ids=[self.korean.id]).json()
+        self.assertEqual(data['settled'], [self.korean.id])
+        self.assertEqual(self.paid_ids(), {self.korean.id})
+        self.assertEqual((data['unpaid_amount'], data['paid_amount'], data['total_unpaid']), (19000, 9000, 31000))
+        self.assertTotalsMatchLedger(data)
+
+    def test_up_to(self):
+        data = self.settle(up_to='2024-04-02').json()
+        self.assertEqual(sorted(data['settled']), sorted([self.math.id, self.korean.id]))
+        self.assertEqual((data['unpaid_amount'], data['unpaid_count'], data['paid_amount']), (7000, 1, 21000))
+        self.assertTotalsMatchLedger(data)
+
+    def test_other_students_books_are_ignored(self):
+        data = self.settle(book_ids=[self.other.id, self.math.id]).json()
+        self.assertEqual(data['settled'], [self.math.id])
+        self.assertEqual(self.paid_ids(), {self.math.id})
+        self.assertTotalsMatchLedger(data)
+
+    def test_invalid_input(self):
+        self.assertEqual(self.settle(payment_date='').status_code, 400)
+        self.assertEqual(self.settle(payment_date='2024/06/01').status_code, 400)
+        self.assertEqual(self.settle(up_to='june').status_code, 400)
+        self.assertEqual(self.settle(book_ids=['x']).status_code, 400)
+        self.assertEqual(self.client.get(reverse('textbook:settle_books', args=[self.kim.id])).status_code, 405)
+        self.assertEqual(self.paid_ids(), set())
+
+
+class DashboardPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(45):
+            student = Student.objects.create(name=f'학생{i:03d}')
+            if i % 3:
+                Book.objects.create(student=student, book_name='교재', price=1000 * i, input_date=date(2024, 3, 1))
+
+    def test_cursor_walks_every_unpaid_student_once(self):
+        names, cursor, pages = [], None, 0
+        while True:
+            params = {'limit': 7, **({'cursor': cursor} if cursor else {})}
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get('/textbook/api/dashboard/', params).json()
+            # 캐시 버전(page_cache.version) 한 번과 페이지 쿼리 한 번
+            self.assertEqual(len(queries), 2)
+            self.assertEqual(data['total_students'], 30)
+            names += [student['name'] for student in data['results']]
+            pages += 1
+            cursor = data['next']
+            if not cursor:
+                break
+
+        expected = list(
+            Student.objects.filter(unpaid_amount__gt=0).order_by('name').values_list('name', flat=True)
+        )
+        self.assertEqual(names, expected)
+        self.assertEqual(pages, 5)
+        self.assertEqual(data['total_unpaid'], sum(1000 * i for i in range(45) if i % 3))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/textbook/api/dashboard/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pw')
+        kim = Student.objects.create(name='김철수')
+        lee = Student.objects.create(name='이영희')
+        Book.objects.create(student=kim, input_date=date(2024, 3, 2), book_name='수학, 개념', price=12000)
+        Book.objects.create(student=kim, input_date=date(2024, 3, 2), book_name='국어', price=9000,
+                            checking=True, payment_date=date(2024, 4, 1))
+        Book.objects.create(student=lee, input_date=date(2024, 5, 1), book_name='영어', price=15000,
+                            checking=True, payment_date=date(2024, 6, 1))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def download(self, kind, **params):
+        response = self.client.get(reverse('textbook:export', args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_balances_csv_has_bom_and_unpaid_rows(self):
+        response, content = self.download('balances', format='csv')
+        self.assertIn('attachment; filename="unpaid_balances_', response['Content-Disposition'])
+        self.assertTrue(content.startswith(codecs.BOM_UTF8))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows, [['학생 이름', '미납 금액', '미납 교재 수'], ['김철수', '12000', '1']])
+
+    def test_payments_date_range(self):
+        _, content = self.download('payments', format='csv', **{'from': '2024-05-01', 'to': '2024-12-31'})
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual([row[2] for row in rows[1:]], ['영어'])
+
+    def test_ledger_xlsx_is_valid_workbook(self):
+        response, content = self.download('ledger', format='xlsx', student='김철수')
+        self.assertTrue(response['Content-Disposition'].endswith('.xlsx"'))
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        rows = sheet.findall(f'{ns}sheetData/{ns}row')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1].find(f'{ns}c/{ns}is/{ns}t').text, '김철수')
+
+    def test_unknown_kind_or_format(self):
+        self.assertEqual(self.client.get(reverse('textbook:export', args=['nope'])).status_code, 404)
+        url = reverse('textbook:export', args=['balances'])
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('textbook:export', args=['payments']), {'from': 'x'}).status_code, 400)
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_dir = os.path.join(tmp_dir.name, 'report_cache')
+        settings_override = override_settings(REPORT_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.student = Student.objects.create(name='김철수')
+
+    def test_unknown_report_type_is_rejected_before_caching(self):
+        url = reverse('textbook:generate_report', args=[self.student.id])
+        for report_type in ('x', '../../escape', 'a/b', 'a\\b'):
+            self.assertEqual(self.client.get(url, {'type': report_type}).status_code, 400)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_path_stays_inside_cache_dir(self):
+        with report_cache.store(self.student.id, 'unpaid', 'abc', lambda output: output.write(b'%PDF')) as stored:
+            path = stored.name
+        self.assertEqual(os.path.dirname(path), os.path.realpath(self.cache_dir))
+        with report_cache.get(self.student.id, 'unpaid', 'abc') as cached:
+            self.assertEqual(cached.name, path)
+        with self.assertRaises(ValueError):
+            report_cache.get(self.student.id, '../escape', 'abc')
+
+    def test_file_deleted_while_serving(self):
+        use_report_fonts()
+        Book.objects.create(student=self.student, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        url = reverse('textbook:generate_report', args=[self.student.id])
+        first = b''.join(self.client.get(url).streaming_content)
+
+        # 캐시에서 연 직후 다른 요청/프로세스가 invalidate() 로 지운다
+        get = report_cache.get
+
+        def get_then_invalidate(*args):
+            output = get(*args)
+            report_cache.invalidate(self.student.id)
+            return output
+
+        with mock.patch.object(report_cache, 'get', get_then_invalidate):
+            response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), first)
+
+        # 저장하자마자 지워져도 메모리에서 다시 만든 보고서로 응답한다
+        replace = os.replace
+
+        def replace_then_delete(src, dst):
+            replace(src, dst)
+            os.remove(dst)
+
+        with mock.patch.object(report_cache.os, 'replace', replace_then_delete):
+            output = report_cache.store(self.student.id, 'all', 'def', lambda output: output.write(b'%PDF-1.4'))
+        self.assertEqual(output.read(), b'%PDF-1.4')
+
+
+class ReportRendererTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        use_report_fonts()
+
+    def render(self, books, report_type='all'):
+        """압축하지 않은 PDF 와 쪽 번호 폼에 그린 문자열 목록"""
+        footers = []
+        draw_right_string = NumberedCanvas.drawRightString
+
+        def record(canvas, x, y, text, *args, **kwargs):
+            if text.startswith('Page '):
+                footers.append(text)
+            return draw_right_string(canvas, x, y, text, *args, **kwargs)
+
+        output = io.BytesIO()
+        with mock.patch.object(rl_config, 'pageCompression', 0), \
+                mock.patch.object(NumberedCanvas, 'drawRightString', record):
+            get_renderer().render('김철수', books, report_type, output)
+        return output.getvalue(), footers
+
+    def test_page_numbers(self):
+        books = [
+            ReportBook(i, date(2024, 1, 1) + timedelta(days=i), f'교재 {i}', 1000, False, None)
+            for i in range(120)
+        ]
+        pdf, footers = self.render(books)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+        # 페이지마다 자기 번호의 폼을 하나씩 참조하고, 폼에는 전체 페이지 수가 들어간다
+        page_count = len(re.findall(rb'/Type /Page\b(?!s)', pdf))
+        self.assertGreater(page_count, 2)
+        forms = re.findall(rb'/FormXob\.pageNumber(\d+) \d+ 0 R', pdf)
+        self.assertEqual([int(number) for number in forms], list(range(1, page_count + 1)))
+        self.assertEqual(footers, [f'Page {n} of {page_count}' for n in range(1, page_count + 1)])
+
+        # 교재가 적으면 한 페이지
+        pdf, footers = self.render(books[:3], 'unpaid')
+        self.assertEqual(footers, ['Page 1 of 1'])
+
+    def test_stamp_comes_from_the_books_not_the_clock(self):
+        books = [
+            ReportBook(1, date(2024, 3, 2), '수학', 12000, True, date(2024, 5, 20)),
+            ReportBook(2, date(2024, 4, 1), '국어', 9000, False, None),
+        ]
+        stamps = []
+        draw_string = NumberedCanvas.drawString
+
+        def record(canvas, x, y, text, *args, **kwargs):
+            stamps.append(text)
+            return draw_string(canvas, x, y, text, *args, **kwargs)
+
+        with mock.patch.object(NumberedCanvas, 'drawString', record):
+            get_renderer().render('김철수', books, 'unpaid', io.BytesIO())
+        self.assertIn('기준일: 2024-05-20', stamps)
+        self.assertFalse([text for text in stamps if '작성일시' in text])
+
+
+class GenerateReportsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+        cls.lee = Student.objects.create(name='이영희')
+        cls.book = Book.objects.create(student=cls.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        Book.objects.create(student=cls.lee, input_date=date(2024, 3, 2), book_name='국어', price=9000)
+
+    def setUp(self):
+        super().setUp()
+        use_report_fonts()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.output_dir = tmp_dir.name
+
+    def generate(self):
+        out = io.StringIO()
+        call_command('generate_reports', '--workers', '1', '--output-dir', self.output_dir, stdout=out)
+        return out.getvalue()
+
+    def manifest(self):
+        with open(os.path.join(self.output_dir, '.reports.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_only_changed_or_missing_reports_are_rendered(self):
+        self.assertIn('Rendered 2 report(s), skipped 0 unchanged', self.generate())
+        first = self.manifest()
+        self.assertEqual(set(first), {f'{self.kim.id}:unpaid', f'{self.lee.id}:unpaid'})
+
+        # 바뀐 것이 없으면 모두 건너뛴다
+        self.assertIn('Rendered 0 report(s), skipped 2 unchanged', self.generate())
+
+        # 교재가 바뀐 학생만 다시 만든다
+        self.book.price = 15000
+        self.book.save()
+        self.assertIn('Rendered 1 report(s), skipped 1 unchanged', self.generate())
+        second = self.manifest()
+        self.assertNotEqual(second[f'{self.kim.id}:unpaid'], first[f'{self.kim.id}:unpaid'])
+        self.assertEqual(second[f'{self.lee.id}:unpaid'], first[f'{self.lee.id}:unpaid'])
+
+        # 파일이 지워졌으면 내용이 같아도 다시 만든다
+        os.remove(os.path.join(self.output_dir, second[f'{self.lee.id}:unpaid']['file']))
+        self.assertIn('Rendered 1 report(s), skipped 1 unchanged', self.generate())
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, self.manifest()[f'{self.lee.id}:unpaid']['file'])))
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_keeps_ledger_and_catalog_consistent(self):
+        result = synthetic.generate(students=40, books_per_student=5, paid_ratio=0.5, titles=15, seed=7)
+
+        self.assertEqual(Student.objects.count(), 40)
+        self.assertEqual(Book.objects.count(), result['books'])
+        self.assertEqual(Book.objects.filter(payment_date__isnull=False).count(), result['paid'])
+        self.assertFalse(Book.objects.filter(payment_date__lt=F('input_date')).exists())
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(Catalog.objects.aggregate(total=Sum('issue_count'))['total'], result['books'])
+
+    def test_generate_data_requires_an_explicit_target(self):
+        options = ['--students', '3', '--books-per-student', '2', '--titles', '2', '--seed', '1']
+        with self.assertRaisesMessage(CommandError, 'Refusing to write synthetic data'):
+            call_command('generate_data', *options, stdout=io.StringIO())
+        self.assertFalse(Student.objects.exists())
+
+        call_command('generate_data', *options, '--yes', stdout=io.StringIO())
+        self.assertEqual(set(Student.objects.values_list('synthetic', flat=True)), {True})
+        # 가상 학생만 있으면 더 넣을 수 있다
+        call_command('generate_data', *options, '--yes', stdout=io.StringIO())
+        self.assertEqual(Student.objects.count(), 6)
+
+        # 실제 학생이 있으면 --force 없이는 거절한다
+        Student.objects.create(name='김철수')
+        with self.assertRaisesMessage(CommandError, 'already holds 1 real student(s)'):
+            call_command('generate_data', *options, '--yes', stdout=io.StringIO())
+        call_command('generate_data', *options, '--yes', '--force', stdout=io.StringIO())
+        self.assertEqual(Student.objects.count(), 10)
+
+        # 테스트 DB(메모리, 트랜잭션 안)는 다른 파일로 바꿀 수 없으므로 쓰지 않고 거절한다
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaisesMessage(CommandError, '--database cannot switch'):
+                call_command('generate_data', *options, '--database', os.path.join(tmp_dir, 'synthetic.db'),
+                             stdout=io.StringIO())
+        self.assertEqual(Student.objects.count(), 10)
+
+    def test_benchmark_views_writes_baseline(self):
+        synthetic.generate(students=10, books_per_student=3, titles=5, seed=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'baseline.json')
+            # generate_report 는 폰트 파일이 필요해서 제외한다
+            call_command('benchmark_views', '--in-place', '--iterations', '2', '--warmup', '0',
+                         '--only', 'dashboard', 'student_detail', 'issue_book', 'admin_book_changelist',
+                         '--output', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        self.assertEqual(baseline['data']['students'], 10)
+        self.assertEqual(
+            set(baseline['cases']), {'dashboard', 'student_detail', 'issue_book', 'admin_book_changelist'}
+        )
+        for case in baseline['cases'].values():
+            self.assertIsInstance(case['queries'], int)
+            self.assertLessEqual(case['p50_ms'], case['p95_ms'])
+        # 되돌린 트랜잭션에서 실행했으므로 issue_book 의 교재가 남지 않는다
+        self.assertFalse(Book.objects.filter(book_name='benchmark').exists())
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(name='김철수')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('textbook:dashboard'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('perf', 'WARNING') as logs:
+            response = self.client.post(reverse('textbook:issue_book'), {
+                'student_id': self.student.id, 'book_name': '수학', 'price': '12,000', 'issue_date': '2024-03-02',
+            })
+        self.assertEqual(response.status_code, 302)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['method'], 'POST')
+        self.assertEqual(entry['status'], 302)
+        self.assertEqual(entry['tags'], {
+            'student_id': str(self.student.id), 'book_name': '수학', 'price': 12000, 'issue_date': '2024-03-02',
+        })
+        self.assertGreater(entry['sql_count'], 0)
+        self.assertEqual(len(entry['slowest_sql']), min(5, entry['sql_count']))
+        durations = [query['ms'] for query in entry['slowest_sql']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('perf', 'WARNING'):
+            self.client.get(reverse('textbook:search_students'), {'query': '김'})
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kim = Student.objects.create(name='김철수')
+        cls.lee = Student.objects.create(name='이영희')
+        Book.objects.create(student=cls.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        Book.objects.create(student=cls.kim, input_date=date(2024, 3, 2), book_name='국어', price=9000,
+                            checking=True, payment_date=date(2024, 4, 1))
+
+    def test_dashboard_is_served_from_cache_until_a_book_changes(self):
+        url = reverse('textbook:dashboard')
+        first = self.client.get(url)
+        # 적중하면 캐시 버전만 읽는다
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(student=self.lee, input_date=date(2024, 5, 1), book_name='영어', price=15000)
+        self.assertContains(self.client.get(url), '이영희')
+        self.assertEqual(page_cache.stats.as_dict()['dashboard'], {'hits': 1, 'misses': 2, 'hit_rate': 0.333})
+
+    def test_student_paid_fragment_uses_per_student_version(self):
+        kim_url = reverse('textbook:student_detail', args=[self.kim.id])
+        self.client.get(kim_url)
+        self.client.get(kim_url)
+        self.assertEqual(page_cache.stats.as_dict()['student_paid']['hits'], 1)
+
+        # 다른 학생의 변경은 김철수의 조각을 무효화하지 않는다
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(student=self.lee, input_date=date(2024, 5, 1), book_name='영어', price=15000)
+        self.client.get(kim_url)
+        self.assertEqual(page_cache.stats.as_dict()['student_paid']['hits'], 2)
+
+        # 일괄 수납(queryset.update)도 books_updated 로 버전을 올린다
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.settle(Book.objects.filter(student=self.kim, book_name='수학'), date(2024, 6, 1), checking=True)
+        response = self.client.get(kim_url)
+        self.assertEqual(page_cache.stats.as_dict()['student_paid']['misses'], 2)
+        self.assertContains(response, '<span id="totalPaid">21,000</span>', html=False)
+
+    def test_versions_are_shared_through_the_database(self):
+        # 다른 프로세스(manage.py 등)의 변경: 이 프로세스의 시그널 없이 DB 만 바뀐다
+        kim_url = reverse('textbook:student_detail', args=[self.kim.id])
+        self.client.get(reverse('textbook:dashboard'))
+        self.client.get(kim_url)
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE book SET price = 13000 WHERE book_name = %s', ['국어'])
+            cursor.execute('UPDATE student SET unpaid_amount = 99000, cache_version = cache_version + 1 WHERE id = %s',
+                           [self.kim.id])
+            cursor.execute('UPDATE ledger_total SET cache_version = cache_version + 1')
+
+        self.assertContains(self.client.get(reverse('textbook:dashboard')), '99,000')
+        self.assertContains(self.client.get(kim_url), '<span id="totalPaid">13,000</span>', html=False)
+        self.assertEqual(page_cache.stats.as_dict()['dashboard']['misses'], 2)
+        self.assertEqual(page_cache.stats.as_dict()['student_paid']['misses'], 2)
+
+    def test_rebuild_and_restore_bump_every_version(self):
+        versions = dict(Student.objects.values_list('id', 'cache_version'))
+        total = page_cache.version()
+        ledger.rebuild()
+        self.assertEqual(
+            dict(Student.objects.values_list('id', 'cache_version')),
+            {student_id: version + 1 for student_id, version in versions.items()},
+        )
+        self.assertEqual(page_cache.version(), total + 1)
+
+        # 복원한 DB 의 버전이 예전보다 작아도 복원 전 가장 큰 버전 위로 올린다
+        floor = page_cache.max_version()
+        Student.objects.update(cache_version=0)
+        page_cache.bump_all(above=floor)
+        self.assertEqual(set(Student.objects.values_list('cache_version', flat=True)), {floor + 1})
+        self.assertGreater(page_cache.version(), floor)
+
+    def test_admin_cache_stats(self):
+        url = reverse('textbook:dashboard')
+        self.client.get(url)
+        self.client.get(url)
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse(f'{admin_site.name}:cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dashboard'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class TypeaheadTests(TransactionTestCase):
+    """쿼리는 전용 풀 스레드의 다른 연결에서 돌기 때문에 커밋된 데이터가 필요하다"""
+
+    def setUp(self):
+        super().setUp()
+        Student.objects.create(name='김철수')
+        Student.objects.create(name='김영희')
+        Catalog.objects.create(name='수학 1', price=12000, issue_count=3)
+        Catalog.objects.create(name='수학 2', price=13000, issue_count=5)
+        student_index.invalidate()
+
+    async def test_results_are_limited(self):
+        response = await self.async_client.get(reverse('textbook:typeahead_books'), {'term': '수학', 'limit': 1})
+        self.assertEqual(response.json(), [{'book_name': '수학 2', 'price': 13000}])
+
+        response = await self.async_client.get(reverse('textbook:typeahead_students'), {'query': '김', 'limit': 99})
+        self.assertEqual(len(response.json()), 2)
+
+    async def test_superseded_request_returns_none(self):
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+            return ['old']
+
+        async def fast():
+            return ['new']
+
+        key = ('books', 'tab1')
+        first = asyncio.ensure_future(typeahead.latest_only(key, slow()))
+        await started.wait()
+        self.assertEqual(await typeahead.latest_only(key, fast()), ['new'])
+        self.assertIsNone(await first)
+
+    async def test_router_sends_typeahead_paths_to_lean_handler(self):
+        other_paths = []
+
+        async def application(scope, receive, send):
+            other_paths.append(scope['path'])
+
+        router = typeahead.route(application)
+        statuses = []
+        bodies = []
+
+        async def receive():
+            if not bodies:
+                bodies.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()  # 연결은 끊기지 않는다
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'query_string': b'', 'headers': [(b'host', b'testserver')],
+        }
+        await router({**scope, 'path': reverse('textbook:dashboard')}, receive, send)
+        await router({**scope, 'path': reverse('textbook:typeahead_students')}, receive, send)
+        self.assertEqual(other_paths, [reverse('textbook:dashboard')])
+        self.assertEqual(statuses, [200])
+
+        bodies.clear()
+        await router({**scope, 'path': reverse('textbook:typeahead_students'),
+                      'headers': [(b'host', b'evil.example')]}, receive, send)
+        self.assertEqual(statuses, [200, 400])
+
+    async def test_queries_run_on_the_dedicated_pool(self):
+        self.assertIs(typeahead.TypeaheadASGIHandler.__call__, ASGIHandler.__call__)
+        name = await typeahead.run_query(lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('typeahead-db'))
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.kim = Student.objects.create(name='김철수')
+        self.lee = Student.objects.create(name='이영희')
+
+    def test_rollups_follow_book_changes(self):
+        math = Book.objects.create(student=self.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        Book.objects.create(student=self.kim, input_date=date(2024, 3, 5), book_name='국어', price=9000)
+        ledger.issue('영어', 15000, date(2024, 4, 1), [self.kim.id, self.lee.id])
+        self.assertEqual(rollups.verify(), [])
+
+        # 수납, 수납일/가격/학생 변경, 일괄 수납, 삭제
+        math.payment_date = date(2024, 4, 10)
+        math.save()
+        math.price = 13000
+        math.student = self.lee
+        math.payment_date = date(2024, 5, 1)
+        math.save()
+        ledger.settle(Book.objects.filter(book_name='영어'), date(2024, 5, 3), checking=True)
+        Book.objects.filter(book_name='국어').delete()
+        self.assertEqual(rollups.verify(), [])
+
+        months = {row['month']: row for row in rollups.monthly(date(2024, 1, 1), date(2024, 12, 1))}
+        self.assertEqual(months[date(2024, 3, 1)]['issued_amount'], 13000)
+        self.assertEqual(months[date(2024, 4, 1)]['issued_amount'], 30000)
+        self.assertEqual(months[date(2024, 5, 1)]['collected_amount'], 43000)
+        self.assertEqual(sum(row['outstanding_amount'] for row in months.values()), 0)
+
+        # 학생 삭제: 학생 집계는 연쇄 삭제되고 교재 집계에서는 빠진다
+        self.lee.delete()
+        self.assertEqual(rollups.verify(), [])
+
+    def test_analytics_reads_only_rollups(self):
+        Book.objects.create(student=self.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        Book.objects.create(student=self.lee, input_date=date(2024, 3, 9), book_name='수학', price=12000,
+                            payment_date=date(2024, 4, 1))
+
+        ledger_snapshot.load()  # 미납 경과일은 미리 읽어 둔 스냅샷에서 계산한다 (새 교재 id 확인만 한다)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('textbook:analytics'), {'from': '2024-01', 'to': '2024-06', 'format': 'json'})
+        self.assertFalse([
+            query['sql'] for query in captured
+            if 'FROM "book"' in query['sql'] and '"book"."id" >' not in query['sql']
+        ])
+
+        data = response.json()
+        self.assertEqual(data['totals']['issued_amount'], 24000)
+        self.assertEqual(data['totals']['collected_amount'], 12000)
+        self.assertEqual(data['totals']['outstanding_amount'], 12000)
+        self.assertEqual(data['titles'][0]['book_name'], '수학')
+        self.assertEqual(data['students'][0]['student_name'], '김철수')
+
+        self.assertContains(self.client.get(reverse('textbook:analytics')), '월별 지급/수납 현황')
+        self.assertEqual(self.client.get(reverse('textbook:analytics'), {'from': '2024'}).status_code, 400)
+
+    def test_rebuild_command(self):
+        Book.objects.create(student=self.kim, input_date=date(2024, 3, 2), book_name='수학', price=12000)
+        TitleMonthlyRollup.objects.update(issued_amount=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=io.StringIO(), stderr=io.StringIO())
+        out = io.StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        self.assertIn('Rollups OK', out.getvalue())
+
+
+class LedgerSnapshotTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.kim = Student.objects.create(name='김철수')
+        self.lee = Student.objects.create(name='이영희')
+        Book.objects.create(student=self.kim, input_date=date(2024, 1, 10), book_name='수학', price=12000)
+        Book.objects.create(student=self.kim, input_date=date(2024, 3, 1), book_name='국어', price=9000)
+        Book.objects.create(student=self.lee, input_date=date(2024, 2, 1), book_name='수학', price=12000,
+                            payment_date=date(2024, 2, 21))
+        Book.objects.create(student=self.lee, input_date=date(2024, 2, 5), book_name='영어', price=15000,
+                            payment_date=date(2024, 4, 5))
+
+    def buckets(self, today):
+        return [(row['amount'], row['count']) for row in ledger_snapshot.aging(today)['buckets']]
+
+    def test_breakdowns(self):
+        # 3/15 기준: 국어 14일, 수학 65일
+        self.assertEqual(self.buckets(date(2024, 3, 15)), [(9000, 1), (0, 0), (12000, 1), (0, 0)])
+        aging = ledger_snapshot.aging(date(2024, 6, 1))
+        self.assertEqual(aging['overdue_students'], [{'student_id': self.kim.id, 'amount': 21000}])
+
+        popularity = ledger_snapshot.popularity(date(2024, 2, 1), date(2024, 12, 31))
+        self.assertEqual(popularity, [
+            {'book_name': '국어', 'count': 1, 'amount': 9000, 'unpaid_count': 1},
+            {'book_name': '수학', 'count': 1, 'amount': 12000, 'unpaid_count': 0},
+            {'book_name': '영어', 'count': 1, 'amount': 15000, 'unpaid_count': 0},
+        ])
+        self.assertEqual(ledger_snapshot.popularity()[0]['count'], 2)
+
+        lag = ledger_snapshot.collection_lag()
+        self.assertEqual((lag['count'], lag['mean_days'], lag['median_days']), (2, 40.0, 60))
+        self.assertEqual([row['count'] for row in lag['buckets']], [1, 1, 0, 0])  # 20일, 60일
+        self.assertEqual(lag['slowest_titles'][0], {'book_name': '영어', 'mean_days': 60.0, 'count': 1})
+
+    def test_incremental_refresh(self):
+        ledger_snapshot.load()
+        today = date(2024, 3, 15)
+
+        # 다른 프로세스에서 추가된 교재: id 로 찾는다
+        Book.objects.create(student=self.lee, input_date=date(2024, 3, 10), book_name='과학', price=8000)
+        self.assertFalse(ledger_snapshot.refresh())
+        self.assertEqual(self.buckets(today)[0], (17000, 2))
+
+        # 수납/삭제: 커밋 후 시그널이 학생을 표시하면 그 학생의 행만 다시 읽는다
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.settle(Book.objects.filter(book_name='국어'), date(2024, 3, 14))
+            Book.objects.filter(book_name='과학').delete()
+            Book.objects.filter(book_name='수학', student=self.kim).update(student=self.lee)
+            ledger_snapshot.mark_dirty([self.lee.id])
+        with CaptureQueriesContext(connection) as captured:
+            self.assertFalse(ledger_snapshot.refresh())
+        self.assertEqual(len(captured), 2)
+        self.assertEqual(self.buckets(today), [(0, 0), (0, 0), (12000, 1), (0, 0)])
+        self.assertEqual(len(ledger_snapshot), 4)
+
+        aging = ledger_snapshot.aging(date(2024, 6, 1))
+        self.assertEqual(aging['overdue_students'], [{'student_id': self.lee.id, 'amount': 12000}])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('textbook:analytics_snapshot', args=['aging']))
+        self.assertEqual(response.json()['overdue_students'][0]['student_name'], '김철수')
+        response = self.client.get(reverse('textbook:analytics_snapshot', args=['popularity']),
+                                   {'from': '2024-02-01', 'to': '2024-02-28'})
+        self.assertEqual([row['book_name'] for row in response.json()], ['수학', '영어'])
+        self.assertEqual(self.client.get(reverse('textbook:analytics_snapshot', args=['lag']), {'from': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('textbook:analytics_snapshot', args=['other'])).status_code, 404)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        self.kim = Student.objects.create(name='김철수')
+        old = self.today - timedelta(days=800)
+        Book.objects.create(student=self.kim, input_date=old, book_name='예전 수학', price=10000,
+                            checking=True, payment_date=old + timedelta(days=10))
+        Book.objects.create(student=self.kim, input_date=self.today - timedelta(days=40), book_name='국어',
+                            price=9000, checking=True, payment_date=self.today - timedelta(days=30))
+        Book.objects.create(student=self.kim, input_date=self.today, book_name='영어', price=15000)
+
+    def archive_old(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive.archive(archive.cutoff(365), batch_size=1)
+
+    def test_moves_old_paid_books_without_changing_totals(self):
+        ledger_snapshot.load()
+        self.assertEqual(self.archive_old(), 1)
+        self.assertEqual(list(Book.objects.values_list('book_name', flat=True).order_by('book_name')), ['국어', '영어'])
+        self.assertEqual(ArchivedBook.objects.get().book_name, '예전 수학')
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+
+        # 스냅샷은 증분 갱신과 전체 다시 읽기 모두 보관 교재를 포함한다
+        ledger_snapshot.mark_dirty([self.kim.id])
+        self.assertEqual(len(ledger_snapshot.popularity()), 3)
+        ledger_snapshot.load()
+        self.assertEqual(len(ledger_snapshot.popularity()), 3)
+
+        # 학생을 지우면 보관 교재도 지워지고 집계에서 빠진다
+        self.kim.delete()
+        self.assertEqual(rollups.verify(), [])
+        self.assertFalse(ArchivedBook.objects.exists())
+
+    def test_student_detail_and_exports_union_the_archive(self):
+        self.archive_old()
+        url = reverse('textbook:student_detail', args=[self.kim.id])
+        response = self.client.get(url)
+        self.assertNotContains(response, '예전 수학')
+        self.assertContains(response, '보관된 이전 내역 1건 포함')
+
+        response = self.client.get(url, {'history': 'all'})
+        self.assertContains(response, '예전 수학')
+        self.assertContains(response, '<span id="totalPaid">19,000</span>', html=False)
+
+        user = User.objects.create_user('teacher', password='pw')
+        self.client.force_login(user)
+        response = self.client.get(reverse('textbook:export', args=['ledger']), {'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([row[2] for row in rows[1:]], ['예전 수학', '국어', '영어'])
+
+        response = self.client.get(reverse('textbook:export', args=['payments']), {'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([row[2] for row in rows[1:]], ['예전 수학', '국어'])
+
+    def test_catalog_rebuild_includes_the_archive(self):
+        expected = list(Catalog.objects.order_by('name').values_list('name', 'price', 'issue_count', 'last_issued'))
+        self.archive_old()
+        catalog.rebuild()
+        self.assertEqual(
+            list(Catalog.objects.order_by('name').values_list('name', 'price', 'issue_count', 'last_issued')),
+            expected,
+        )
+
+    def test_every_batch_bumps_its_own_students(self):
+        lee = Student.objects.create(name='이영희')
+        old = self.today - timedelta(days=700)
+        Book.objects.create(student=lee, input_date=old, book_name='예전 국어', price=8000,
+                            checking=True, payment_date=old + timedelta(days=5))
+        versions = dict(Student.objects.values_list('id', 'cache_version'))
+        with mock.patch.object(page_cache, 'bump', wraps=page_cache.bump) as bump:
+            self.archive_old()
+        self.assertEqual(sorted(sorted(call.args[0]) for call in bump.call_args_list), [[self.kim.id], [lee.id]])
+        # 버전은 DB 에 있으므로 manage.py archive_books 의 변경도 웹 워커가 본다
+        self.assertEqual(
+            dict(Student.objects.values_list('id', 'cache_version')),
+            {student_id: version + 1 for student_id, version in versions.items()},
+        )
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('archive_books', '--dry-run', stdout=out)
+        self.assertIn('1 book(s) paid before', out.getvalue())
+        self.assertFalse(ArchivedBook.objects.exists())
+
+        call_command('archive_books', '--days', '0', '--batch-size', '1', stdout=out)
+        self.assertIn('Archived 2 book(s): book has 1, book_archive has 2', out.getvalue())
+
+
+class BackupStoreTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        settings_override = override_settings(BACKUP_STORE_DIR=os.path.join(self.tmp_dir, 'store'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_unchanged_chunks_are_stored_once(self):
+        chunk = backup_store.CHUNK_SIZE
+        data = bytearray(os.urandom(chunk * 4))
+        first, new_chunks, _ = backup_store.add_snapshot(self.write_file('db1', data))
+        self.assertEqual(new_chunks, 4)
+
+        data[chunk * 2] ^= 0xFF  # 세 번째 청크만 바뀐다
+        second, new_chunks, _ = backup_store.add_snapshot(self.write_file('db2', data))
+        self.assertEqual(new_chunks, 1)
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertEqual(
+            [a == b for a, b in zip(first['chunks'], second['chunks'])], [True, True, False, True]
+        )
+
+    def test_restore_round_trip(self):
+        data = os.urandom(backup_store.CHUNK_SIZE * 2 + 123)
+        manifest, _, _ = backup_store.add_snapshot(self.write_file('db', data))
+        self.assertEqual(backup_store.verify_snapshot(manifest['id'])['size'], len(data))
+
+        target = os.path.join(self.tmp_dir, 'restored')
+        backup_store.restore_snapshot(manifest['id'], target)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        with self.assertRaises(backup_store.SnapshotError):
+            backup_store.restore_snapshot('nope', target)
+
+    def add_snapshot_at(self, snapshot_id, created):
+        """created 시각에 만든 것처럼 스냅샷을 저장한다. 청크는 유예 시간보다 오래된 것으로 둔다."""
+        manifest, _, _ = backup_store.add_snapshot(self.write_file(snapshot_id, snapshot_id.encode() * 100))
+        os.remove(backup_store._manifest_path(manifest['id']))
+        manifest.update(id=snapshot_id, created=created.isoformat(timespec='seconds'))
+        with open(backup_store._manifest_path(snapshot_id), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        old = time.time() - backup_store.PRUNE_GRACE * 2
+        for digest in manifest['chunks']:
+            os.utime(backup_store._chunk_path(digest), (old, old))
+        return manifest
+
+    def test_prune_keeps_each_tier_and_recent_chunks(self):
+        now = datetime(2026, 10, 18, 12, 0)
+        created = {
+            'newest': now,
+            'hour-11': now.replace(hour=11, minute=30),
+            'hour-11-older': now.replace(hour=11, minute=10),  # 같은 시간대의 더 오래된 것
+            'hour-10': now.replace(hour=10),                     # 시간 단계(2개) 밖
+            'day-17': datetime(2026, 10, 17, 9, 0),
+            'day-16': datetime(2026, 10, 16, 9, 0),              # 일 단계(2개) 밖, 같은 주/월
+            'month-09': datetime(2026, 9, 20, 9, 0),
+            'month-08': datetime(2026, 8, 1, 9, 0),              # 월 단계(2개) 밖
+        }
+        manifests = {snapshot_id: self.add_snapshot_at(snapshot_id, value) for snapshot_id, value in created.items()}
+        retention = {'hourly': 2, 'daily': 2, 'weekly': 1, 'monthly': 2}
+        kept = {'newest', 'hour-11', 'day-17', 'month-09'}
+
+        # 방금 다시 쓰인 청크는 어떤 스냅샷에도 없어도 유예 시간 동안 남는다
+        recent = manifests['hour-10']['chunks'][0]
+        os.utime(backup_store._chunk_path(recent))
+
+        removed_snapshots, removed_chunks = backup_store.prune(retention)
+        self.assertEqual({manifest['id'] for manifest in backup_store.list_snapshots()}, kept)
+        self.assertEqual(removed_snapshots, 4)
+        self.assertEqual(removed_chunks, 3)
+        self.assertTrue(os.path.exists(backup_store._chunk_path(recent)))
+        for snapshot_id in kept:
+            backup_store.verify_snapshot(snapshot_id)
+
+
+class RestoreTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        self.lock_file = os.path.join(self.tmp_dir, 'db.restore.lock')
+        settings_override = override_settings(
+            BACKUP_STORE_DIR=os.path.join(self.tmp_dir, 'store'),
+            RESTORE_LOCK_FILE=self.lock_file,
+            RESTORE_SETTLE_SECONDS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def snapshot_of(self, build):
+        """build(sqlite3 연결)로 만든 DB 파일을 저장소 스냅샷으로 넣고 id 를 돌려준다."""
+        path = os.path.join(self.tmp_dir, 'backup.sqlite3')
+        conn = sqlite3.connect(path)
+        try:
+            build(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        manifest, _, _ = backup_store.add_snapshot(path)
+        return manifest['id']
+
+    def assertRejected(self, backup, message):
+        with self.assertRaisesMessage(restore.RestoreError, message):
+            restore.restore(backup)
+        # 거절되면 잠금 파일도 남지 않고 요청도 막히지 않는다
+        self.assertFalse(os.path.exists(self.lock_file))
+        self.assertEqual(self.client.get(reverse('textbook:dashboard')).status_code, 200)
+
+    def test_unknown_backup_name(self):
+        self.assertRejected('20990101-000000', 'Unknown backup')
+        self.assertRejected('../mclassbookstore.db', 'Unknown backup')
+
+    def test_failed_integrity_check(self):
+        path = os.path.join(self.tmp_dir, 'garbage')
+        with open(path, 'wb') as f:
+            f.write(b'not a database' * 1000)
+        manifest, _, _ = backup_store.add_snapshot(path)
+        self.assertRejected(manifest['id'], 'Integrity check failed')
+
+    def test_backup_from_newer_app_version(self):
+        def build(conn):
+            conn.execute('CREATE TABLE django_migrations (id INTEGER PRIMARY KEY, app TEXT, name TEXT, applied TEXT)')
+            conn.execute("INSERT INTO django_migrations (app, name, applied) VALUES ('textbook', '9999_future', '')")
+
+        self.assertRejected(self.snapshot_of(build), 'unknown migrations: textbook.9999_future')
+
+    def test_lock_file_blocks_requests_from_other_processes(self):
+        # 다른 프로세스(manage.py restore_db 등)가 복원 중이면 잠금 파일이 있다
+        with open(self.lock_file, 'w') as f:
+            f.write('12345')
+        self.assertFalse(restore.gate.enter(timeout=0))
+        backup = self.snapshot_of(lambda conn: conn.execute('CREATE TABLE django_migrations (app TEXT, name TEXT)'))
+        with self.assertRaisesMessage(restore.RestoreError, 'Another restore is already running'):
+            restore.restore(backup)
+        self.assertTrue(os.path.exists(self.lock_file))
+
+        # 복원 도중 죽은 프로세스의 오래된 잠금 파일은 무시한다
+        stale = time.time() - restore.LOCK_STALE_SECONDS - 1
+        os.utime(self.lock_file, (stale, stale))
+        self.assertTrue(restore.gate.enter(timeout=0))
+        restore.gate.leave()
+
+
+class SqliteProfileTests(TestCase):
+    def pragmas(self, profile=None):
+        """임시 파일 DB 에 새 연결을 열고 (connection_created) 적용된 PRAGMA 를 읽는다.
+        메모리 DB 는 journal_mode 가 항상 memory 이므로 파일을 쓴다."""
+        with tempfile.TemporaryDirectory() as tmp:
+            settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(tmp, 'profile.sqlite3')}
+            new_connection = connections['default'].__class__(settings_dict, alias='profile')
+            try:
+                with override_settings(SQLITE_PROFILE=profile or settings.SQLITE_PROFILE):
+                    new_connection.ensure_connection()
+                with new_connection.cursor() as cursor:
+                    return {
+                        pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+                        for pragma in ('journal_mode', 'synchronous', 'busy_timeout')
+                    }
+            finally:
+                new_connection.close()
+
+    def test_performance_profile(self):
+        # synchronous: 0=OFF, 1=NORMAL, 2=FULL
+        self.assertEqual(self.pragmas('performance'), {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
+
+    def test_legacy_profile(self):
+        self.assertEqual(self.pragmas('legacy'), {'journal_mode': 'delete', 'synchronous': 2, 'busy_timeout': 5000})
+
+    @override_settings(SQLITE_PROFILES={'performance': {'busy_timeout': 1234}})
+    def test_override(self):
+        self.assertEqual(self.pragmas()['busy_timeout'], 1234)
+
+
+class WriteRetryTests(TransactionTestCase):
+    """run_in_transaction 의 재시도 (바깥 트랜잭션이 없어야 재시도하므로 TransactionTestCase)"""
+
+    def setUp(self):
+        super().setUp()
+        writes.stats.reset()
+        # 지터 없이 BACKOFF_BASE 부터 두 배씩, 실제로는 기다리지 않는다
+        self.sleeps = []
+        for patcher in (
+            mock.patch.object(writes.time, 'sleep', self.sleeps.append),
+            mock.patch.object(writes.random, 'uniform', lambda low, high: 1.0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def failing(self, failures, error='database is locked'):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(error)
+            return 'done'
+        return func, calls
+
+    def test_retries_then_succeeds(self):
+        func, calls = self.failing(2)
+        self.assertEqual(writes.run_in_transaction(func, budget=10), 'done')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.sleeps, [0.05, 0.1])
+        stats = writes.stats.as_dict()
+        self.assertEqual((stats['transactions'], stats['retries'], stats['failures']), (3, 2, 0))
+
+    def test_raises_write_contention_when_budget_runs_out(self):
+        # 0.05, 0.1, 0.2 는 0.3 초 안에 들어가고 다음 0.4 는 넘는다
+        func, calls = self.failing(10)
+        with self.assertRaises(writes.WriteContention):
+            writes.run_in_transaction(func, budget=0.3)
+        self.assertEqual(len(calls), 4)
+        stats = writes.stats.as_dict()
+        self.assertEqual((stats['retries'], stats['failures']), (3, 1))
+
+    def test_other_errors_are_not_retried(self):
+        func, calls = self.failing(1, error='no such table: book')
+        with self.assertRaisesMessage(OperationalError, 'no such table'):
+            writes.run_in_transaction(func, budget=10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(writes.stats.as_dict()['retries'], 0)
@@ -0,0 +1,177 @@
+"""
+자동완성(typeahead) async 엔드포인트 지원
+
+키 입력마다 요청이 오므로 ASGI 에서는 요청이 워커 스레드를 잡지 않도록 async 뷰
+(views.typeahead_students / typeahead_books)로 처리한다.
+- 같은 입력 상자(client 파라미터)에서 새 요청이 오면 아직 끝나지 않은 이전 요청을 취소하고
+  이전 요청에는 204 를 돌려준다 (브라우저도 select2 가 이전 요청을 abort 한다)
+- 결과는 MAX_RESULTS 개로 제한한다
+
+취소는 await 지점에서 일어난다. 이미 스레드에서 실행 중인 DB 쿼리는 끝까지 실행되고
+결과만 버려진다. 브라우저가 요청을 abort 해서 연결이 끊겨도 Django 가 뷰를 취소한다.
+
+Django 기본 미들웨어(세션, CSRF, 메시지 등)는 sync 라서 async 요청마다 여러 번 스레드를
+오가며 한 스레드에 줄을 선다. 그래서 ASGI 배포(bookstore/asgi.py)에서는 자동완성 경로만
+TYPEAHEAD_MIDDLEWARE(async 미들웨어만)로 처리하는 TypeaheadASGIHandler 로 보낸다.
+두 엔드포인트는 로그인/세션/폼이 없는 GET JSON 이라 빠지는 미들웨어가 필요 없다.
+요청 처리는 기본 ASGIHandler 와 같고(요청별 ThreadSensitiveContext) 미들웨어 목록만 다르다.
+
+DB 쿼리는 async ORM(thread_sensitive, 요청마다 새 스레드와 새 연결) 대신 자동완성 전용 스레드 풀
+(TYPEAHEAD_DB_THREADS 개)에서 run_query() 로 실행한다. 풀의 스레드는 지속 연결(CONN_MAX_AGE)을
+계속 쓰고, 동시에 여러 쿼리가 실행된다.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+MAX_RESULTS = 20
+MAX_CLIENT_LENGTH = 64
+DEFAULT_DB_THREADS = 4
+
+DEFAULT_MIDDLEWARE = [
+    'textbook.middleware.ProfilingMiddleware',
+    'textbook.middleware.RestoreGateMiddleware',
+    'textbook.middleware.AllowedHostsMiddleware',
+]
+URL_NAMES = ('textbook:typeahead_students', 'textbook:typeahead_books')
+
+_lock = threading.Lock()
+_inflight = {}       # (엔드포인트, client) -> 실행 중인 Task
+_superseded = set()  # 새 요청 때문에 취소한 Task
+_executor = None
+
+
+class TypeaheadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.superseded = 0
+
+    def record(self, superseded):
+        with self._lock:
+            self.requests += 1
+            if superseded:
+                self.superseded += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {'requests': self.requests, 'superseded': self.superseded}
+
+
+stats = TypeaheadStats()
+
+
+def result_limit(request):
+    """?limit= 을 1..MAX_RESULTS 로 제한한다."""
+    try:
+        limit = int(request.GET.get('limit', MAX_RESULTS))
+    except ValueError:
+        limit = MAX_RESULTS
+    return max(1, min(limit, MAX_RESULTS))
+
+
+def client_key(request, endpoint):
+    """같은 입력 상자에서 온 요청을 묶는 키. client 파라미터가 없으면 취소하지 않는다."""
+    client = request.GET.get('client', '')[:MAX_CLIENT_LENGTH]
+    return (endpoint, client) if client else None
+
+
+def _executor_for_queries():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TYPEAHEAD_DB_THREADS', DEFAULT_DB_THREADS),
+                thread_name_prefix='typeahead-db',
+            )
+        return _executor
+
+
+def _call_with_connection(func, *args):
+    # 요청 밖의 스레드라 request_started/finished 가 없으므로 오류 난 연결과 오래된 연결은 여기서 닫는다
+    close_old_connections()
+    return func(*args)
+
+
+async def run_query(func, *args):
+    """func(*args) 를 자동완성 전용 스레드 풀에서 실행한다 (DB 를 읽는 sync 함수)."""
+    return await sync_to_async(_call_with_connection, thread_sensitive=False, executor=_executor_for_queries())(
+        func, *args
+    )
+
+
+async def latest_only(key, coro):
+    """coro 를 실행한다. 같은 key 로 더 새로운 요청이 오면 취소하고 None 을 돌려준다."""
+    task = asyncio.ensure_future(coro)
+    if key is None:
+        result = await task
+        stats.record(False)
+        return result
+
+    with _lock:
+        previous = _inflight.get(key)
+        _inflight[key] = task
+        if previous is not None and not previous.done():
+            _superseded.add(previous)
+        else:
+            previous = None
+    if previous is not None:
+        # WSGI 에서는 요청마다 이벤트 루프가 달라 그 루프에서 취소해야 한다
+        previous.get_loop().call_soon_threadsafe(previous.cancel)
+
+    try:
+        result = await task
+    except asyncio.CancelledError:
+        with _lock:
+            superseded = task in _superseded
+        if not superseded:
+            raise  # 클라이언트 연결 끊김 등
+        stats.record(True)
+        return None
+    finally:
+        with _lock:
+            if _inflight.get(key) is task:
+                del _inflight[key]
+            _superseded.discard(task)
+    stats.record(False)
+    return result
+
+
+class TypeaheadASGIHandler(ASGIHandler):
+    """자동완성 요청 전용 ASGI 핸들러: 미들웨어로 settings.TYPEAHEAD_MIDDLEWARE 의 async 미들웨어만 쓴다."""
+
+    def load_middleware(self, is_async=False):
+        middleware = list(getattr(settings, 'TYPEAHEAD_MIDDLEWARE', DEFAULT_MIDDLEWARE))
+        for middleware_path in middleware:
+            if not getattr(import_string(middleware_path), 'async_capable', False):
+                raise ImproperlyConfigured(f'TYPEAHEAD_MIDDLEWARE must be async capable: {middleware_path}')
+        # BaseHandler.load_middleware 는 settings.MIDDLEWARE 를 읽으므로 목록을 만드는 동안만 바꾼다
+        # (핸들러는 asgi.py 를 import 할 때, 요청을 받기 전에 한 번 만들어진다)
+        with override_settings(MIDDLEWARE=middleware):
+            super().load_middleware(is_async=is_async)
+
+
+def route(application):
+    """자동완성 경로는 TypeaheadASGIHandler 로, 나머지는 application 으로 보내는 ASGI 앱"""
+    typeahead_application = TypeaheadASGIHandler()
+    paths = {reverse(name) for name in URL_NAMES}
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] in paths:
+            return await typeahead_application(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
@@ -6,10 +6,18 @@ app_name = 'textbook'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('api/dashboard/', views.dashboard_api, name='dashboard_api'),
     path('student/<int:student_id>/', views.student_detail, name='student_detail'),
     path('book/<int:book_id>/mark-as-paid/', views.mark_as_paid, name='mark_as_paid'),
+    path('student/<int:student_id>/settle/', views.settle_books, name='settle_books'),
     path('issue-book/', views.issue_book, name='issue_book'),
+    path('issue-book/bulk/', views.bulk_issue, name='bulk_issue'),
     path('search-students/', views.search_students, name='search_students'),
     path('get-books/', views.get_books, name='get_books'),
+    path('api/typeahead/students/', views.typeahead_students, name='typeahead_students'),
+    path('api/typeahead/books/', views.typeahead_books, name='typeahead_books'),
     path('report/<int:student_id>/', generate_report, name='generate_report'),
+    path('export/<str:kind>/', views.export, name='export'),
+    path('analytics/', views.analytics, name='analytics'),
+    path('api/analytics/<str:kind>/', views.analytics_snapshot, name='analytics_snapshot'),
 ]
\ No newline at end of file
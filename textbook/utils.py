@@ -1,54 +1,82 @@
 import os
 import logging
+import sqlite3
 import time
-import shutil
 from django.conf import settings
-from django.db import connection
+from . import backup_store, restore
 
 logger = logging.getLogger('backup')
 
-def manage_backups(max_backups=5):
-    backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-    backups = sorted(
-        [f for f in os.listdir(backup_dir) if f.endswith('.sqlite3')],
-        key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)),
-        reverse=True
-    )
-    
-    while len(backups) > max_backups:
-        os.remove(os.path.join(backup_dir, backups.pop()))
+# 온라인 백업 한 단계에서 복사할 페이지 수와 단계 사이 대기 시간 (초)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+def check_integrity(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise sqlite3.DatabaseError(f"Integrity check failed for {db_path}: {result}")
+
+def online_backup(source_path, target_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """SQLite 온라인 백업 API로 페이지 단위로 나눠 복사한다.
 
-def backup_database():
+    단계 사이에 잠금을 풀어 주므로 쓰기 작업은 잠깐씩만 기다린다.
+    복사 도중 원본이 바뀌면 SQLite가 알아서 다시 복사하므로 일관된 스냅샷이 만들어진다.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+    finally:
+        target.close()
+        source.close()
+
+def backup_database(compress=None):
     BACKUP_DIR = os.path.join(settings.BASE_DIR, 'backups')
     if not os.path.exists(BACKUP_DIR):
         os.makedirs(BACKUP_DIR)
 
-    timestamp = time.strftime('%Y%m%d-%H%M%S')
-    db_path = settings.DATABASES['default']['NAME']
-    backup_file = os.path.join(BACKUP_DIR, f'db_backup_{timestamp}.sqlite3')
-
-    # SQLite 데이터베이스 파일 복사
-    shutil.copy2(db_path, backup_file)
+    if compress is None:
+        compress = getattr(settings, 'BACKUP_COMPRESS', True)
 
-    manage_backups()  # 백업 파일 관리 호출
+    db_path = settings.DATABASES['default']['NAME']
+    tmp_file = os.path.join(BACKUP_DIR, f'db_backup_{os.getpid()}.sqlite3.tmp')
 
-    logger.info(f"Database backup created: {backup_file}")
-    return f"Database backup created: {backup_file}"
+    started = time.perf_counter()
 
-def restore_database(backup_file):
-    backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-    full_path = os.path.join(backup_dir, backup_file)
-    
-    if not os.path.exists(full_path):
-        raise FileNotFoundError(f"Backup file not found: {full_path}")
+    # 실행 중인 앱이 쓰는 도중에도 안전하도록 온라인 백업 API 사용
+    try:
+        online_backup(db_path, tmp_file)
+        check_integrity(tmp_file)
+        # 바뀐 청크만 저장소에 새로 쓴다
+        manifest, new_chunks, new_bytes = backup_store.add_snapshot(tmp_file, compress=compress)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
-    db_path = settings.DATABASES['default']['NAME']
+    removed, _ = backup_store.prune()  # 보관 정책에 따라 오래된 스냅샷 정리
 
-    # 현재 데이터베이스 연결 닫기
-    connection.close()
+    elapsed = time.perf_counter() - started
+    message = (
+        f"Database backup created: snapshot {manifest['id']} "
+        f"({manifest['size']:,} bytes, {new_chunks} new chunk(s) / {new_bytes:,} bytes stored, "
+        f"{removed} expired, {elapsed:.2f}s)"
+    )
+    logger.info(message)
+    return message
 
-    # 백업 파일로 현재 데이터베이스 덮어쓰기
-    shutil.copy2(full_path, db_path)
+def restore_database(backup_file, held=0):
+    """검증 후 운영 DB를 교체한다 (textbook.restore). held: 호출한 쪽이 붙잡고 있는 요청 수"""
+    result = restore.restore(backup_file, held=held)
 
-    logger.info(f"Database restored from: {backup_file}")
-    return f"Database restored from: {backup_file}"
\ No newline at end of file
+    message = (
+        f"Database restored from: {backup_file} "
+        f"(clients blocked {result['blocked'] * 1000:.0f}ms, total {result['elapsed']:.2f}s)"
+    )
+    if result['migrated']:
+        message += f", applied migrations: {', '.join(result['migrated'])}"
+    logger.info(message)
+    return message
@@ -1,130 +1,192 @@
-from django.http import JsonResponse, HttpResponse
+import logging
+
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib import messages
 from .models import Student, Book
-from django.db.models import Sum, Q
+from . import archive, catalog, exports, ledger, page_cache, pagination, profiling, report_cache, rollups, typeahead, writes
+from .reports import BOOK_FIELDS, REPORT_TYPES, ReportBook, fingerprint, get_renderer, report_filename
+from .search import student_index
+from .snapshot import ledger_snapshot
+from django.db.models import Sum
 from datetime import date
 from datetime import datetime
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from django.conf import settings
-import os
-from urllib.parse import quote
-
-
-class NumberedCanvas(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
-
-    def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
-
-    def save(self):
-        """add page info to each page (page x of y)"""
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            self.draw_page_number(num_pages)
-            canvas.Canvas.showPage(self)
-        canvas.Canvas.save(self)
-
-    def draw_page_number(self, page_count):
-        self.setFont("NotoSansKR", 9)
-        
-        # 페이지 번호 (우측)
-        page = f"Page {self._pageNumber} of {page_count}"
-        self.drawRightString(200*mm, 10*mm, page)
-        
-        # 학원명 (가운데 정렬)
-        academy_name = "엠클래스수학과학전문학원"
-        academy_name_width = self.stringWidth(academy_name, "NotoSansKR", 9)
-        page_width = A4[0]  # A4 용지의 너비
-        x_position = (page_width - academy_name_width) / 2
-        self.drawString(x_position, 10*mm, academy_name)
-        
-        # 문서 작성 일시 (좌측)
-        now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        self.drawString(20*mm, A4[1] - 15*mm, f"작성일시: {now}")
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+logger = logging.getLogger(__name__)
+
+WRITE_CONTENTION_MESSAGE = '다른 작업이 저장 중이라 처리하지 못했습니다. 잠시 후 다시 시도해주세요.'
 
 
 def dashboard(request):
     search_query = request.GET.get('search', '').strip()
-    
-    # 기본 쿼리셋 생성
-    students = Student.objects.annotate(
-        unpaid_amount=Sum(
-            'books__price',
-            filter=Q(books__payment_date__isnull=True)
-        )
-    )
-    
-    # 검색 적용
-    if search_query:
-        students = students.filter(name__icontains=search_query)
-    else:
-        # 검색어가 없을 때만 미납금액이 있는 학생만 필터
-        students = students.filter(unpaid_amount__gt=0)
-    
-    students = students.order_by('name')
-    
-    # 전체 통계 계산 (페이지네이션 적용 전)
-    total_students = students.count()
-    total_unpaid = sum(student.unpaid_amount or 0 for student in students)
-    
-    # 페이지네이션 적용
-    paginator = Paginator(students, 20)  # 한 페이지당 20명
-    page = request.GET.get('page')
-    
+
+    def build():
+        # 첫 페이지와 합계를 한 쿼리로 읽는다. 다음 페이지는 템플릿이 dashboard_api 로 가져온다
+        students, next_cursor, total_students, total_unpaid = pagination.unpaid_students_page(search_query)
+
+        context = {
+            'students': students,
+            'search_query': search_query,
+            'total_students': total_students,
+            'total_unpaid': total_unpaid,
+            'next_cursor': next_cursor,
+        }
+        return render(request, 'textbook/dashboard.html', context)
+
+    # 원장이 바뀌기 전까지는 같은 페이지이므로 렌더링 결과를 재사용한다
+    return page_cache.page('dashboard', [page_cache.version(), search_query], build)
+
+
+def dashboard_api(request):
+    """대시보드 학생 목록 JSON. cursor 로 다음 페이지를 이어서 읽는다 (키셋 페이지네이션)"""
+    search_query = request.GET.get('search', '').strip()
+    parts = [page_cache.version(), search_query, request.GET.get('cursor', ''), request.GET.get('limit', '')]
+    return page_cache.page('dashboard_api', parts, lambda: _dashboard_api(request, search_query))
+
+
+def _dashboard_api(request, search_query):
     try:
-        students_page = paginator.page(page)
-    except PageNotAnInteger:
-        students_page = paginator.page(1)
-    except EmptyPage:
-        students_page = paginator.page(paginator.num_pages)
-    
-    # 현재 페이지 범위 계산
-    current_page = students_page.number
-    total_pages = paginator.num_pages
-    
-    # 표시할 페이지 범위 (현재 페이지 앞뒤로 2페이지씩)
-    page_range = range(max(1, current_page - 2), 
-                      min(total_pages + 1, current_page + 3))
-    
-    context = {
-        'students': students_page,
-        'search_query': search_query,
+        limit = int(request.GET.get('limit', pagination.PAGE_SIZE))
+        students, next_cursor, total_students, total_unpaid = pagination.unpaid_students_page(
+            search_query, request.GET.get('cursor') or None, limit
+        )
+    except ValueError as e:  # InvalidCursor 포함
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': students,
+        'next': next_cursor,
         'total_students': total_students,
         'total_unpaid': total_unpaid,
-        'page_range': page_range,
-        'total_pages': total_pages,
-        'current_page': current_page
-    }
-    return render(request, 'textbook/dashboard.html', context)
+    })
+
+
+def export(request, kind):
+    """CSV/XLSX 내보내기. ?format=csv|xlsx, ledger 는 ?student=, payments 는 ?from=&to= (YYYY-MM-DD)"""
+    fmt = request.GET.get('format', 'csv')
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        raise Http404("알 수 없는 내보내기 형식입니다.")
+    try:
+        date_from = request.GET.get('from')
+        date_to = request.GET.get('to')
+        filters = {
+            'student': request.GET.get('student', '').strip() or None,
+            'date_from': datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None,
+            'date_to': datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None,
+        }
+    except ValueError:
+        return JsonResponse({'error': '날짜는 YYYY-MM-DD 형식으로 입력해주세요.'}, status=400)
+
+    chunks, filename = exports.stream(kind, fmt, **filters)
+    response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def analytics(request):
+    """월별/교재별/학생별 지급, 수납, 미납 합계. ?from=&to= (YYYY-MM), ?format=json
+
+    book 테이블이 아니라 월별 집계(textbook.rollups)와 원장 스냅샷(미납 경과일)만 읽는다.
+    """
+    this_month = date.today().replace(day=1)
+    # 기본 기간: 이번 달까지 최근 12개월
+    year, month = divmod(this_month.year * 12 + this_month.month - 1 - 11, 12)
+    try:
+        month_from = _parse_month(request.GET.get('from')) or date(year, month + 1, 1)
+        month_to = _parse_month(request.GET.get('to')) or this_month
+    except ValueError:
+        return JsonResponse({'error': '월은 YYYY-MM 형식으로 입력해주세요.'}, status=400)
+
+    fmt = request.GET.get('format', 'html')
+
+    def build():
+        aging = ledger_snapshot.aging()
+        months = rollups.monthly(month_from, month_to)
+        titles = rollups.by_title(month_from, month_to)
+        students = rollups.by_student(month_from, month_to)
+        totals = {field: sum(row[field] for row in months) for field in rollups.FIELDS}
+
+        if fmt == 'json':
+            return JsonResponse({
+                'from': month_from, 'to': month_to, 'totals': totals,
+                'months': months, 'titles': titles, 'students': students, 'aging': aging['buckets'],
+            })
+        return render(request, 'textbook/analytics.html', {
+            'month_from': month_from, 'month_to': month_to, 'totals': totals,
+            'months': months, 'titles': titles, 'students': students, 'aging': aging['buckets'],
+        })
+
+    # 집계는 교재가 바뀔 때만 바뀌므로 대시보드처럼 원장 버전으로 캐시한다 (경과일은 날짜가 바뀌면 바뀐다)
+    parts = [page_cache.version(), date.today().isoformat(), month_from.isoformat(), month_to.isoformat(), fmt]
+    return page_cache.page('analytics', parts, build)
+
+
+def _parse_month(value):
+    return datetime.strptime(value, '%Y-%m').date() if value else None
+
+
+def analytics_snapshot(request, kind):
+    """원장 스냅샷(textbook.snapshot) 분석 JSON. kind: aging, popularity, lag. ?from=&to= (YYYY-MM-DD, 지급일)"""
+    if kind not in ('aging', 'popularity', 'lag'):
+        raise Http404("알 수 없는 분석입니다.")
+    try:
+        date_from = request.GET.get('from')
+        date_to = request.GET.get('to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    except ValueError:
+        return JsonResponse({'error': '날짜는 YYYY-MM-DD 형식으로 입력해주세요.'}, status=400)
+
+    if kind == 'aging':
+        result = ledger_snapshot.aging()
+        names = dict(Student.objects.filter(
+            pk__in=[row['student_id'] for row in result['overdue_students']]
+        ).values_list('id', 'name'))
+        for row in result['overdue_students']:
+            row['student_name'] = names.get(row['student_id'], '')
+    elif kind == 'popularity':
+        result = ledger_snapshot.popularity(date_from, date_to)
+    else:
+        result = ledger_snapshot.collection_lag(date_from, date_to)
+    return JsonResponse(result, safe=False)
 
 
 def student_detail(request, student_id):
+    # 버전(Student.cache_version)을 교재보다 먼저 읽는다: 읽는 중에 교재가 바뀌면 이전 버전 키로 저장되어 다시 쓰이지 않는다
     student = get_object_or_404(Student, id=student_id)
+    paid_version = student.cache_version
     unpaid_books = student.books.filter(payment_date__isnull=True)
-    paid_books = student.books.filter(payment_date__isnull=False)    
-    total_unpaid = unpaid_books.aggregate(total=Sum('price'))['total'] or 0
-    total_paid = paid_books.aggregate(total=Sum('price'))['total'] or 0
-    
+    # ?history=all 이면 보관된 오래된 납부 교재(textbook.archive)까지 보여준다
+    history = request.GET.get('history') == 'all'
+
+    def render_paid_books():
+        paid_books = student.books.filter(payment_date__isnull=False)
+        if history:
+            paid_books = [
+                ReportBook(*row) for row in archive.with_archive(
+                    paid_books.order_by(), student.archived_books.order_by(), BOOK_FIELDS, ('-input_date', '-id')
+                )
+            ]
+        paid_books = list(paid_books)
+        return render_to_string('textbook/paid_books.html', {
+            'student_id': student.id,
+            'paid_books': paid_books,
+            'total_paid': sum(book.price for book in paid_books),
+            'history': history,
+            'archived_count': 0 if history else student.archived_books.count(),
+        })
+
+    # 미납 목록은 행마다 CSRF 토큰이 있어 매번 렌더링하고, 납부 완료 목록만 캐시한다
+    paid_books_html = page_cache.fragment('student_paid', [student.id, paid_version, history], render_paid_books)
+
     context = {
         'student': student,
         'unpaid_books': unpaid_books,
-        'paid_books': paid_books,
-        'total_unpaid': total_unpaid,
-        'total_paid': total_paid,
+        'total_unpaid': student.unpaid_amount,  # 미납 원장 (textbook.ledger)
+        'paid_books_html': mark_safe(paid_books_html),
         'today' : date.today(),
     }
     return render(request, 'textbook/student_detail.html', context)
@@ -137,39 +199,102 @@ def mark_as_paid(request, book_id):
         try:
             payment_date = datetime.strptime(payment_date_str, '%Y-%m-%d').date()
             book.payment_date = payment_date
-            book.save()
+            book.checking = True
+            writes.run_in_transaction(book.save)
             messages.success(request, f'{book.book_name} 교재가 납부 완료되었습니다.')
         except ValueError as e:  # More specific exception handling
             messages.error(request, f'잘못된 날짜 형식입니다. YYYY-MM-DD 형식으로 입력해주세요. 오류: {e}')
+        except writes.WriteContention:
+            messages.error(request, WRITE_CONTENTION_MESSAGE)
         except Exception as e:
             messages.error(request, f'납부 완료 중 오류가 발생했습니다: {str(e)}')
 
-    return redirect('textbook:student_detail', student_id=book.student.id)
+    return redirect('textbook:student_detail', student_id=book.student_id)
+
+
+def settle_books(request, student_id):
+    """학생의 미납 교재를 한 번의 UPDATE 로 수납 처리하고 새 합계를 JSON 으로 돌려준다.
+
+    book_ids 가 있으면 그 교재만, up_to 가 있으면 그 날짜까지 지급된 교재, 둘 다 없으면 미납 교재 전부.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST 요청만 가능합니다.'}, status=405)
+
+    student = get_object_or_404(Student.objects.only('id'), pk=student_id)
+    try:
+        payment_date = datetime.strptime(request.POST.get('payment_date', ''), '%Y-%m-%d').date()
+        book_ids = [int(book_id) for book_id in request.POST.getlist('book_ids')]
+        up_to = request.POST.get('up_to')
+        up_to = datetime.strptime(up_to, '%Y-%m-%d').date() if up_to else None
+    except ValueError:
+        return JsonResponse({'error': '잘못된 값입니다. 날짜는 YYYY-MM-DD 형식으로 입력해주세요.'}, status=400)
+
+    books = Book.objects.filter(student=student, payment_date__isnull=True)
+    if book_ids:
+        books = books.filter(pk__in=book_ids)
+    elif up_to:
+        books = books.filter(input_date__lte=up_to)
+
+    def settle():
+        settled_ids = list(books.values_list('id', flat=True))
+        if settled_ids:
+            ledger.settle(Book.objects.filter(pk__in=settled_ids), payment_date, checking=True)
+        return settled_ids
+
+    try:
+        settled_ids = writes.run_in_transaction(settle)
+    except writes.WriteContention:
+        return JsonResponse({'error': WRITE_CONTENTION_MESSAGE}, status=503)
+
+    unpaid_amount, unpaid_count = Student.objects.filter(pk=student.pk).values_list(
+        'unpaid_amount', 'unpaid_count'
+    ).get()
+    total_paid = student.books.filter(payment_date__isnull=False).aggregate(total=Sum('price'))['total'] or 0
+    total_unpaid, _ = ledger.get_total()
+
+    return JsonResponse({
+        'settled': settled_ids,
+        'payment_date': payment_date.isoformat(),
+        'unpaid_amount': unpaid_amount,
+        'unpaid_count': unpaid_count,
+        'paid_amount': total_paid,
+        'total_unpaid': total_unpaid,
+    })
 
 def search_students(request):
     query = request.GET.get('query', '').strip()
-    if query:
-        # Fix the syntax error in filter and values
-        students = Student.objects.filter(name__icontains=query).values('id', 'name')
-        return JsonResponse(list(students), safe=False)
-    return JsonResponse([], safe=False)
+    # 메모리 인덱스에서 이름/초성/자모 앞부분 일치로 찾는다 (DB 조회 없음)
+    return JsonResponse(student_index.search(query), safe=False)
 
 
 def get_books(request):
     query = request.GET.get('term', '')
-    # values()로 가져온 후 파이썬에서 중복 제거
-    books = Book.objects.filter(book_name__icontains=query)\
-        .values('book_name', 'price')\
-        .order_by('book_name')
-    
-    # 중복 제거를 위해 dictionary 사용
-    unique_books = {}
-    for book in books:
-        book_name = book['book_name']
-        if book_name not in unique_books:
-            unique_books[book_name] = book
-    
-    return JsonResponse(list(unique_books.values()), safe=False)
+    # 교재 목록(Catalog)에서 순위가 매겨진 제한된 결과만 가져온다
+    return JsonResponse(catalog.search(query), safe=False)
+
+
+async def typeahead_students(request):
+    """search_students 의 async 버전 (ASGI). 새 입력에 밀린 요청은 204"""
+    query = request.GET.get('query', '')
+    results = await typeahead.latest_only(
+        typeahead.client_key(request, 'students'),
+        student_index.asearch(query, typeahead.result_limit(request)),
+    )
+    if results is None:
+        return HttpResponse(status=204)
+    return JsonResponse(results, safe=False)
+
+
+async def typeahead_books(request):
+    """get_books 의 async 버전 (ASGI, 자동완성 전용 스레드 풀). 새 입력에 밀린 요청은 204"""
+    term = request.GET.get('term', '')
+    results = await typeahead.latest_only(
+        typeahead.client_key(request, 'books'),
+        typeahead.run_query(catalog.search, term, typeahead.result_limit(request)),
+    )
+    if results is None:
+        return HttpResponse(status=204)
+    return JsonResponse(results, safe=False)
 
 
 def issue_book(request):
@@ -177,21 +302,18 @@ def issue_book(request):
     student_id = request.POST.get('student_id') or request.GET.get('student_id')
     student = None
     initial_books = []
-    
-    print(f"DEBUG: Received student_id: {student_id}")  # 디버깅용
 
     if student_id:
         try:
             student = get_object_or_404(Student, pk=student_id)
-            print(f"DEBUG: Found student: {student.name}")  # 디버깅용
-        except Exception as e:
-            print(f"DEBUG: Error finding student: {e}")  # 디버깅용
+        except Exception:
             messages.error(request, "학생을 찾을 수 없습니다.")
             return redirect('textbook:dashboard')
 
     if request.method == 'POST':
-        print("DEBUG: POST data:", request.POST)  # 디버깅용
-        
+        # 요청 시간/쿼리는 ProfilingMiddleware 가 재고, 느린 요청 로그에 지급 내용을 함께 남긴다
+        profiling.tag(student_id=student_id)
+
         try:
             if not student_id or not student:
                 raise ValueError("학생 정보가 필요합니다.")
@@ -203,42 +325,33 @@ def issue_book(request):
             # 가격에서 쉼표 제거 및 숫자만 추출
             price = int(''.join(filter(str.isdigit, price_str)))
 
-            print(f"DEBUG: Processing book: {book_name}, price: {price}, date: {issue_date}")  # 디버깅용
+            profiling.tag(book_name=book_name, price=price, issue_date=issue_date)
 
             if not all([book_name, price, issue_date]):
                 raise ValueError("모든 필드를 입력해주세요.")
 
-            # Book 생성 및 저장
-            book = Book(
+            # Book 생성 및 저장 (쓰기 잠금을 얻지 못하면 잠시 기다렸다가 다시 시도)
+            book = writes.run_in_transaction(
+                Book.objects.create,
                 book_name=book_name,
                 price=price,
                 input_date=datetime.strptime(issue_date, '%Y-%m-%d').date(),
                 student=student  # 학생 객체 직접 할당
             )
-            book.save()
 
-            print(f"DEBUG: Book saved successfully: {book.id}")  # 디버깅용
             messages.success(request, f'{book.book_name} 교재가 {student.name} 학생에게 지급되었습니다.')
             return redirect('textbook:student_detail', student_id=student.id)
 
         except ValueError as e:
             messages.error(request, str(e))
+        except writes.WriteContention:
+            messages.error(request, WRITE_CONTENTION_MESSAGE)
         except Exception as e:
-            print(f"DEBUG: Error saving book: {e}")  # 디버깅용
+            logger.exception("Failed to issue book to student %s", student_id)
             messages.error(request, f'교재 저장 중 오류가 발생했습니다: {str(e)}')
 
-    # 기존 교재 정보 가져오기
-    books_queryset = Book.objects.all().values('book_name', 'price')
-    unique_books = {}
-    for book in books_queryset:
-        book_name = book['book_name']
-        if (book_name not in unique_books):
-            unique_books[book_name] = {
-                'book_name': book_name,
-                'price': book['price']
-            }
-
-    initial_books = list(unique_books.values())
+    # 자주 지급된 교재 목록 (나머지는 get_books 자동완성으로 검색)
+    initial_books = catalog.search()
 
     context = {
         'initial_books': initial_books,
@@ -246,222 +359,84 @@ def issue_book(request):
         'student_id': student_id,  # student_id를 context에 추가
     }
 
-    print(f"DEBUG: Rendering template with context: {context.keys()}")  # 디버깅용
     return render(request, 'textbook/issue_book.html', context)
 
 
-# 한글 폰트 등록
-def register_fonts():
-    font_dir = os.path.join(settings.BASE_DIR, 'static', 'fonts')
-    pdfmetrics.registerFont(TTFont('NotoSansKR', os.path.join(font_dir, 'NotoSansKR-Regular.ttf')))
-    pdfmetrics.registerFont(TTFont('NotoSansKR-Bold', os.path.join(font_dir, 'NotoSansKR-Bold.ttf')))
+def bulk_issue(request):
+    """같은 교재를 여러 학생에게 한 번에 지급한다. POST 는 학생별 결과를 JSON 으로 돌려준다."""
+    if request.method != 'POST':
+        context = {'initial_books': catalog.search()}
+        return render(request, 'textbook/bulk_issue.html', context)
+
+    try:
+        book_name = request.POST.get('book_name', '').strip()
+        price = int(''.join(filter(str.isdigit, request.POST.get('price', ''))) or 0)
+        issue_date = request.POST.get('issue_date')
+        student_ids = [int(student_id) for student_id in request.POST.getlist('student_ids')]
+
+        if not all([book_name, price, issue_date, student_ids]):
+            raise ValueError("교재, 가격, 지급일과 학생을 모두 입력해주세요.")
+        input_date = datetime.strptime(issue_date, '%Y-%m-%d').date()
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        results = writes.run_in_transaction(ledger.issue, book_name, price, input_date, student_ids)
+    except writes.WriteContention:
+        return JsonResponse({'error': WRITE_CONTENTION_MESSAGE}, status=503)
+    names = dict(Student.objects.filter(pk__in=student_ids).values_list('id', 'name'))
+    total_unpaid, _ = ledger.get_total()
+
+    return JsonResponse({
+        'book_name': book_name,
+        'issued': sum(1 for status, _ in results.values() if status == 'issued'),
+        'results': [
+            {
+                'student_id': student_id,
+                'name': names.get(student_id),
+                'status': status,
+                'book_id': book.id if book else None,
+            }
+            for student_id, (status, book) in results.items()
+        ],
+        'total_unpaid': total_unpaid,
+    })
+
 
 def generate_report(request, student_id):
     student = get_object_or_404(Student, id=student_id)
     report_type = request.GET.get('type', 'all')  # 'all' or 'unpaid'
-    
-    all_books = student.books.all().order_by('input_date')
-    unpaid_books = student.books.filter(payment_date__isnull=True)
-    # paid_books = student.books.filter(payment_date__isnull=False)
-    
-    # 통계 계산
-    total_books = all_books.count()
-    total_amount = all_books.aggregate(total=Sum('price'))['total'] or 0
-    total_unpaid = unpaid_books.aggregate(total=Sum('price'))['total'] or 0
-
-    # PDF 생성
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=20*mm,
-        leftMargin=20*mm,
-        topMargin=30*mm,
-        bottomMargin=20*mm
-    )
+    # 종류는 캐시 파일 이름에 들어가므로 정해진 값만 받는다
+    if report_type not in REPORT_TYPES:
+        return HttpResponseBadRequest('알 수 없는 보고서 종류입니다.')
 
-    # 메타데이터 설정을 위한 클래스 정의
-    class MetadataCanvas(NumberedCanvas):
-        def __init__(self, *args, **kwargs):
-            if 'student_name' in kwargs:
-                self._student_name = kwargs.pop('student_name')
-            super().__init__(*args, **kwargs)
-            
-        def showPage(self):
-            try:
-                self.setAuthor(self._student_name)
-                self.setTitle(f"{self._student_name} 학생 교재 보고서")
-                self.setSubject('교재 보고서')
-                self.setCreator('교재 관리 시스템')
-            except:
-                pass
-            super().showPage()
-
-    # 메타데이터를 설정하기 위한 임시 캔버스 생성
-    tmp_canvas = canvas.Canvas(buffer)
-    tmp_canvas.setTitle(f"{student.name} 학생 {'미납' if report_type == 'unpaid' else '전체'} 교재 보고서")
-    tmp_canvas.setAuthor(student.name)
-    tmp_canvas.setSubject('교재 보고서')
-    tmp_canvas.setCreator('교재 관리 시스템')
-    tmp_canvas.save()
-    
-    # 버퍼 초기화
-    buffer.seek(0)
-    buffer.truncate(0)
-    
-    # 실제 문서 생성
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=20*mm,
-        leftMargin=20*mm,
-        topMargin=30*mm,  # 상단 여백 증가
-        bottomMargin=20*mm
-    )
+    # 보고서의 전체 교재 내역에는 보관된 교재도 들어간다
+    rows = list(archive.with_archive(
+        student.books.order_by(), student.archived_books.order_by(), BOOK_FIELDS, ('input_date', 'id')
+    ))
+    key = fingerprint(student.name, report_type, rows)
 
-    # 폰트 등록
-    register_fonts()
+    # 교재 내역이 그대로면 브라우저에 있는 파일을 다시 쓰게 한다
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # 열린 파일을 받으므로 다른 요청이 그 사이에 캐시 파일을 지워도 응답할 수 있다
+        output = report_cache.get(student.id, report_type, key)
+        if output is None:
+            books = [ReportBook(*row) for row in rows]
 
-    # 스타일 정의
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='Korean',
-        fontName='NotoSansKR',
-        fontSize=10,
-        leading=14
-    ))
-    styles.add(ParagraphStyle(
-        name='KoreanTitle',
-        fontName='NotoSansKR-Bold',
-        fontSize=16,
-        leading=20,
-        alignment=1
-    ))
+            def render(output):
+                with profiling.timed('pdf'):
+                    get_renderer().render(student.name, books, report_type, output)
 
-    # 표준 테이블 폭 설정
-    TABLE_WIDTH = 170*mm  # A4 용지에 맞는 표준 폭
-    
-    elements = []
-    
-    # 제목 및 요약 정보
-    title = f"{student.name} 학생 " + ("미납 교재 현황" if report_type == 'unpaid' else "교재 내역서")
-    elements.append(Paragraph(title, styles['KoreanTitle']))
-    elements.append(Spacer(1, 20))
-    
-    # 요약 정보
-    summary_data = []
-    if report_type == 'unpaid':
-        summary_data = [
-            ['미납된 교재 수:', f"{unpaid_books.count()}권"],
-            ['미납 금액:', f"{'{:,}'.format(total_unpaid)}원"],
-        ]
-    else:
-        summary_data = [
-            ['전체 교재 수:', f"{total_books}권"],
-            ['총 금액:', f"{'{:,}'.format(total_amount)}원"],
-            ['미납 금액:', f"{'{:,}'.format(total_unpaid)}원"],
-        ]
-
-    summary_table = Table(summary_data, colWidths=[TABLE_WIDTH/2]*2)
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-
-    # 미납 교재 목록 (report_type이 'unpaid'일 때만)
-    if report_type == 'unpaid':
-        elements.append(Paragraph("미납 교재 목록", styles['KoreanTitle']))
-        elements.append(Spacer(1, 10))
-        
-        unpaid_data = [['No.', '지급일', '교재명', '가격', '상태']]
-        for idx, book in enumerate(unpaid_books, 1):
-            unpaid_data.append([
-                str(idx),
-                book.input_date.strftime('%Y-%m-%d'),
-                book.book_name,
-                f"{'{:,}'.format(book.price)}원",
-                '납부완료' if book.checking else '미납'
-            ])
-        
-        col_widths = [15*mm, 30*mm, 65*mm, 30*mm, 30*mm]
-        unpaid_table = Table(unpaid_data, colWidths=col_widths)
-        unpaid_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
-            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ]))
-        elements.append(unpaid_table)
-
-    # 전체 교재 목록 (report_type이 'all'일 때)
-    if report_type == 'all':
-        elements.append(Paragraph("전체 교재 목록", styles['KoreanTitle']))
-        elements.append(Spacer(1, 10))
-
-        all_data = [['No.', '지급일', '교재명', '가격', '납부상태', '납부일']]
-        for idx, book in enumerate(all_books, 1):
-            all_data.append([
-                str(idx),
-                book.input_date.strftime('%Y-%m-%d'),
-                book.book_name,
-                f"{'{:,}'.format(book.price)}원",
-                '납부완료' if book.payment_date else '미납',
-                book.payment_date.strftime('%Y-%m-%d') if book.payment_date else '-'
-            ])
-
-        col_widths = [
-            TABLE_WIDTH * 0.08,
-            TABLE_WIDTH * 0.15,
-            TABLE_WIDTH * 0.35,
-            TABLE_WIDTH * 0.15,
-            TABLE_WIDTH * 0.12,
-            TABLE_WIDTH * 0.15
-        ]
-        all_table = Table(all_data, colWidths=col_widths)
-        all_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'NotoSansKR'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
-            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
-            ('ALIGN', (5, 1), (5, -1), 'CENTER'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ]))
-        elements.append(all_table)
-
-    # PDF 생성을 위한 캔버스 메이커 함수 수정
-    def canvas_maker(filename, pagesize, *args, **kwargs):
-        return MetadataCanvas(filename, pagesize=pagesize, student_name=student.name)
-
-    doc.build(elements, canvasmaker=canvas_maker)
-    buffer.seek(0)
-    
-    # 파일명 설정
-    report_name = "미납교재" if report_type == 'unpaid' else "전체교재"
-    filename = f"{student.name}_{report_name}_현황.pdf" # _{date.today()}를 붙��� 수도 있음
-    # filename = f"{title}_{date.today()}.pdf"
-    
-    response = HttpResponse(content_type='application/pdf')
-    # response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    # 아래 코드는 바로 다운로드가 되는 코드
-    response['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{quote(filename)}'
-    response.write(buffer.getvalue())
-    buffer.close()
-    
+            output = report_cache.store(student.id, report_type, key, render)
+
+        # 파일명 설정
+        filename = report_filename(student.name, report_type)
+
+        # 파일을 메모리로 읽지 않고 그대로 응답으로 넘긴다 (바로 다운로드)
+        response = FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
     return response
@@ -0,0 +1,122 @@
+"""
+쓰기 트랜잭션과 SQLite 잠금 경합 처리
+
+DATABASES OPTIONS 의 transaction_mode='IMMEDIATE' 로 atomic() 이 BEGIN IMMEDIATE 로
+시작하므로 쓰기 잠금은 트랜잭션 처음에 한 번에 잡는다 (읽다가 쓰기로 올리는 중에
+"database is locked" 로 실패하지 않는다). 잠금은 먼저 busy_timeout 동안 기다리고,
+그래도 못 잡으면 run_in_transaction() 이 지터를 준 지수 백오프로 WRITE_LOCK_BUDGET
+안에서 트랜잭션 전체를 다시 실행한다.
+
+잠금 대기/재시도 횟수는 프로세스별 stats 에 모이며 write_stats 뷰에서 볼 수 있다.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, transaction
+
+logger = logging.getLogger('textbook.writes')
+
+DEFAULT_LOCK_BUDGET = 10  # 초
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 1.0
+
+# 트랜잭션 시작(BEGIN IMMEDIATE)이 이보다 오래 걸리면 잠금을 기다린 것으로 센다 (초)
+LOCK_WAIT_THRESHOLD = 0.005
+
+
+class WriteContention(Exception):
+    """WRITE_LOCK_BUDGET 안에 쓰기 잠금을 얻지 못했다."""
+
+
+class WriteStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.transactions = 0
+            self.lock_waits = 0
+            self.lock_wait_seconds = 0.0
+            self.max_lock_wait = 0.0
+            self.retries = 0
+            self.failures = 0
+
+    def _record_wait(self, waited):
+        if waited >= LOCK_WAIT_THRESHOLD:
+            self.lock_waits += 1
+            self.lock_wait_seconds += waited
+            self.max_lock_wait = max(self.max_lock_wait, waited)
+
+    def record_begin(self, waited):
+        with self._lock:
+            self.transactions += 1
+            self._record_wait(waited)
+
+    def record_retry(self, waited):
+        with self._lock:
+            self.retries += 1
+            self._record_wait(waited)
+
+    def record_failure(self, waited):
+        with self._lock:
+            self.failures += 1
+            self._record_wait(waited)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'transactions': self.transactions,
+                'lock_waits': self.lock_waits,
+                'lock_wait_ms': round(self.lock_wait_seconds * 1000, 1),
+                'max_lock_wait_ms': round(self.max_lock_wait * 1000, 1),
+                'retries': self.retries,
+                'failures': self.failures,
+            }
+
+
+stats = WriteStats()
+
+
+def lock_budget():
+    return getattr(settings, 'WRITE_LOCK_BUDGET', DEFAULT_LOCK_BUDGET)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return isinstance(error, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def run_in_transaction(func, *args, using=DEFAULT_DB_ALIAS, budget=None, **kwargs):
+    """func 를 쓰기 트랜잭션 안에서 실행하고, 잠금 오류면 budget(초) 안에서 다시 실행한다.
+
+    이미 바깥 트랜잭션 안이면 그 트랜잭션의 일부이므로 재시도하지 않는다 (바깥에서 재시도).
+    func 는 다시 실행되어도 되도록 트랜잭션 안에서 객체를 만들어야 한다.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        return func(*args, **kwargs)
+
+    deadline = time.monotonic() + (lock_budget() if budget is None else budget)
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            with transaction.atomic(using=using):
+                stats.record_begin(time.perf_counter() - started)
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            waited = time.perf_counter() - started
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+            if time.monotonic() + delay > deadline:
+                stats.record_failure(waited)
+                logger.warning("Write failed after %d retries: %s", attempt, e)
+                raise WriteContention(str(e)) from e
+            attempt += 1
+            stats.record_retry(waited)
+            time.sleep(delay)
+